@@ -0,0 +1,51 @@
+"""
+Measure the import time of param_teller with "python -X importtime".
+
+Reports the cumulative import time of the package and of boto3/botocore when they are imported, for a plain import and
+for the first AWS client creation.
+
+Usage: python -m benchmarks.import_time
+"""
+import subprocess
+import sys
+
+SCENARIOS = [
+    ('import param_teller', 'import param_teller'),
+    ('offline read', 'from param_teller.offline import OfflineStore; OfflineStore({"key": "value"}).get_value("key")'),
+    ('first client', 'from param_teller.clients import client; client("ssm", region_name="us-west-1")'),
+]
+
+
+def cumulative_import_times(code):
+    """
+    Run code in a new interpreter and parse its import times.
+
+    :param code: Python code to run.
+    :return: Dictionary of cumulative import times, in microseconds, of top-level imports indexed by package name.
+    """
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', code],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, output = process.communicate()
+
+    times = {}
+    for line in output.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit() and not name.startswith('  '):
+            package = name.strip().split('.')[0]
+            times[package] = times.get(package, 0) + int(cumulative)
+    return times
+
+
+def main():
+    for scenario, code in SCENARIOS:
+        times = cumulative_import_times(code)
+        print('{scenario:<16} {modules}'.format(
+            scenario=scenario,
+            modules=', '.join('{name}={time:.1f}ms'.format(name=name, time=times[name] / 1000.0)
+                              for name in ('param_teller', 'boto3', 'botocore') if name in times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Count the AWS calls made by ParameterStore.get_values_by_prefix against a stubbed client.
+
+Compares the previous strategy (list every name with DescribeParameters using the default page size, then fetch the
+values) with the current one (recursive GetParametersByPath for path prefixes, maximum page size and pipelined value
+fetching otherwise).
+
+Usage: python -m benchmarks.prefix_api_calls [number of parameters]
+"""
+import sys
+
+from param_teller.parameter_store import ParameterStore
+from param_teller.utils import chunks, paginate
+from benchmarks.stub_clients import StubSSMClient
+
+
+def two_pass_get_values_by_prefix(ssm_client, prefix):
+    """
+    Previous implementation: DescribeParameters with the default page size followed by GetParameters.
+    """
+    filters = [{'Key': 'Name', 'Values': [prefix]}] if prefix else []
+    keys = [param['Name']
+            for response in paginate(ssm_client.describe_parameters, Filters=filters)
+            for param in response.get('Parameters', [])]
+
+    values = {}
+    for chunk in chunks(keys, 10):
+        response = ssm_client.get_parameters(Names=chunk, WithDecryption=True)
+        values.update({param['Name']: param['Value'] for param in response['Parameters']})
+    return values
+
+
+def count_calls(function, size, prefix):
+    ssm_client = StubSSMClient({'{prefix}key{index:05d}'.format(prefix=prefix, index=index): 'value'
+                                for index in range(size)})
+    values = function(ssm_client, prefix)
+    assert len(values) == size
+    return dict(ssm_client.calls)
+
+
+def main(size):
+    strategies = [
+        ('two-pass', two_pass_get_values_by_prefix),
+        ('current', lambda ssm_client, prefix: ParameterStore(ssm_client=ssm_client).get_values_by_prefix(prefix)),
+    ]
+    for prefix in ('/projx-prod-servicey/', 'projx-prod-servicey.'):
+        for name, function in strategies:
+            calls = count_calls(function, size, prefix)
+            print('{prefix:<24} {name:<10} total={total:<6} {calls}'.format(
+                prefix=prefix, name=name, total=sum(calls.values()), calls=calls))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,194 @@
+"""
+In-memory stand-ins for the SSM and Secrets Manager clients, shared by the benchmarks and the tests.
+
+They follow the limits and pagination of the real APIs and count calls per operation.
+"""
+import threading
+from collections import Counter
+from datetime import datetime
+
+from botocore.exceptions import ClientError
+
+
+def client_error(code, operation):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, operation)
+
+
+class StubClient(object):
+    """
+    Minimal in-memory stand-in for a boto3 client that counts calls per operation.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        # Benchmarks on a fixed dataset set it to reuse the sorted and filtered names between pages.
+        self.memoize = False
+        self._lock = threading.Lock()
+        self._queries = {}
+
+    def _query(self, key, compute):
+        if not self.memoize:
+            return compute()
+        if key not in self._queries:
+            self._queries[key] = compute()
+        return self._queries[key]
+
+    def _count(self, operation):
+        with self._lock:
+            self.calls[operation] += 1
+
+    @staticmethod
+    def _page(items, max_results, next_token):
+        start = int(next_token or 0)
+        end = start + max_results
+        response = {'items': items[start:end]}
+        if end < len(items):
+            response['NextToken'] = str(end)
+        return response
+
+
+class StubSSMClient(StubClient):
+    """
+    In-memory SSM client following the limits and pagination of the real API.
+    """
+
+    def __init__(self, values=None):
+        super(StubSSMClient, self).__init__()
+        self.values = dict(values or {})
+        self.versions = {name: 1 for name in self.values}
+        self.types = {}
+
+    def _parameter(self, name):
+        return {'Name': name, 'Value': self.values[name], 'Type': self.types.get(name, 'SecureString'),
+                'Version': self.versions.get(name, 1), 'LastModifiedDate': datetime(2018, 1, 1)}
+
+    def get_parameter(self, Name, WithDecryption=False):
+        self._count('get_parameter')
+        if Name not in self.values:
+            raise client_error('ParameterNotFound', 'GetParameter')
+        return {'Parameter': self._parameter(Name)}
+
+    def get_parameters(self, Names, WithDecryption=False):
+        self._count('get_parameters')
+        if len(Names) > 10:
+            raise client_error('ValidationException', 'GetParameters')
+        return {
+            'Parameters': [self._parameter(name) for name in Names if name in self.values],
+            'InvalidParameters': [name for name in Names if name not in self.values],
+        }
+
+    def get_parameters_by_path(self, Path, WithDecryption=False, Recursive=False, MaxResults=10, NextToken=None):
+        self._count('get_parameters_by_path')
+        if MaxResults > 10:
+            raise client_error('ValidationException', 'GetParametersByPath')
+        base = Path.rstrip('/') + '/'
+        names = self._query(('path', base, Recursive), lambda: sorted(
+            name for name in self.values if name.startswith(base) and (Recursive or '/' not in name[len(base):])))
+        page = self._page(names, MaxResults, NextToken)
+        page['Parameters'] = [self._parameter(name) for name in page.pop('items')]
+        return page
+
+    def describe_parameters(self, Filters=None, ParameterFilters=None, MaxResults=10, NextToken=None):
+        self._count('describe_parameters')
+        if MaxResults > 50:
+            raise client_error('ValidationException', 'DescribeParameters')
+        names = self._query(('describe', repr(Filters), repr(ParameterFilters)),
+                            lambda: self._described_names(Filters, ParameterFilters))
+        page = self._page(names, MaxResults, NextToken)
+        page['Parameters'] = [{key: value for key, value in self._parameter(name).items() if key != 'Value'}
+                              for name in page.pop('items')]
+        return page
+
+    def put_parameter(self, Name, Value, Type='String', Overwrite=False, KeyId=None):
+        self._count('put_parameter')
+        if Name in self.values and not Overwrite:
+            raise client_error('ParameterAlreadyExists', 'PutParameter')
+        self.versions[Name] = self.versions.get(Name, 0) + 1 if Name in self.values else 1
+        self.values[Name] = Value
+        self.types[Name] = Type
+        self._queries.clear()
+        return {'Version': self.versions[Name]}
+
+    def delete_parameters(self, Names):
+        self._count('delete_parameters')
+        if len(Names) > 10:
+            raise client_error('ValidationException', 'DeleteParameters')
+        deleted = [name for name in Names if name in self.values]
+        for name in deleted:
+            del self.values[name]
+            self.versions.pop(name, None)
+            self.types.pop(name, None)
+        self._queries.clear()
+        return {'DeletedParameters': deleted, 'InvalidParameters': [name for name in Names if name not in deleted]}
+
+    def _described_names(self, filters, parameter_filters):
+        names = sorted(self.values)
+        for parameter_filter in filters or []:
+            names = [name for name in names if any(name.startswith(value) for value in parameter_filter['Values'])]
+        for parameter_filter in parameter_filters or []:
+            option = parameter_filter.get('Option', 'Equals')
+            if option == 'BeginsWith':
+                names = [name for name in names if any(name.startswith(value) for value in parameter_filter['Values'])]
+            else:
+                names = [name for name in names if name in parameter_filter['Values']]
+        return names
+
+
+class StubSecretsManagerClient(StubClient):
+    """
+    In-memory Secrets Manager client following the limits and pagination of the real API.
+    """
+
+    def __init__(self, secrets=None, page_size=10, batch_page_size=20, batch_error=None, denied=()):
+        super(StubSecretsManagerClient, self).__init__()
+        self.secrets = dict(secrets or {})
+        self.version_ids = {name: 'v1' for name in self.secrets}
+        self.denied = set(denied)
+        self._page_size = page_size
+        self._batch_page_size = batch_page_size
+        self._batch_error = batch_error
+
+    def get_secret_value(self, SecretId):
+        self._count('get_secret_value')
+        if SecretId in self.denied:
+            raise client_error('AccessDeniedException', 'GetSecretValue')
+        if SecretId not in self.secrets:
+            raise client_error('ResourceNotFoundException', 'GetSecretValue')
+        return self._secret_value(SecretId)
+
+    def _secret_value(self, name):
+        # bytes values are binary secrets.
+        value = self.secrets[name]
+        field = 'SecretBinary' if isinstance(value, bytes) and not isinstance(value, str) else 'SecretString'
+        return {'Name': name, field: value, 'VersionId': self.version_ids.get(name, 'v1')}
+
+    def list_secrets(self, MaxResults=None, NextToken=None, Filters=None):
+        self._count('list_secrets')
+        if MaxResults is not None and MaxResults > 100:
+            raise client_error('ValidationException', 'ListSecrets')
+        filters = [secret_filter['Values'] for secret_filter in Filters or []]
+        names = self._query(('list', repr(Filters)), lambda: [
+            name for name in sorted(self.secrets)
+            if all(any(name.startswith(value) for value in values) for values in filters)])
+        page = self._page(names, MaxResults or self._page_size, NextToken)
+        page['SecretList'] = [{'Name': name,
+                               'SecretVersionsToStages': {self.version_ids.get(name, 'v1'): ['AWSCURRENT']},
+                               'LastChangedDate': datetime(2018, 1, 1)}
+                              for name in page.pop('items')]
+        return page
+
+    def batch_get_secret_value(self, SecretIdList=None, Filters=None, MaxResults=None, NextToken=None):
+        self._count('batch_get_secret_value')
+        if self._batch_error is not None:
+            raise client_error(self._batch_error, 'BatchGetSecretValue')
+        if len(SecretIdList or []) > 20:
+            raise client_error('ValidationException', 'BatchGetSecretValue')
+        page = self._page(list(SecretIdList or []), self._batch_page_size, NextToken)
+        ids = page.pop('items')
+        page['SecretValues'] = [self._secret_value(name)
+                                for name in ids if name in self.secrets and name not in self.denied]
+        page['Errors'] = [{'SecretId': name,
+                           'ErrorCode': 'AccessDeniedException' if name in self.denied else 'ResourceNotFoundException',
+                           'ErrorMessage': 'Error'}
+                          for name in ids if name not in self.secrets or name in self.denied]
+        return page
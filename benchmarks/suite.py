@@ -0,0 +1,259 @@
+"""
+Benchmark the fetch paths of ParameterStore, SecretsManager and ProjectStore against in-memory AWS stand-ins with
+injected per-call latency and server-side throttling.
+
+For every method and dataset size it reports wall time, AWS calls, peak memory (tracemalloc) and throughput. Results
+can be saved and compared with a baseline, failing when a method makes more calls or gets slower than allowed.
+
+Usage:
+    python -m benchmarks.suite [--sizes 10,1000,50000] [--latency 0.005] [--server-rate 0] [--client-rate 0]
+                               [--methods ...] [--save results.json] [--compare baseline.json] [--tolerance 0.25]
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+from param_teller.parameter_store import ParameterStore
+from param_teller.project_store import ProjectStore
+from param_teller.secrets_manager import SecretsManager
+from param_teller.throttle import RateLimiter, Throttle
+from benchmarks.stub_clients import StubSecretsManagerClient, StubSSMClient, client_error
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+# perf_counter is not available in Python 2.
+clock = getattr(time, 'perf_counter', time.time)
+
+DEFAULT_SIZES = (10, 100, 1000)
+
+PROJECT, ENV, SERVICE = 'projx', 'prod', 'servicey'
+
+
+class LatencyClient(object):
+    """
+    Wraps a stub client, delaying every call and answering ThrottlingException above a request rate, like AWS does.
+    """
+
+    def __init__(self, stub, latency=0.0, rate=0.0):
+        """
+        Initialization.
+
+        :param stub: StubSSMClient or StubSecretsManagerClient.
+        :param latency: Delay, in seconds, added to every call.
+        :param rate: Maximum requests per second accepted (bursts up to one second worth). 0 disables throttling.
+        """
+        self.stub = stub
+        self.throttled = 0
+        self._latency = latency
+        self._rate = float(rate)
+        self._tokens = self._rate
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def calls(self):
+        return self.stub.calls
+
+    def __getattr__(self, name):
+        operation = getattr(self.stub, name)
+
+        def call(**kwargs):
+            if self._latency:
+                time.sleep(self._latency)
+            if self._rate and not self._take_token():
+                self.throttled += 1
+                raise client_error('ThrottlingException', name)
+            return operation(**kwargs)
+
+        return call
+
+    def _take_token(self):
+        with self._lock:
+            now = clock()
+            self._tokens = min(self._rate, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def ssm_keys(size, separator):
+    lead = '/' if separator == '/' else ''
+    return ['{lead}{project}-{env}-{service}{separator}key{index:05d}'.format(
+        lead=lead, project=PROJECT, env=ENV, service=SERVICE, separator=separator, index=index)
+        for index in range(size)]
+
+
+def noise_keys(size):
+    # Keys of other services sharing the account, which prefix reads have to skip.
+    return ['other-{env}-service{index:05d}/key'.format(env=ENV, index=index) for index in range(size)]
+
+
+def ssm_client(size, separator):
+    client = StubSSMClient({key: 'value-{0}'.format(key) for key in ssm_keys(size, separator)})
+    client.memoize = True
+    return client
+
+
+def secrets_client(size):
+    secrets = {key: 'value-{0}'.format(key) for key in ssm_keys(size, '/') + noise_keys(size)}
+    client = StubSecretsManagerClient(secrets, page_size=100)
+    client.memoize = True
+    return client
+
+
+# Every method: (name, dataset factory, run). The factory builds a stub from the dataset size, run reads from a backend
+# and returns the values.
+METHODS = [
+    ('ParameterStore.get_values_by_prefix[path]',
+     lambda size: ssm_client(size, '/'),
+     lambda client, size, options: ParameterStore(ssm_client=client, **options).get_values_by_prefix(
+         '/{0}-{1}-{2}/'.format(PROJECT, ENV, SERVICE))),
+    ('ParameterStore.get_values_by_prefix[name]',
+     lambda size: ssm_client(size, '.'),
+     lambda client, size, options: ParameterStore(ssm_client=client, **options).get_values_by_prefix(
+         '{0}-{1}-{2}.'.format(PROJECT, ENV, SERVICE))),
+    ('ParameterStore.get_values',
+     lambda size: ssm_client(size, '.'),
+     lambda client, size, options: ParameterStore(ssm_client=client, **options).get_values(*ssm_keys(size, '.'))),
+    ('SecretsManager.get_values_by_prefix',
+     secrets_client,
+     lambda client, size, options: SecretsManager(sm_client=client, **options).get_values_by_prefix(
+         '/{0}-{1}-{2}/'.format(PROJECT, ENV, SERVICE))),
+    ('SecretsManager.get_values',
+     secrets_client,
+     lambda client, size, options: SecretsManager(sm_client=client, **options).get_values(*ssm_keys(size, '/'))),
+    ('ProjectStore.get_service_parameters',
+     lambda size: ssm_client(size, '/'),
+     lambda client, size, options: ProjectStore(ParameterStore(ssm_client=client, **options), PROJECT, ENV, SERVICE,
+                                                lead_separator=True).get_service_parameters()),
+]
+
+
+def run(name, factory, function, size, latency, server_rate, client_rate, memory=True):
+    # type: (str, callable, callable, int, float, float, float, bool) -> dict
+    """
+    Benchmark a method on a fresh dataset.
+
+    :return: Dictionary with the measurements.
+    """
+    rates = {'ssm': client_rate, 'secretsmanager': client_rate} if client_rate else {}
+    options = {'throttle': Throttle(RateLimiter(rates))}
+
+    client = LatencyClient(factory(size), latency, server_rate)
+    started = clock()
+    values = function(client, size, options)
+    elapsed = clock() - started
+    if len(values) != size:
+        raise AssertionError('{name} returned {count} values instead of {size}'.format(
+            name=name, count=len(values), size=size))
+
+    peak = None
+    if memory and tracemalloc is not None:
+        # Measured on a second run without latency, so tracing does not distort the timing above.
+        traced_client = LatencyClient(factory(size))
+        tracemalloc.start()
+        try:
+            function(traced_client, size, options)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'method': name,
+        'size': size,
+        'wall_time': elapsed,
+        'calls': sum(client.calls.values()),
+        'calls_by_operation': dict(client.calls),
+        'throttled': client.throttled,
+        'peak_memory': peak,
+        'throughput': size / elapsed if elapsed else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    # type: (list, list, float) -> list
+    """
+    Find regressions against a baseline: more AWS calls, or a wall time worse than the tolerance allows.
+
+    :return: List of regression descriptions.
+    """
+    previous = {(result['method'], result['size']): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result['method'], result['size']))
+        if before is None:
+            continue
+        if result['calls'] > before['calls']:
+            regressions.append('{method} [{size}]: {calls} calls instead of {before}'.format(
+                before=before['calls'], **result))
+        if result['wall_time'] > before['wall_time'] * (1 + tolerance):
+            regressions.append('{method} [{size}]: {wall_time:.3f}s instead of {before:.3f}s'.format(
+                before=before['wall_time'], **result))
+    return regressions
+
+
+def report(result):
+    # type: (dict) -> str
+    peak = '{0:.1f}'.format(result['peak_memory'] / 1024.0) if result['peak_memory'] is not None else '-'
+    return '{method:<44} {size:>6} {wall_time:>9.3f} {calls:>7} {throttled:>9} {peak:>11} {throughput:>12.0f}'.format(
+        peak=peak, **result)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='comma separated dataset sizes (e.g. 10,1000,50000)')
+    parser.add_argument('--latency', type=float, default=0.005, help='delay, in seconds, added to every AWS call')
+    parser.add_argument('--server-rate', type=float, default=0,
+                        help='requests per second accepted by the stand-in before throttling (0: unlimited)')
+    parser.add_argument('--client-rate', type=float, default=0,
+                        help='requests per second allowed by the client-side rate limiter (0: unlimited)')
+    parser.add_argument('--methods', default='', help='comma separated substrings selecting the methods to run')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory measurement')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file written by --save')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed wall time increase over the baseline, as a fraction')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    selected = [pattern for pattern in args.methods.split(',') if pattern]
+
+    print('{0:<44} {1:>6} {2:>9} {3:>7} {4:>9} {5:>11} {6:>12}'.format(
+        'method', 'size', 'wall (s)', 'calls', 'throttled', 'peak (KiB)', 'keys/s'))
+    results = []
+    for name, factory, function in METHODS:
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        for size in sizes:
+            result = run(name, factory, function, size, args.latency, args.server_rate, args.client_rate,
+                         memory=not args.no_memory)
+            results.append(result)
+            print(report(result))
+            sys.stdout.flush()
+
+    if args.save:
+        with open(args.save, 'w') as results_file:
+            json.dump(results, results_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,7 @@
 from param_teller.parameter_store import ParameterStore
 from param_teller.secrets_manager import SecretsManager
+from param_teller.project_store import ProjectStore
 from param_teller.project_store import ProjectParameterStore
 from param_teller.project_store import ProjectSecretsManager
+from param_teller.project_store import get_services_parameters
+from param_teller.cache import CachedStore
@@ -0,0 +1,5 @@
+import sys
+
+from param_teller.daemon import main
+
+sys.exit(main())
@@ -0,0 +1,420 @@
+"""
+Asyncio counterparts of the parameter backends.
+
+boto3 clients are blocking, so their calls run in an executor while the event loop keeps serving other tasks.
+Clients exposing coroutine methods (e.g. aiobotocore) are awaited directly. Requires Python 3.
+"""
+import asyncio
+import functools
+import weakref
+
+from param_teller.clients import client
+from param_teller.parameter_store import (DESCRIBE_PARAMETERS_MAX_RESULTS, GET_PARAMETERS_BY_PATH_MAX_RESULTS,
+                                          GET_PARAMETERS_MAX_NAMES, normalize_path)
+from param_teller.project_store import service_prefix
+from param_teller.secret_value import SecretValue
+from param_teller.secrets_manager import (BATCH_GET_SECRET_VALUE_MAX_IDS, BATCH_UNAVAILABLE_ERROR_CODES, batch_results,
+                                          list_secrets_arguments)
+from param_teller.throttle import default_throttle
+from param_teller.utils import DEFAULT_MAX_WORKERS, chunks, error_code, is_not_found_error, unique
+
+
+class _AsyncBackend(object):
+    """
+    Runs client calls without blocking the event loop, bounding the number of concurrent calls.
+    """
+
+    def __init__(self, service, aws_client, max_concurrency, throttle, executor):
+        # The client is created on first use when not provided.
+        self._service = service
+        self._client = aws_client
+        self._max_concurrency = max_concurrency
+        self._throttle = throttle
+        self._executor = executor
+        # One semaphore per event loop, since a semaphore is bound to the loop it is first used on.
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def _aws_client(self):
+        """
+        AWS client, created (and boto3 imported) on first use.
+        """
+        if self._client is None:
+            self._client = client(self._service)
+        return self._client
+
+    async def _call(self, operation, **kwargs):
+        """
+        Call a client operation through the rate limiter, retrying throttled calls and transient failures.
+
+        :param operation: Client method name (e.g. get_parameters).
+        :param kwargs: Operation arguments.
+        :return: Operation response.
+        """
+        loop = asyncio.get_event_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self._max_concurrency)
+
+        throttle = self._throttle or default_throttle()
+        method = getattr(self._aws_client, operation)
+        started = throttle.clock()
+        delays = throttle.retry_policy.delays()
+        error = None
+        while True:
+            wait = throttle.reserve(self._service, operation)
+            if error is not None and throttle.exceeds_max_elapsed(wait, started):
+                raise error
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                async with semaphore:
+                    if asyncio.iscoroutinefunction(method):
+                        return await method(**kwargs)
+                    return await loop.run_in_executor(self._executor, functools.partial(method, **kwargs))
+            except Exception as call_error:
+                delay = throttle.next_delay(call_error, delays, started)
+                if delay is None:
+                    raise
+                error = call_error
+                await asyncio.sleep(delay)
+
+
+class AsyncParameterStore(_AsyncBackend):
+    """
+    Retrieves parameters from AWS Parameter Store without blocking the event loop.
+    """
+
+    def __init__(self, ssm_client=None, with_decryption=True, max_concurrency=DEFAULT_MAX_WORKERS, throttle=None,
+                 executor=None):
+        """
+        Initialize new parameter store client.
+
+        :param ssm_client: Optional client provided by user. By default, a client shared by the whole process is
+            created on first use.
+        :param with_decryption: If true, parameter store will decrypt values.
+        :param max_concurrency: Maximum number of concurrent requests.
+        :param throttle: Rate limiter and retry policy for AWS calls. By default, the process-wide throttle.
+        :param executor: Executor running blocking client calls. By default, the event loop's default executor.
+        """
+        super(AsyncParameterStore, self).__init__('ssm', ssm_client, max_concurrency, throttle, executor)
+        self._with_decryption = with_decryption
+
+    async def get_value(self, key):
+        """
+        Retrieve single parameter from store.
+
+        :param key: Parameter name.
+        :return: Parameter value.
+        """
+        response = await self._call('get_parameter', Name=key, WithDecryption=self._with_decryption)
+        return response.get('Parameter', {}).get('Value')
+
+    async def get_values_by_path(self, path, recursive=False):
+        """
+        Retrieve all parameter values in a user provider path.
+
+        :param path: Path where the parameters are store.
+        :param recursive: If true, include parameters in nested paths.
+        :return: Dictionary of parameter values indexed by parameter key.
+        """
+        path = normalize_path(path)
+
+        values = {}
+        extra_args = {}
+        while True:
+            response = await self._call(
+                'get_parameters_by_path',
+                Path=path,
+                Recursive=recursive,
+                MaxResults=GET_PARAMETERS_BY_PATH_MAX_RESULTS,
+                WithDecryption=self._with_decryption,
+                **extra_args
+            )
+            values.update({param['Name']: param['Value'] for param in response['Parameters']})
+
+            next_token = response.get('NextToken')
+            if not next_token:
+                break
+
+            extra_args['NextToken'] = next_token
+
+        return values
+
+    async def get_values(self, *keys):
+        """
+        Retrieve parameter values by key names, fetching chunks concurrently.
+
+        :param keys: keys to retrieve.
+        :return: Dictionary of parameter values indexed by parameter key (includes only found keys).
+        """
+        values = {}
+        if not keys:
+            return values
+
+        responses = await asyncio.gather(*(
+            self._call('get_parameters', Names=chunk, WithDecryption=self._with_decryption)
+            for chunk in chunks(unique(keys), GET_PARAMETERS_MAX_NAMES)))
+        for response in responses:
+            values.update({param['Name']: param['Value'] for param in response.get('Parameters', [])})
+
+        return values
+
+    async def get_values_by_prefix(self, prefix=''):
+        """
+        Retrieve all parameter values for keys that start with given prefix.
+
+        Path prefixes (e.g. "/service/") are read recursively by path. Other prefixes are listed with
+        DescribeParameters while the values of the pages already listed are fetched concurrently.
+
+        :param prefix: Key name prefix.
+        :return: Dictionary of parameter values indexed by parameter key.
+        """
+        if prefix.startswith('/') and prefix.endswith('/'):
+            return await self.get_values_by_path(prefix.rstrip('/') or '/', recursive=True)
+
+        filters = [{'Key': 'Name', 'Option': 'BeginsWith', 'Values': [prefix]}] if prefix else []
+        fetches = []
+        extra_args = {}
+        try:
+            while True:
+                response = await self._call(
+                    'describe_parameters',
+                    ParameterFilters=filters,
+                    MaxResults=DESCRIBE_PARAMETERS_MAX_RESULTS,
+                    **extra_args
+                )
+                # AWS ignores the leading '/' when matching names, so the prefix is enforced here as well.
+                keys = [param.get('Name') for param in response.get('Parameters', [])
+                        if param.get('Name', '').startswith(prefix)]
+                fetches.append(asyncio.ensure_future(self.get_values(*keys)))
+
+                next_token = response.get('NextToken')
+                if not next_token:
+                    break
+
+                extra_args['NextToken'] = next_token
+        except Exception:
+            for fetch in fetches:
+                fetch.cancel()
+            raise
+
+        values = {}
+        for page_values in await asyncio.gather(*fetches):
+            values.update(page_values)
+
+        return values
+
+
+class AsyncSecretsManager(_AsyncBackend):
+    """
+    Retrieves secrets from AWS Secrets Manager without blocking the event loop.
+    """
+
+    def __init__(self, sm_client=None, max_concurrency=DEFAULT_MAX_WORKERS, throttle=None, executor=None,
+                 batch=True):
+        """
+        Initialize new Secrets Manager client.
+
+        :param sm_client: Optional client provided by user. By default, a client shared by the whole process is
+            created on first use.
+        :param max_concurrency: Maximum number of concurrent requests.
+        :param throttle: Rate limiter and retry policy for AWS calls. By default, the process-wide throttle.
+        :param executor: Executor running blocking client calls. By default, the event loop's default executor.
+        :param batch: If true, secrets are retrieved with BatchGetSecretValue, falling back to one GetSecretValue call
+            per secret if the batch API is denied or not available.
+        """
+        super(AsyncSecretsManager, self).__init__('secretsmanager', sm_client, max_concurrency, throttle, executor)
+        self._batch = batch
+
+    async def get_value(self, key):
+        """
+        Retrieve single secret from store.
+
+        :param key: the name of the secret.
+        :return: the value of the secret: SecretString or, for binary secrets, SecretBinary (bytes).
+        """
+        return (await self.get_secret(key)).value
+
+    async def get_secret(self, key):
+        """
+        Retrieve single secret from store, with its version and lazy JSON decoding.
+
+        :param key: the name of the secret.
+        :return: the value of the secret.
+        """
+        return SecretValue.from_response(await self._call('get_secret_value', SecretId=key), key)
+
+    async def get_values(self, *keys):
+        """
+        Retrieve secrets by key names concurrently.
+
+        Missing secrets are skipped; any other error is raised.
+
+        :param keys: keys to retrieve.
+        :return: Dictionary of secret values indexed by parameter key (includes only found keys).
+        """
+        values, errors = await self.get_values_with_errors(*keys)
+        for key in keys:
+            error = errors.get(key)
+            if error is not None and not is_not_found_error(error):
+                raise error
+
+        return values
+
+    async def get_values_with_errors(self, *keys):
+        """
+        Retrieve secrets by key names concurrently, capturing errors per key.
+
+        Secrets are fetched in batches of BATCH_GET_SECRET_VALUE_MAX_IDS with BatchGetSecretValue or, when the batch
+        API cannot be used, one by one.
+
+        :param keys: keys to retrieve.
+        :return: Tuple with a dictionary of secret values indexed by parameter key (includes only found keys) and a
+            dictionary of raised exceptions indexed by parameter key.
+        """
+        values = {}
+        errors = {}
+        if not keys:
+            return values, errors
+
+        keys = unique(keys)
+        results = None
+        if self._use_batch():
+            try:
+                batches = await asyncio.gather(*(self._batch_get_values_or_errors(chunk)
+                                                 for chunk in chunks(keys, BATCH_GET_SECRET_VALUE_MAX_IDS)))
+                results = [result for batch in batches for result in batch]
+            except Exception as error:
+                if not self._disable_batch(error):
+                    raise
+        if results is None:
+            secrets = await asyncio.gather(*(self.get_value(key) for key in keys), return_exceptions=True)
+            results = [(key, None, secret) if isinstance(secret, Exception) else (key, secret, None)
+                       for key, secret in zip(keys, secrets)]
+
+        for key, value, error in results:
+            if error is not None:
+                errors[key] = error
+            elif value is not None:
+                values[key] = value
+
+        return values, errors
+
+    async def _batch_get_values_or_errors(self, keys):
+        """
+        Retrieve secrets with BatchGetSecretValue, following its pages.
+
+        :param keys: keys (names or ARNs) to retrieve (at most BATCH_GET_SECRET_VALUE_MAX_IDS).
+        :return: List of (key, value, raised exception or None) tuples, in request order.
+        """
+        responses = []
+        extra_args = {}
+        while True:
+            response = await self._call('batch_get_secret_value', SecretIdList=keys, **extra_args)
+            responses.append(response)
+
+            next_token = response.get('NextToken')
+            if not next_token:
+                break
+
+            extra_args['NextToken'] = next_token
+
+        return batch_results(keys, responses)
+
+    def _use_batch(self):
+        """
+        Whether secrets are fetched with BatchGetSecretValue.
+
+        :return: False if batching is disabled or the client does not have the batch API.
+        """
+        # Clients of botocore versions older than the batch API do not have the method at all.
+        if self._batch and not hasattr(self._aws_client, 'batch_get_secret_value'):
+            self._batch = False
+        return self._batch
+
+    def _disable_batch(self, error):
+        """
+        Stop using BatchGetSecretValue if an error shows it is not available.
+
+        :param error: Error raised by a batch call.
+        :return: True if the batch API was disabled and the secrets have to be fetched one by one.
+        """
+        if error_code(error) in BATCH_UNAVAILABLE_ERROR_CODES:
+            self._batch = False
+            return True
+        return False
+
+    async def get_values_by_prefix(self, prefix=''):
+        """
+        Retrieve all secret values for keys that start with given prefix.
+
+        Secrets are listed 100 at a time, filtered by name by AWS when the prefix allows it, while the values of the
+        pages already listed are fetched concurrently.
+
+        :param prefix: Key name prefix.
+        :return: Dictionary of secret values indexed by parameter key.
+        """
+        fetches = []
+        extra_args = list_secrets_arguments(prefix)
+        try:
+            while True:
+                response = await self._call('list_secrets', **extra_args)
+                # The name filter of ListSecrets is case-insensitive, so the prefix is enforced here as well.
+                keys = [secret['Name'] for secret in response.get('SecretList', [])
+                        if secret.get('Name') is not None and secret['Name'].startswith(prefix)]
+                fetches.append(asyncio.ensure_future(self.get_values(*keys)))
+
+                next_token = response.get('NextToken')
+                if not next_token:
+                    break
+
+                extra_args['NextToken'] = next_token
+        except Exception:
+            for fetch in fetches:
+                fetch.cancel()
+            raise
+
+        values = {}
+        for page_values in await asyncio.gather(*fetches):
+            values.update(page_values)
+
+        return values
+
+
+class AsyncProjectStore(object):
+    """
+    Asyncio wrapper to a backend to access keys using CZI's service name conventions.
+    """
+
+    def __init__(self, backend, project, env, service, key_separator='/', lead_separator=False):
+        """
+        Initialize a project store for the specified backend.
+
+        :param backend: Asyncio data storage backend (e.g. AsyncParameterStore or AsyncSecretsManager).
+        :param project: Project name.
+        :param env: Environment name (e.g. prod, staging, dev)
+        :param service: Service name.
+        :param key_separator: Custom separator to use if we do not want to use paths.
+        :param lead_separator: If true, keys start with the separator.
+        """
+        self._backend_store = backend
+        self._prefix = service_prefix(project, env, service, key_separator, lead_separator)
+
+    async def get_service_parameters(self):
+        """
+        Retrieve values for the current service.
+
+        :return: Dictionary of parameter values indexed by parameter key.
+        """
+        return await self._backend_store.get_values_by_prefix(prefix=self._prefix)
+
+    async def get_service_parameter(self, key):
+        """
+        Retrieve single value for the current service.
+
+        :param key: Parameter name.
+        :return: Parameter Value
+        """
+        return await self._backend_store.get_value("{prefix}{key}".format(prefix=self._prefix, key=key))
@@ -0,0 +1,355 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+from param_teller.offline import ParameterNotFound
+from param_teller.parameter_store import normalize_path
+from param_teller.utils import is_not_found_error, unique
+
+# Default time to live, in seconds, of a cached value.
+DEFAULT_TTL = 300
+
+# Default maximum number of cached entries.
+DEFAULT_MAX_SIZE = 1024
+
+
+class CacheStats(object):
+    """
+    Counters describing the effectiveness of a cache.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    @property
+    def hit_ratio(self):
+        # type: () -> float
+        """
+        Fraction of lookups served from the cache.
+
+        :return: Ratio between hits and total lookups (0 if there were no lookups).
+        """
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def as_dict(self):
+        # type: () -> dict
+        """
+        Export the counters.
+
+        :return: Dictionary of counter values indexed by counter name.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'coalesced': self.coalesced,
+            'hit_ratio': self.hit_ratio,
+        }
+
+
+class _Entry(object):
+    """
+    Cached result of a backend call. Missing keys are cached with found=False and the not found error to raise.
+    """
+
+    __slots__ = ('expires_at', 'found', 'value', 'error')
+
+    def __init__(self, expires_at, found, value=None, error=None):
+        self.expires_at = expires_at
+        self.found = found
+        self.value = value
+        self.error = error
+
+
+class _Flight(object):
+    """
+    Backend call in progress, shared by every thread that missed the same key.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class CachedStore(object):
+    """
+    In-process cache wrapping a parameter backend (e.g. ParameterStore or SecretsManager).
+
+    Entries expire after a TTL and the least recently used ones are evicted when the cache is full. Missing keys are
+    cached as well (negative caching) and concurrent misses for the same key trigger a single backend call.
+    """
+
+    def __init__(self, backend, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE, negative_ttl=None, clock=time.time):
+        """
+        Initialize new cache.
+
+        :param backend: Backend to wrap (any object accepted by ProjectStore).
+        :param ttl: Time to live, in seconds, of a cached value.
+        :param max_size: Maximum number of cached entries.
+        :param negative_ttl: Time to live, in seconds, of a missing key. Defaults to ttl; 0 disables negative caching.
+        :param clock: Function returning the current time in seconds.
+        """
+        self._backend = backend
+        self._ttl = ttl
+        self._negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def __getattr__(self, name):
+        # Operations that are not cached go straight to the backend.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._backend, name)
+
+    @property
+    def backend(self):
+        """
+        Wrapped backend.
+        """
+        return self._backend
+
+    def get_value(self, key):
+        # type: (str) -> str
+        """
+        Retrieve single value, from the cache if possible.
+
+        :param key: Parameter name.
+        :return: Parameter value.
+        """
+        return self._get(('value', key), lambda: self._backend.get_value(key))
+
+    def get_values(self, *keys):
+        # type: (str) -> dict
+        """
+        Retrieve values by key names, fetching only the keys that are not cached.
+
+        :param keys: keys to retrieve.
+        :return: Dictionary of values indexed by key (includes only found keys).
+        """
+        values = {}
+        missing = []
+        waiting = []
+        with self._lock:
+            for key in unique(keys):
+                cache_key = ('value', key)
+                entry = self._lookup(cache_key)
+                if entry is not None:
+                    self.stats.hits += 1
+                    if entry.found:
+                        values[key] = entry.value
+                    continue
+
+                # Keys already being fetched by another thread are waited for instead of fetched again.
+                flight = self._in_flight.get(cache_key)
+                if flight is None:
+                    self._in_flight[cache_key] = _Flight()
+                    missing.append(key)
+                    self.stats.misses += 1
+                else:
+                    waiting.append((key, flight))
+                    self.stats.coalesced += 1
+
+        if missing:
+            values.update(self._fetch_many(missing))
+
+        for key, flight in waiting:
+            flight.done.wait()
+            if flight.error is None:
+                values[key] = flight.value
+            elif not is_not_found_error(flight.error):
+                raise flight.error
+
+        return values
+
+    def _fetch_many(self, keys):
+        # type: (list) -> dict
+        """
+        Fetch keys this thread leads the flights of with a single backend call, caching found and missing keys.
+
+        :param keys: keys to retrieve.
+        :return: Dictionary of found values indexed by key.
+        """
+        with self._lock:
+            flights = [(key, self._in_flight[('value', key)]) for key in keys]
+
+        try:
+            fetched = self._backend.get_values(*keys)
+            values = {}
+            now = self._clock()
+            with self._lock:
+                for key, flight in flights:
+                    if key in fetched:
+                        flight.value = values[key] = fetched[key]
+                        self._store(('value', key), _Entry(now + self._ttl, True, flight.value))
+                    else:
+                        flight.error = ParameterNotFound(key)
+                        if self._negative_ttl:
+                            self._store(('value', key), _Entry(now + self._negative_ttl, False, error=flight.error))
+            return values
+        except Exception as error:
+            for _, flight in flights:
+                flight.error = error
+            raise
+        finally:
+            with self._lock:
+                for key, _ in flights:
+                    del self._in_flight[('value', key)]
+            for _, flight in flights:
+                flight.done.set()
+
+    def get_values_by_path(self, path):
+        # type: (str) -> dict
+        """
+        Retrieve all values in a path, from the cache if possible.
+
+        :param path: Path where the parameters are store.
+        :return: Dictionary of values indexed by key.
+        """
+        return dict(self._get(('path', path), lambda: self._load_many(self._backend.get_values_by_path(path))))
+
+    def get_values_by_prefix(self, prefix=''):
+        # type: (str) -> dict
+        """
+        Retrieve all values for keys that start with given prefix, from the cache if possible.
+
+        :param prefix: Key name prefix.
+        :return: Dictionary of values indexed by key.
+        """
+        return dict(self._get(('prefix', prefix), lambda: self._load_many(self._backend.get_values_by_prefix(prefix))))
+
+    def invalidate(self, key=None):
+        # type: (str) -> None
+        """
+        Drop cached entries.
+
+        :param key: Key whose cached value should be dropped, together with the cached path and prefix results covering
+            it. By default, the whole cache is cleared.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                return
+
+            self._entries.pop(('value', key), None)
+            for cache_key, entry in list(self._entries.items()):
+                if cache_key[0] != 'value' and _covers(cache_key, entry, key):
+                    del self._entries[cache_key]
+
+    def _load_many(self, values):
+        # type: (dict) -> dict
+        """
+        Store every value of a bulk result so single lookups can be served from it.
+
+        :param values: Dictionary of values indexed by key.
+        :return: The same dictionary.
+        """
+        expires_at = self._clock() + self._ttl
+        with self._lock:
+            # Room is left for the bulk result itself, stored once loaded: warming never evicts it.
+            for key, value in itertools.islice(values.items(), max(self._max_size - 1, 0)):
+                self._store(('value', key), _Entry(expires_at, True, value))
+        return values
+
+    def _get(self, cache_key, loader):
+        """
+        Return a cached result or load it, making sure only one thread calls the backend for the same key.
+
+        :param cache_key: Cache entry key.
+        :param loader: Function (without arguments) that retrieves the value from the backend.
+        :return: Cached or loaded value.
+        """
+        with self._lock:
+            entry = self._lookup(cache_key)
+            if entry is not None:
+                self.stats.hits += 1
+                if not entry.found:
+                    raise entry.error
+                return entry.value
+
+            flight = self._in_flight.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[cache_key] = _Flight()
+                self.stats.misses += 1
+            else:
+                self.stats.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+            with self._lock:
+                self._store(cache_key, _Entry(self._clock() + self._ttl, True, flight.value))
+            return flight.value
+        except Exception as error:
+            flight.error = error
+            if self._negative_ttl and is_not_found_error(error):
+                with self._lock:
+                    self._store(cache_key, _Entry(self._clock() + self._negative_ttl, False, error=error))
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[cache_key]
+            flight.done.set()
+
+    def _lookup(self, cache_key):
+        """
+        Find a live entry and mark it as recently used. Must be called holding the lock.
+
+        :param cache_key: Cache entry key.
+        :return: Cache entry or None if not cached or expired.
+        """
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return None
+        if entry.expires_at <= self._clock():
+            return None
+
+        self._entries[cache_key] = entry
+        return entry
+
+    def _store(self, cache_key, entry):
+        """
+        Insert an entry, evicting the least recently used ones if the cache is full. Must be called holding the lock.
+
+        :param cache_key: Cache entry key.
+        :param entry: Entry to store.
+        """
+        self._entries.pop(cache_key, None)
+        self._entries[cache_key] = entry
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+
+def _covers(cache_key, entry, key):
+    # type: (tuple, _Entry, str) -> bool
+    """
+    Check if a cached path or prefix result includes, or should include, a key.
+
+    :param cache_key: Cache entry key of a path or prefix result.
+    :param entry: Cache entry.
+    :param key: Parameter key.
+    :return: True if the result is stale once the key changes.
+    """
+    kind, name = cache_key
+    if entry.found and key in entry.value:
+        return True
+    if kind == 'prefix':
+        return key.startswith(name)
+    # Paths are read recursively or not: any key under the path may belong to the result.
+    return key.startswith(normalize_path(name).rstrip('/') + '/')
@@ -0,0 +1,62 @@
+import threading
+
+from param_teller.utils import DEFAULT_MAX_WORKERS
+
+# Throttled calls and transient failures (server errors, timeouts, connection failures) are retried by
+# param_teller.throttle: botocore's own retries would multiply its attempts and escape its maximum elapsed time, so
+# shared clients make a single attempt per call.
+CLIENT_RETRIES = {'max_attempts': 0}
+
+# Default size of the HTTP connection pool of each client. Prefix reads page through listings while a full pool of
+# workers fetches values, so the pool is sized above the number of workers.
+DEFAULT_MAX_POOL_CONNECTIONS = 2 * DEFAULT_MAX_WORKERS
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client(service_name, region_name=None, profile_name=None, max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS):
+    """
+    Get a boto3 client shared by the whole process.
+
+    Creating a client resolves credentials and builds a new HTTP connection pool, which is slow; clients are thread
+    safe, so one client per service, region and profile is created and reused (including its open connections, kept
+    alive with TCP keep-alive). Clients make a single attempt per call: retries are left to param_teller.throttle.
+
+    :param service_name: AWS service name (e.g. ssm, secretsmanager).
+    :param region_name: Optional region. By default, the region of the default session.
+    :param profile_name: Optional profile of the shared credentials file. By default, the default profile.
+    :param max_pool_connections: Maximum number of connections kept in the client's connection pool.
+    :return: boto3 client.
+    """
+    key = (service_name, region_name, profile_name, max_pool_connections)
+    aws_client = _clients.get(key)
+    if aws_client is not None:
+        return aws_client
+
+    # boto3 sessions are not thread safe, so clients are created while holding the lock.
+    with _clients_lock:
+        aws_client = _clients.get(key)
+        if aws_client is None:
+            import boto3.session
+            from botocore.config import Config
+
+            options = {'max_pool_connections': max_pool_connections, 'retries': CLIENT_RETRIES}
+            try:
+                # Keep idle pooled connections alive between refreshes.
+                config = Config(tcp_keepalive=True, **options)
+            except TypeError:  # botocore < 1.27.84
+                config = Config(**options)
+
+            session = boto3.session.Session(profile_name=profile_name)
+            aws_client = _clients[key] = session.client(service_name, region_name=region_name, config=config)
+        return aws_client
+
+
+def clear_clients():
+    # type: () -> None
+    """
+    Forget every shared client (e.g. after credentials or the default region changed, or in a forked process).
+    """
+    with _clients_lock:
+        _clients.clear()
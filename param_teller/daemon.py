@@ -0,0 +1,428 @@
+"""
+Local daemon holding refreshed snapshots of one or more services and serving them over a Unix domain socket, so the
+processes of a host share a single AWS fetch path.
+
+Protocol: every request and response is a JSON document preceded by its length (4 bytes, big endian). Requests are
+{"op": "get_value", "key": ...}, {"op": "get_values", "keys": [...]} or {"op": "get_values_by_prefix", "prefix": ...}.
+Responses carry the "values" found, indexed by key, or an AWS-like "error" ({"Code": ..., "Message": ...}). Binary
+values are sent base64-encoded and listed in "binary".
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import stat
+import struct
+import threading
+
+try:
+    import socketserver
+except ImportError:  # Python 2
+    import SocketServer as socketserver
+
+from param_teller.offline import ParameterNotFound
+from param_teller.refresh import DEFAULT_INTERVAL, DEFAULT_JITTER
+from param_teller.utils import decode_values, encode_values, error_code
+
+logger = logging.getLogger(__name__)
+
+# Default timeout, in seconds, of client requests.
+DEFAULT_TIMEOUT = 5.0
+
+# Maximum size, in bytes, of a request or response.
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+_LENGTH = struct.Struct('>I')
+
+
+def send_frame(connection, document):
+    # type: (socket.socket, dict) -> None
+    """
+    Send a length-prefixed JSON document.
+
+    :param connection: Connected socket.
+    :param document: JSON serializable document.
+    """
+    payload = json.dumps(document, separators=(',', ':')).encode('utf-8')
+    connection.sendall(_LENGTH.pack(len(payload)) + payload)
+
+
+def receive_frame(connection):
+    # type: (socket.socket) -> dict
+    """
+    Receive a length-prefixed JSON document.
+
+    :param connection: Connected socket.
+    :return: Document or None if the peer closed the connection.
+    """
+    header = _receive_exactly(connection, _LENGTH.size)
+    if header is None:
+        return None
+    length = _LENGTH.unpack(header)[0]
+    if length > MAX_FRAME_SIZE:
+        raise ValueError('Frame too large: {length} bytes'.format(length=length))
+    payload = _receive_exactly(connection, length)
+    if payload is None:
+        raise EOFError('Connection closed in the middle of a frame')
+    return json.loads(payload.decode('utf-8'))
+
+
+def _receive_exactly(connection, size):
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = connection.recv(remaining)
+        if not chunk:
+            if remaining == size:
+                return None
+            raise EOFError('Connection closed in the middle of a frame')
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def _is_socket(path):
+    # type: (str) -> bool
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except OSError:
+        return False
+
+
+def _remove_stale_socket(path):
+    # type: (str) -> None
+    """
+    Remove the socket left by a daemon that did not stop cleanly.
+
+    :param path: Path of the Unix domain socket.
+    :raise ValueError: If the path is not a socket or another daemon is serving on it.
+    """
+    if not os.path.lexists(path):
+        return
+    if not _is_socket(path):
+        raise ValueError('{path} exists and is not a socket'.format(path=path))
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except socket.error:
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise ValueError('Another daemon is serving on {path}'.format(path=path))
+
+
+class DaemonError(Exception):
+    """
+    Error answered by the daemon. Carries an AWS-like error response, like botocore's ClientError.
+    """
+
+    def __init__(self, code, message=None):
+        super(DaemonError, self).__init__('{code}: {message}'.format(code=code, message=message or ''))
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class ParameterDaemon(object):
+    """
+    Serves the snapshots of project stores over a Unix domain socket.
+    """
+
+    def __init__(self, project_stores, socket_path, interval=DEFAULT_INTERVAL, jitter=DEFAULT_JITTER):
+        """
+        Initialization.
+
+        :param project_stores: ProjectStore instances whose service parameters are served.
+        :param socket_path: Path of the Unix domain socket.
+        :param interval: Interval, in seconds, between refreshes.
+        :param jitter: Random variation, as a fraction of the interval, applied to every refresh.
+        """
+        self.socket_path = socket_path
+        self._project_stores = list(project_stores)
+        self._interval = interval
+        self._jitter = jitter
+        self._refreshers = []
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        # type: () -> ParameterDaemon
+        """
+        Load every service and start serving in a background thread.
+
+        :return: The daemon itself.
+        """
+        _remove_stale_socket(self.socket_path)
+        self._refreshers = [project_store.start_refresh(self._interval, self._jitter)
+                            for project_store in self._project_stores]
+
+        # The socket is created accessible to its owner only: chmod after bind would leave a window open to any user.
+        umask = os.umask(0o177)
+        try:
+            self._server = _Server(self.socket_path, _Handler)
+        except Exception:
+            self.stop()
+            raise
+        finally:
+            os.umask(umask)
+        self._server.parameter_daemon = self
+
+        self._thread = threading.Thread(target=self._server.serve_forever, name='param-teller-daemon')
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info('Serving %d service(s) on %s', len(self._project_stores), self.socket_path)
+        return self
+
+    def serve_forever(self):
+        # type: () -> None
+        """
+        Load every service and serve until interrupted.
+        """
+        self.start()
+        try:
+            while self._thread.is_alive():
+                self._thread.join(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        # type: () -> None
+        """
+        Stop serving and refreshing, and remove the socket.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server.close_connections()
+            self._server = None
+            if _is_socket(self.socket_path):
+                os.remove(self.socket_path)
+        for project_store in self._project_stores:
+            project_store.stop_refresh()
+        self._refreshers = []
+
+    def get_value(self, key):
+        # type: (str) -> str
+        for refresher in self._refreshers:
+            snapshot = refresher.snapshot
+            if key in snapshot:
+                return snapshot[key]
+        raise ParameterNotFound(key)
+
+    def get_values(self, keys):
+        # type: (list) -> dict
+        values = {}
+        for refresher in self._refreshers:
+            snapshot = refresher.snapshot
+            values.update((key, snapshot[key]) for key in keys if key in snapshot)
+        return values
+
+    def get_values_by_prefix(self, prefix):
+        # type: (str) -> dict
+        values = {}
+        for refresher in self._refreshers:
+            values.update((key, value) for key, value in refresher.snapshot.items() if key.startswith(prefix))
+        return values
+
+    def handle(self, request):
+        # type: (dict) -> dict
+        """
+        Answer a request.
+
+        :param request: Request document.
+        :return: Response document.
+        """
+        try:
+            operation = request.get('op')
+            if operation == 'get_value':
+                return encode_values({request['key']: self.get_value(request['key'])})
+            if operation == 'get_values':
+                return encode_values(self.get_values(request['keys']))
+            if operation == 'get_values_by_prefix':
+                return encode_values(self.get_values_by_prefix(request.get('prefix', '')))
+            return {'error': {'Code': 'InvalidAction', 'Message': 'Unknown operation: {0}'.format(operation)}}
+        except Exception as error:
+            return {'error': {'Code': error_code(error) or type(error).__name__, 'Message': str(error)}}
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        socketserver.UnixStreamServer.__init__(self, *args, **kwargs)
+        self.parameter_daemon = None
+        self.connections = set()
+        self.connections_lock = threading.Lock()
+
+    def close_connections(self):
+        # Handler threads are not joined: closing their connections makes them return.
+        with self.connections_lock:
+            connections, self.connections = self.connections, set()
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """
+    Answers the requests of a connection until the client closes it.
+    """
+
+    def setup(self):
+        with self.server.connections_lock:
+            self.server.connections.add(self.request)
+
+    def finish(self):
+        with self.server.connections_lock:
+            self.server.connections.discard(self.request)
+
+    def handle(self):
+        while True:
+            try:
+                request = receive_frame(self.request)
+            except (EOFError, ValueError, socket.error) as error:
+                logger.debug('Dropping connection: %s', error)
+                return
+            if request is None:
+                return
+            send_frame(self.request, self.server.parameter_daemon.handle(request))
+
+
+class SocketStore(object):
+    """
+    Read-only backend reading from a ParameterDaemon, usable in place of ParameterStore or SecretsManager (e.g. in a
+    ProjectStore). Every thread keeps its own connection, reopened after a fork or a failure.
+    """
+
+    def __init__(self, socket_path, timeout=DEFAULT_TIMEOUT):
+        """
+        Initialization.
+
+        :param socket_path: Path of the daemon's Unix domain socket.
+        :param timeout: Timeout, in seconds, of every request.
+        """
+        self.socket_path = socket_path
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        # type: () -> socket.socket
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self._timeout)
+            connection.connect(self.socket_path)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            connection.close()
+        self._local.connection = None
+
+    def _request(self, request):
+        # type: (dict) -> dict
+        """
+        Send a request, retrying once on a new connection if the current one is broken (e.g. daemon restarted).
+
+        :param request: Request document.
+        :return: Response document.
+        """
+        for attempt in (1, 2):
+            try:
+                connection = self._connection()
+                send_frame(connection, request)
+                response = receive_frame(connection)
+                if response is None:
+                    raise EOFError('Daemon closed the connection')
+                break
+            except (EOFError, socket.error):
+                self._close()
+                if attempt == 2:
+                    raise
+
+        error = response.get('error')
+        if error is not None:
+            if error.get('Code') == 'ParameterNotFound':
+                raise ParameterNotFound(request.get('key'))
+            raise DaemonError(error.get('Code'), error.get('Message'))
+        return decode_values(response)
+
+    def get_value(self, key):
+        # type: (str) -> str
+        """
+        Retrieve single value.
+
+        :param key: Parameter name.
+        :return: Parameter value.
+        """
+        return self._request({'op': 'get_value', 'key': key})[key]
+
+    def get_values(self, *keys):
+        # type: (str) -> dict
+        """
+        Retrieve values by key names.
+
+        :param keys: keys to retrieve.
+        :return: Dictionary of values indexed by key (includes only found keys).
+        """
+        if not keys:
+            return {}
+        return self._request({'op': 'get_values', 'keys': list(keys)})
+
+    def get_values_by_prefix(self, prefix=''):
+        # type: (str) -> dict
+        """
+        Retrieve all values for keys that start with given prefix.
+
+        :param prefix: Key name prefix.
+        :return: Dictionary of values indexed by key.
+        """
+        return self._request({'op': 'get_values_by_prefix', 'prefix': prefix})
+
+
+def _parse_service(value):
+    # type: (str) -> tuple
+    parts = value.split(':')
+    if len(parts) != 3 or not all(parts):
+        raise argparse.ArgumentTypeError('expected project:env:service, got {0!r}'.format(value))
+    return tuple(parts)
+
+
+def main(argv=None):
+    """
+    Command line entry point: param-teller serve --socket PATH --service project:env:service [...].
+    """
+    from param_teller.project_store import ProjectParameterStore, ProjectSecretsManager
+
+    parser = argparse.ArgumentParser(prog='param-teller', description='Serve parameters over a Unix domain socket.')
+    commands = parser.add_subparsers(dest='command')
+    serve = commands.add_parser('serve', help='run the daemon')
+    serve.add_argument('--socket', required=True, help='path of the Unix domain socket')
+    serve.add_argument('--service', required=True, action='append', type=_parse_service,
+                       help='service to serve, as project:env:service (repeatable)')
+    serve.add_argument('--backend', choices=('ssm', 'secretsmanager'), default='ssm')
+    serve.add_argument('--key-separator', help='custom key separator (default: paths for ssm, "/" for secretsmanager)')
+    serve.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='seconds between refreshes')
+    serve.add_argument('--log-level', default='INFO')
+    args = parser.parse_args(argv)
+    if args.command != 'serve':
+        parser.print_help()
+        return 2
+
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    if args.backend == 'ssm':
+        project_stores = [ProjectParameterStore(project, env, service, key_separator=args.key_separator)
+                          for project, env, service in args.service]
+    else:
+        project_stores = [ProjectSecretsManager(project, env, service, key_separator=args.key_separator or '/')
+                          for project, env, service in args.service]
+
+    ParameterDaemon(project_stores, args.socket, interval=args.interval).serve_forever()
+    return 0
@@ -0,0 +1,106 @@
+class Changes(object):
+    """
+    Keys that changed between two synchronizations.
+    """
+
+    def __init__(self, added=(), changed=(), removed=()):
+        """
+        Initialization.
+
+        :param added: Keys that did not exist before.
+        :param changed: Keys whose version changed.
+        :param removed: Keys that no longer exist.
+        """
+        self.added = sorted(added)
+        self.changed = sorted(changed)
+        self.removed = sorted(removed)
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return 'Changes(added={added}, changed={changed}, removed={removed})'.format(
+            added=self.added, changed=self.changed, removed=self.removed)
+
+
+class DeltaSync(object):
+    """
+    Keeps the values of a key prefix in sync, fetching only the keys that were added or changed.
+
+    Every refresh lists version stamps only (see get_versions_by_prefix of ParameterStore and SecretsManager) and
+    retrieves and decrypts just the values whose version differs from the last synchronization.
+    """
+
+    def __init__(self, backend, prefix='', values=None, versions=None):
+        """
+        Initialization.
+
+        :param backend: Backend providing get_versions_by_prefix and get_values.
+        :param prefix: Key name prefix to keep in sync.
+        :param values: Optional values already known (e.g. read from a snapshot), indexed by key.
+        :param versions: Version stamps of the known values, indexed by key.
+        """
+        self._backend = backend
+        self._prefix = prefix
+        self._values = dict(values or {})
+        self._versions = dict(versions or {})
+
+    @property
+    def values(self):
+        # type: () -> dict
+        """
+        Values as of the last synchronization. It must not be modified, refreshes replace it with a new dictionary.
+        """
+        return self._values
+
+    @property
+    def versions(self):
+        # type: () -> dict
+        """
+        Version stamps as of the last synchronization, indexed by key.
+        """
+        return self._versions
+
+    def refresh(self):
+        # type: () -> Changes
+        """
+        Synchronize with the backend.
+
+        :return: Keys added, changed and removed since the last synchronization.
+        """
+        versions = dict(self._backend.get_versions_by_prefix(prefix=self._prefix))
+
+        added = [key for key in versions if key not in self._versions]
+        changed = [key for key in versions if key in self._versions and versions[key] != self._versions[key]]
+        removed = [key for key in self._versions if key not in versions]
+
+        values = dict(self._values)
+        for key in removed:
+            values.pop(key, None)
+
+        stale = added + changed
+        if stale:
+            fetched = self._backend.get_values(*stale)
+            for key in stale:
+                # A key deleted after listing (or without a value) is dropped without recording its version, so it is
+                # fetched again on the next refresh.
+                if key in fetched:
+                    values[key] = fetched[key]
+                else:
+                    values.pop(key, None)
+                    versions.pop(key, None)
+
+        self._values, self._versions = values, versions
+        return Changes(added, changed, removed)
+
+    def load(self):
+        # type: () -> dict
+        """
+        Synchronize with the backend and return the values.
+
+        :return: Dictionary of values indexed by key.
+        """
+        self.refresh()
+        return self._values
@@ -0,0 +1,396 @@
+import bisect
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets. Latencies above the last bound fall in an extra bucket.
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Operations returning one page of a listing per call.
+PAGINATED_OPERATIONS = frozenset(['get_parameters_by_path', 'describe_parameters', 'list_secrets',
+                                  'batch_get_secret_value'])
+
+
+class Histogram(object):
+    """
+    Distribution of observed values over fixed buckets.
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        """
+        Initialization.
+
+        :param buckets: Sorted upper bounds of the buckets.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        # type: (float) -> None
+        """
+        Record a value.
+
+        :param value: Observed value.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction):
+        # type: (float) -> float
+        """
+        Estimate a percentile from the buckets.
+
+        :param fraction: Percentile as a fraction (e.g. 0.99).
+        :return: Upper bound of the bucket holding the percentile (the maximum for the last bucket), or None if
+            nothing was observed.
+        """
+        if not self.count:
+            return None
+
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def as_dict(self):
+        # type: () -> dict
+        """
+        Export the distribution summary.
+
+        :return: Dictionary with count, total, min, max, mean and estimated p50, p90 and p99.
+        """
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+        }
+
+
+class OperationStats(object):
+    """
+    Counters of a single AWS operation (or library operation, e.g. project_store.get_service_parameters).
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latency = Histogram(buckets)
+
+    def as_dict(self):
+        # type: () -> dict
+        """
+        Export the counters.
+
+        :return: Dictionary of counter values indexed by counter name.
+        """
+        return {'calls': self.calls, 'errors': self.errors, 'bytes': self.bytes, 'latency': self.latency.as_dict()}
+
+
+class CallEvent(object):
+    """
+    Completed call, as passed to hooks.
+    """
+
+    __slots__ = ('service', 'operation', 'duration', 'size', 'error')
+
+    def __init__(self, service, operation, duration, size=0, error=None):
+        """
+        Initialization.
+
+        :param service: AWS service name (e.g. ssm) or "project_store" for ProjectStore operations.
+        :param operation: Operation name (e.g. get_parameters).
+        :param duration: Duration, in seconds.
+        :param size: Size, in bytes, of the response body, when reported by AWS.
+        :param error: Raised exception or None.
+        """
+        self.service = service
+        self.operation = operation
+        self.duration = duration
+        self.size = size
+        self.error = error
+
+    def __repr__(self):
+        return 'CallEvent({service}.{operation}, duration={duration:.6f}, size={size}, error={error!r})'.format(
+            service=self.service, operation=self.operation, duration=self.duration, size=self.size, error=self.error)
+
+
+class _NoSpan(object):
+    """
+    Context manager doing nothing, used when instrumentation is disabled.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span(object):
+    """
+    Context manager timing a block of code as an operation.
+    """
+
+    def __init__(self, instrumentation, service, operation):
+        self._instrumentation = instrumentation
+        self._service = service
+        self._operation = operation
+        self._started = None
+        self._tracer_span = None
+        self.size = 0
+
+    def __enter__(self):
+        tracer = self._instrumentation.tracer
+        if tracer is not None:
+            self._tracer_span = tracer.start_as_current_span(
+                '{service}.{operation}'.format(service=self._service, operation=self._operation))
+            self._tracer_span.__enter__()
+        self._started = self._instrumentation.clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self._instrumentation.record(self._service, self._operation,
+                                         self._instrumentation.clock() - self._started, self.size, exc_value)
+        finally:
+            if self._tracer_span is not None:
+                self._tracer_span.__exit__(exc_type, exc_value, traceback)
+        return False
+
+
+class Instrumentation(object):
+    """
+    Collects per-operation call counts, errors, latency histograms and response sizes of backend calls, and forwards
+    every call to hooks and, optionally, to OpenTelemetry spans.
+
+    Backends only pay for it when an instrumentation is given to them or installed as default.
+    """
+
+    def __init__(self, hooks=(), tracer=None, buckets=DEFAULT_LATENCY_BUCKETS, clock=time.time):
+        """
+        Initialization.
+
+        :param hooks: Functions called with a CallEvent after every call.
+        :param tracer: Optional OpenTelemetry tracer (see with_opentelemetry). Every call runs in a span.
+        :param buckets: Upper bounds, in seconds, of the latency histogram buckets.
+        :param clock: Function returning the current time in seconds.
+        """
+        self.hooks = list(hooks)
+        self.tracer = tracer
+        self.clock = clock
+        self._buckets = buckets
+        self._operations = {}
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def with_opentelemetry(cls, tracer_name='param_teller', **kwargs):
+        # type: (str) -> Instrumentation
+        """
+        Build an instrumentation that also reports every call as an OpenTelemetry span.
+
+        Requires the opentelemetry-api package (pip install param_teller[opentelemetry]).
+
+        :param tracer_name: Name of the tracer.
+        :param kwargs: Other Instrumentation arguments.
+        :return: Instrumentation.
+        """
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            raise ImportError('OpenTelemetry spans require the opentelemetry-api package: '
+                              'pip install param_teller[opentelemetry]')
+        return cls(tracer=trace.get_tracer(tracer_name), **kwargs)
+
+    def add_hook(self, hook):
+        # type: (callable) -> None
+        """
+        Register a function called with a CallEvent after every call.
+
+        :param hook: Hook function.
+        """
+        self.hooks.append(hook)
+
+    def watch_cache(self, name, cached_store):
+        # type: (str, param_teller.cache.CachedStore) -> None
+        """
+        Include the statistics (hit ratio included) of a cache in as_dict.
+
+        :param name: Name of the cache in the report.
+        :param cached_store: Cache to report.
+        """
+        self._caches[name] = cached_store
+
+    def wrap(self, service, operation, function):
+        # type: (str, str, callable) -> callable
+        """
+        Instrument a client method: every attempt (retries included) is recorded as a call.
+
+        :param service: AWS service name (e.g. ssm).
+        :param operation: Client operation name (e.g. get_parameters).
+        :param function: Client method.
+        :return: Function with the same arguments as the client method.
+        """
+        def instrumented(**kwargs):
+            with self.span(service, operation) as span:
+                response = function(**kwargs)
+                span.size = response_size(response)
+                return response
+
+        return instrumented
+
+    def span(self, service, operation):
+        """
+        Time a block of code as a call of an operation.
+
+        :param service: Service name.
+        :param operation: Operation name.
+        :return: Context manager.
+        """
+        return _Span(self, service, operation)
+
+    def record(self, service, operation, duration, size=0, error=None):
+        # type: (str, str, float, int, Exception) -> None
+        """
+        Record a completed call and notify the hooks. Hooks that fail are logged and do not affect the call.
+
+        :param service: Service name.
+        :param operation: Operation name.
+        :param duration: Duration, in seconds.
+        :param size: Size, in bytes, of the response body.
+        :param error: Raised exception or None.
+        """
+        name = '{service}.{operation}'.format(service=service, operation=operation)
+        with self._lock:
+            stats = self._operations.get(name)
+            if stats is None:
+                stats = self._operations[name] = OperationStats(self._buckets)
+            stats.calls += 1
+            stats.errors += error is not None
+            stats.bytes += size or 0
+            stats.latency.observe(duration)
+
+        if self.hooks:
+            event = CallEvent(service, operation, duration, size, error)
+            for hook in self.hooks:
+                try:
+                    hook(event)
+                except Exception:
+                    logger.exception('Instrumentation hook failed for %s', name)
+
+    def calls(self, name=None):
+        # type: (str) -> int
+        """
+        Count calls.
+
+        :param name: "<service>.<operation>" or "<service>". Counts every call if not given.
+        :return: Number of calls.
+        """
+        with self._lock:
+            return sum(stats.calls for operation, stats in self._operations.items()
+                       if name is None or operation == name or operation.startswith(name + '.'))
+
+    @property
+    def pages(self):
+        # type: () -> int
+        """
+        Number of listing pages fetched.
+        """
+        with self._lock:
+            return sum(stats.calls for operation, stats in self._operations.items()
+                       if operation.split('.', 1)[-1] in PAGINATED_OPERATIONS)
+
+    def as_dict(self):
+        # type: () -> dict
+        """
+        Export every counter.
+
+        :return: Dictionary with the statistics of every operation (indexed by "<service>.<operation>"), the number of
+            pages fetched and the statistics of watched caches.
+        """
+        with self._lock:
+            operations = {name: stats.as_dict() for name, stats in self._operations.items()}
+        return {
+            'operations': operations,
+            'pages': self.pages,
+            'caches': {name: cache.stats.as_dict() for name, cache in self._caches.items()},
+        }
+
+    def reset(self):
+        # type: () -> None
+        """
+        Clear the counters of every operation.
+        """
+        with self._lock:
+            self._operations.clear()
+
+
+def response_size(response):
+    # type: (dict) -> int
+    """
+    Read the size of a response body from its HTTP headers.
+
+    :param response: boto3 response.
+    :return: Content length or 0 if not reported.
+    """
+    try:
+        return int(response['ResponseMetadata']['HTTPHeaders']['content-length'])
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+def span(instrumentation, service, operation):
+    """
+    Time a block of code if instrumentation is enabled.
+
+    :param instrumentation: Instrumentation or None.
+    :param service: Service name.
+    :param operation: Operation name.
+    :return: Context manager.
+    """
+    return instrumentation.span(service, operation) if instrumentation is not None else _NO_SPAN
+
+
+_default_instrumentation = None
+
+
+def default_instrumentation():
+    # type: () -> Instrumentation
+    """
+    Process-wide instrumentation used by every backend created without an explicit one.
+
+    :return: Instrumentation or None (the default) when disabled.
+    """
+    return _default_instrumentation
+
+
+def set_default_instrumentation(instrumentation):
+    # type: (Instrumentation) -> None
+    """
+    Enable (or, with None, disable) instrumentation for every backend created without an explicit one.
+
+    :param instrumentation: New default instrumentation.
+    """
+    global _default_instrumentation
+    _default_instrumentation = instrumentation
@@ -0,0 +1,87 @@
+from param_teller.parameter_store import normalize_path
+
+
+class ParameterNotFound(KeyError):
+    """
+    Raised by OfflineStore for keys that are not available.
+
+    Carries an AWS-like error response so code handling ParameterNotFound/ResourceNotFoundException errors (e.g.
+    negative caching in CachedStore) treats it the same way, without importing botocore.
+    """
+
+    def __init__(self, key):
+        super(ParameterNotFound, self).__init__(key)
+        self.response = {'Error': {'Code': 'ParameterNotFound',
+                                   'Message': 'Parameter {key} not found.'.format(key=key)}}
+
+
+class OfflineStore(object):
+    """
+    Read-only backend serving values from memory, e.g. from an on-disk snapshot. It never calls AWS nor imports boto3.
+    """
+
+    def __init__(self, values):
+        """
+        Initialize new offline store.
+
+        :param values: Dictionary of values indexed by key.
+        """
+        self._values = dict(values)
+
+    @classmethod
+    def from_snapshot(cls, snapshot_file, namespace):
+        # type: (param_teller.snapshot.SnapshotFile, str) -> OfflineStore
+        """
+        Build an offline store from a snapshot saved on disk.
+
+        :param snapshot_file: Snapshot cache.
+        :param namespace: Namespace of the snapshot (see ProjectStore.snapshot_namespace).
+        :return: Offline store or None if there is no usable snapshot.
+        """
+        snapshot = snapshot_file.load(namespace)
+        return cls(snapshot.values) if snapshot is not None else None
+
+    def get_value(self, key):
+        # type: (str) -> str
+        """
+        Retrieve single value.
+
+        :param key: Parameter name.
+        :return: Parameter value.
+        """
+        try:
+            return self._values[key]
+        except KeyError:
+            raise ParameterNotFound(key)
+
+    def get_values(self, *keys):
+        # type: (str) -> dict
+        """
+        Retrieve values by key names.
+
+        :param keys: keys to retrieve.
+        :return: Dictionary of values indexed by key (includes only found keys).
+        """
+        return {key: self._values[key] for key in keys if key in self._values}
+
+    def get_values_by_path(self, path):
+        # type: (str) -> dict
+        """
+        Retrieve all values directly in a path (not in nested paths), like ParameterStore.get_values_by_path.
+
+        :param path: Path where the parameters are store.
+        :return: Dictionary of values indexed by key.
+        """
+        base = normalize_path(path).rstrip('/') + '/'
+        return {key: value for key, value in self._values.items()
+                if key.startswith(base) and '/' not in key[len(base):]}
+
+    def get_values_by_prefix(self, prefix=''):
+        # type: (str) -> dict
+        """
+        Retrieve all values for keys that start with given prefix.
+
+        :param prefix: Key name prefix.
+        :return: Dictionary of values indexed by key.
+        """
+        return {key: value for key, value in self._values.items() if key.startswith(prefix)}
@@ -1,5 +1,132 @@
-import botocore
-from boto3 import client
+import functools
+
+from param_teller.clients import client
+from param_teller.instrumentation import default_instrumentation
+from param_teller.throttle import default_throttle
+from param_teller.utils import DEFAULT_MAX_WORKERS, chunks, error_code, map_concurrently, paginate, pipeline, unique
+
+# Maximum number of names accepted by a single GetParameters call.
+GET_PARAMETERS_MAX_NAMES = 10
+
+# Maximum page size of GetParametersByPath.
+GET_PARAMETERS_BY_PATH_MAX_RESULTS = 10
+
+# Maximum page size of DescribeParameters.
+DESCRIBE_PARAMETERS_MAX_RESULTS = 50
+
+# Maximum number of names accepted by a single DeleteParameters call.
+DELETE_PARAMETERS_MAX_NAMES = 10
+
+# Results of writes, per key.
+CREATED = 'created'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+DELETED = 'deleted'
+FAILED = 'failed'
+
+
+def normalize_path(path):
+    # type: (str) -> str
+    """
+    Normalize a parameter path for GetParametersByPath.
+
+    :param path: User provided path.
+    :return: Path without surrounding whitespace and with a leading '/'.
+    """
+    # In AWS, a leading path is not required, i.e. "/param" and "param" match the same key and are not unique
+    # However, boto3 and moto (corresponding mocking library) require a leading path:
+    # http://boto3.readthedocs.io/en/latest/reference/services/ssm.html#SSM.Client.get_parameters_by_path
+    # Therefore we are enforcing the leading '/'
+    path = path.strip()
+    if path and not path.startswith("/"):
+        path = "/{path}".format(path=path)
+    return path
+
+
+def parameter_version(param):
+    # type: (dict) -> str
+    """
+    Build a version stamp for a parameter described by DescribeParameters or GetParameter(s).
+
+    :param param: Parameter metadata.
+    :return: Version stamp that changes whenever the parameter value changes.
+    """
+    modified = param.get('LastModifiedDate')
+    return '{version}:{modified}'.format(
+        version=param.get('Version', ''),
+        modified=modified.isoformat() if hasattr(modified, 'isoformat') else modified or '')
+
+
+class ParameterError(Exception):
+    """
+    Error reported for a single parameter of a batch write (e.g. a name DeleteParameters reported as invalid).
+
+    Carries an AWS-like error response, like the ClientError raised by the SSM client.
+    """
+
+    def __init__(self, key, code, message=None):
+        super(ParameterError, self).__init__(
+            '{key}: {code} {message}'.format(key=key, code=code, message=message or ''))
+        self.key = key
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class WriteReport(object):
+    """
+    Result of a batch write, per key: CREATED, UPDATED, UNCHANGED, DELETED or FAILED (with the error in errors).
+    """
+
+    def __init__(self, results=None, errors=None):
+        """
+        Initialization.
+
+        :param results: Dictionary of results indexed by key.
+        :param errors: Dictionary of exceptions indexed by failed key.
+        """
+        self.results = dict(results or {})
+        self.errors = dict(errors or {})
+
+    def update(self, other):
+        # type: (WriteReport) -> None
+        self.results.update(other.results)
+        self.errors.update(other.errors)
+
+    def _keys(self, result):
+        return sorted(key for key, key_result in self.results.items() if key_result == result)
+
+    @property
+    def created(self):
+        return self._keys(CREATED)
+
+    @property
+    def updated(self):
+        return self._keys(UPDATED)
+
+    @property
+    def unchanged(self):
+        return self._keys(UNCHANGED)
+
+    @property
+    def deleted(self):
+        return self._keys(DELETED)
+
+    @property
+    def failed(self):
+        return self._keys(FAILED)
+
+    @property
+    def ok(self):
+        # type: () -> bool
+        """
+        True if no write failed.
+        """
+        return not self.errors
+
+    def __repr__(self):
+        return 'WriteReport(created={created}, updated={updated}, deleted={deleted}, unchanged={unchanged}, ' \
+               'failed={failed})'.format(created=len(self.created), updated=len(self.updated),
+                                         deleted=len(self.deleted), unchanged=len(self.unchanged),
+                                         failed=len(self.failed))
 
 
 class ParameterStore(object):
@@ -7,17 +134,49 @@ class ParameterStore(object):
     Retrieves parameters from AWS Parameter Store.
     """
 
-    def __init__(self, ssm_client=None, with_decryption=True):
-        # type: (botocore.client.SSM, bool) -> None
+    def __init__(self, ssm_client=None, with_decryption=True, max_workers=DEFAULT_MAX_WORKERS, throttle=None,
+                 instrumentation=None):
+        # type: (botocore.client.SSM, bool, int, param_teller.throttle.Throttle, Instrumentation) -> None
         """
         Initialize new parameter store client.
 
-        :param ssm_client: Optional client provided by user. By default, it creates a new client using the default
-            session.
+        :param ssm_client: Optional client provided by user. By default, a client shared by the whole process is
+            created on first use.
         :param with_decryption: If true, parameter store will decrypt values.
+        :param max_workers: Maximum number of concurrent requests used when fetching values in batches.
+        :param throttle: Rate limiter and retry policy for AWS calls. By default, the process-wide throttle.
+        :param instrumentation: Collector of call counts and latencies. By default, the process-wide instrumentation
+            (disabled unless installed with set_default_instrumentation).
         """
-        self._ssm_client = ssm_client or client('ssm')
+        self._client = ssm_client
         self._with_decryption = with_decryption
+        self._max_workers = max_workers
+        self._throttle = throttle
+        self._instrumentation = instrumentation
+
+    @property
+    def _ssm_client(self):
+        """
+        SSM client, created (and boto3 imported) on first use.
+        """
+        if self._client is None:
+            self._client = client('ssm')
+        return self._client
+
+    def _call(self, operation, **kwargs):
+        """
+        Call an SSM operation through the rate limiter, retrying throttled calls and transient failures.
+
+        :param operation: Client method name (e.g. get_parameters).
+        :param kwargs: Operation arguments.
+        :return: Operation response.
+        """
+        throttle = self._throttle or default_throttle()
+        function = getattr(self._ssm_client, operation)
+        instrumentation = self._instrumentation or default_instrumentation()
+        if instrumentation is not None:
+            function = instrumentation.wrap('ssm', operation, function)
+        return throttle.call('ssm', operation, function, **kwargs)
 
     def get_value(self, key):
         # type: (str) -> str
@@ -27,7 +186,8 @@ class ParameterStore(object):
         :param key:
         :return:
         """
-        response = self._ssm_client.get_parameter(
+        response = self._call(
+            'get_parameter',
             Name=key,
             WithDecryption=self._with_decryption
         )
@@ -41,32 +201,38 @@ class ParameterStore(object):
         :param path: Path where the parameters are store.
         :return: Dictionary of parameter values indexed by parameter key.
         """
+        return dict(self.iter_values_by_path(path))
 
-        # In AWS, a leading path is not required, i.e. "/param" and "param" match the same key and are not unique
-        # However, boto3 and moto (corresponding mocking library) require a leading path:
-        # http://boto3.readthedocs.io/en/latest/reference/services/ssm.html#SSM.Client.get_parameters_by_path
-        # Therefore we are enforcing the leading '/'
-        path = path.strip()
-        if path and not path.startswith("/"):
-            path = "/{path}".format(path=path)
+    def iter_values_by_path(self, path, recursive=False):
+        # type: (str, bool) -> iter
+        """
+        Iterate over all parameter values in a user provider path, page by page.
 
-        values = {}
-        extra_args = {}
-        while True:
-            response = self._ssm_client.get_parameters_by_path(
-                Path=path,
-                WithDecryption=self._with_decryption,
-                **extra_args
-            )
-            values.update({param['Name']: param['Value'] for param in response['Parameters']})
+        :param path: Path where the parameters are store.
+        :param recursive: If true, include parameters in nested paths.
+        :return: Generator of (parameter key, parameter value) tuples.
+        """
+        for param in self._iter_parameters_by_path(path, recursive):
+            yield param['Name'], param['Value']
 
-            next_token = response.get('NextToken')
-            if not next_token:
-                break
+    def _iter_parameters_by_path(self, path, recursive=False):
+        # type: (str, bool) -> iter
+        """
+        Iterate over all parameters in a user provider path, page by page.
 
-            extra_args['NextToken'] = next_token
+        :param path: Path where the parameters are store.
+        :param recursive: If true, include parameters in nested paths.
+        :return: Generator of parameters as returned by GetParametersByPath (with Name, Value and Type).
+        """
+        path = normalize_path(path)
 
-        return values
+        for response in paginate(functools.partial(self._call, 'get_parameters_by_path'),
+                                 Path=path,
+                                 Recursive=recursive,
+                                 MaxResults=GET_PARAMETERS_BY_PATH_MAX_RESULTS,
+                                 WithDecryption=self._with_decryption):
+            for param in response['Parameters']:
+                yield param
 
     def get_values(self, *keys):
         # type: (str) -> dict
@@ -76,27 +242,62 @@ class ParameterStore(object):
         :param keys: keys to retrieve.
         :return: Dictionary of parameter values indexed by parameter key (includes only found keys).
         """
+        values, _ = self.get_values_with_invalid_keys(*keys)
+        return values
 
-        if not keys:
-            return {}
+    def get_values_with_invalid_keys(self, *keys):
+        # type: (str) -> tuple
+        """
+        Retrieve parameter values by key names, reporting keys that could not be found.
+
+        Keys are split in chunks of at most GET_PARAMETERS_MAX_NAMES names (the limit of a single GetParameters call)
+        and chunks are fetched concurrently.
 
+        :param keys: keys to retrieve.
+        :return: Tuple with a dictionary of parameter values indexed by parameter key and the set of invalid or
+            missing keys.
+        """
         values = {}
-        extra_args = {}
-        while True:
-            response = self._ssm_client.get_parameters(
-                Names=keys,
-                WithDecryption=self._with_decryption,
-                **extra_args
-            )
-            values.update({param['Name']: param['Value'] for param in response['Parameters']})
+        invalid_keys = set()
+        if not keys:
+            return values, invalid_keys
 
-            next_token = response.get('NextToken')
-            if not next_token:
-                break
+        results = map_concurrently(
+            self._get_chunk,
+            chunks(unique(keys), GET_PARAMETERS_MAX_NAMES),
+            self._max_workers)
+        for chunk_values, chunk_invalid_keys in results:
+            values.update(chunk_values)
+            invalid_keys.update(chunk_invalid_keys)
 
-            extra_args['NextToken'] = next_token
+        return values, invalid_keys
 
-        return values
+    def _get_chunk_parameters(self, keys):
+        # type: (list) -> list
+        """
+        Retrieve a single chunk of parameters with one GetParameters call.
+
+        :param keys: keys to retrieve (at most GET_PARAMETERS_MAX_NAMES).
+        :return: List of parameters as returned by GetParameters (with Name, Value and Type), in request order.
+        """
+        response = self._call(
+            'get_parameters',
+            Names=keys,
+            WithDecryption=self._with_decryption
+        )
+        params = {param['Name']: param for param in response.get('Parameters', [])}
+        return [params[key] for key in keys if key in params]
+
+    def _get_chunk(self, keys):
+        # type: (list) -> tuple
+        """
+        Retrieve a single chunk of parameters with one GetParameters call.
+
+        :param keys: keys to retrieve (at most GET_PARAMETERS_MAX_NAMES).
+        :return: Tuple with a dictionary of found values and the set of invalid keys.
+        """
+        values = {param['Name']: param['Value'] for param in self._get_chunk_parameters(keys)}
+        return values, set(key for key in keys if key not in values)
 
     def get_values_by_prefix(self, prefix=''):
         # type: (str) -> dict
@@ -106,25 +307,190 @@ class ParameterStore(object):
         :param prefix: Key name prefix.
         :return: Dictionary of parameter values indexed by parameter key.
         """
-        keys = []
+        return dict(self.iter_values_by_prefix(prefix))
 
-        filters = [{'Key': 'Name', 'Values': ['{prefix}'.format(prefix=prefix)]}] if prefix else []
-        extra_args = {}
-        while True:
-            response = self._ssm_client.describe_parameters(
-                Filters=filters,
-                **extra_args
-            )
-            keys += [param.get('Name') for param in response.get('Parameters', [])]
+    def iter_values_by_prefix(self, prefix=''):
+        # type: (str) -> iter
+        """
+        Iterate over all parameter values for keys that start with given prefix, page by page.
 
-            next_token = response.get('NextToken')
-            if not next_token:
-                break
+        Path prefixes (e.g. "/service/") are read recursively with GetParametersByPath, which returns names and values
+        in a single pass. Other prefixes are listed with DescribeParameters while the values of the pages already
+        listed are fetched concurrently.
 
-            extra_args['NextToken'] = next_token
+        :param prefix: Key name prefix.
+        :return: Generator of (parameter key, parameter value) tuples.
+        """
+        return ((param['Name'], param['Value']) for param in self._iter_parameters_by_prefix(prefix))
 
-        values = {}
-        if keys:
-            values = self.get_values(*keys)
+    def _iter_parameters_by_prefix(self, prefix):
+        # type: (str) -> iter
+        """
+        Iterate over all parameters whose key starts with given prefix (see iter_values_by_prefix).
 
-        return values
+        :param prefix: Key name prefix.
+        :return: Generator of parameters (with Name, Value and Type).
+        """
+        if prefix.startswith('/') and prefix.endswith('/'):
+            return self._iter_parameters_by_path(prefix.rstrip('/') or '/', recursive=True)
+        return self._iter_parameters_by_name_prefix(prefix)
+
+    def _iter_parameters_by_name_prefix(self, prefix):
+        # type: (str) -> iter
+        """
+        Iterate over all parameters whose key starts with given prefix, overlapping listing and fetching.
+
+        :param prefix: Key name prefix.
+        :return: Generator of parameters (with Name, Value and Type).
+        """
+        batches = (chunk
+                   for params in self._iter_described_pages(prefix)
+                   for chunk in chunks([param['Name'] for param in params], GET_PARAMETERS_MAX_NAMES))
+        return pipeline(batches, self._get_chunk_parameters, self._max_workers)
+
+    def get_versions_by_prefix(self, prefix=''):
+        # type: (str) -> dict
+        """
+        Retrieve the version of every parameter whose key starts with given prefix, without fetching values.
+
+        :param prefix: Key name prefix.
+        :return: Dictionary of parameter versions indexed by parameter key.
+        """
+        return {param['Name']: parameter_version(param)
+                for params in self._iter_described_pages(prefix)
+                for param in params}
+
+    def iter_keys_by_prefix(self, prefix=''):
+        # type: (str) -> iter
+        """
+        Iterate over the keys that start with given prefix, page by page, without fetching values.
+
+        :param prefix: Key name prefix.
+        :return: Generator of parameter keys.
+        """
+        for params in self._iter_described_pages(prefix):
+            for param in params:
+                yield param['Name']
+
+    def _iter_described_pages(self, prefix):
+        # type: (str) -> iter
+        """
+        List the metadata of parameters whose key starts with given prefix, using DescribeParameters' largest page.
+
+        :param prefix: Key name prefix.
+        :return: Generator of lists of parameter metadata, one list per page.
+        """
+        filters = [{'Key': 'Name', 'Option': 'BeginsWith', 'Values': [prefix]}] if prefix else []
+        for response in paginate(functools.partial(self._call, 'describe_parameters'),
+                                 ParameterFilters=filters,
+                                 MaxResults=DESCRIBE_PARAMETERS_MAX_RESULTS):
+            # AWS ignores the leading '/' when matching names, so the prefix is enforced here as well.
+            yield [param for param in response.get('Parameters', []) if param.get('Name', '').startswith(prefix)]
+
+    def put_values(self, values, parameter_type='SecureString', key_id=None, overwrite=True):
+        # type: (dict, str, str, bool) -> WriteReport
+        """
+        Write parameters concurrently (one PutParameter call per key), through the rate limiter.
+
+        A failed write does not stop the others: it is reported in the result. Throttled writes are retried.
+
+        :param values: Dictionary of parameter values indexed by parameter key.
+        :param parameter_type: Type of the parameters (String, StringList or SecureString).
+        :param key_id: KMS key used to encrypt SecureString parameters. By default, the account's default key.
+        :param overwrite: If false, existing parameters are not overwritten (and reported as failed).
+        :return: Report of CREATED, UPDATED and FAILED keys.
+        """
+        options = {'Type': parameter_type, 'Overwrite': overwrite}
+        if key_id is not None:
+            options['KeyId'] = key_id
+
+        report = WriteReport()
+        for key, result, error in map_concurrently(
+                lambda item: self._put_value(item[0], item[1], options), sorted(values.items()), self._max_workers):
+            report.results[key] = result
+            if error is not None:
+                report.errors[key] = error
+        return report
+
+    def _put_value(self, key, value, options):
+        # type: (str, str, dict) -> tuple
+        """
+        Write a single parameter.
+
+        :return: Tuple with the key, its result and the error, if it failed.
+        """
+        try:
+            response = self._call('put_parameter', Name=key, Value=value, **options)
+        except Exception as error:
+            if error_code(error) is None:
+                raise
+            return key, FAILED, error
+        return key, CREATED if response.get('Version') == 1 else UPDATED, None
+
+    def delete_values(self, *keys):
+        # type: (str) -> WriteReport
+        """
+        Delete parameters, in chunks of DELETE_PARAMETERS_MAX_NAMES names deleted concurrently.
+
+        :param keys: keys to delete.
+        :return: Report of DELETED and FAILED keys (including keys that did not exist).
+        """
+        report = WriteReport()
+        for chunk_report in map_concurrently(
+                self._delete_chunk, chunks(unique(keys), DELETE_PARAMETERS_MAX_NAMES), self._max_workers):
+            report.update(chunk_report)
+        return report
+
+    def _delete_chunk(self, keys):
+        # type: (list) -> WriteReport
+        """
+        Delete a single chunk of parameters with one DeleteParameters call.
+
+        :param keys: keys to delete (at most DELETE_PARAMETERS_MAX_NAMES).
+        :return: Report of the chunk.
+        """
+        try:
+            response = self._call('delete_parameters', Names=keys)
+        except Exception as error:
+            if error_code(error) is None:
+                raise
+            return WriteReport({key: FAILED for key in keys}, {key: error for key in keys})
+
+        report = WriteReport({key: DELETED for key in response.get('DeletedParameters', [])})
+        for key in response.get('InvalidParameters', []):
+            report.results[key] = FAILED
+            report.errors[key] = ParameterError(key, 'ParameterNotFound')
+        return report
+
+    def sync_prefix(self, prefix, values, delete=True, parameter_type='SecureString', key_id=None):
+        # type: (str, dict, bool, str, str) -> WriteReport
+        """
+        Make the parameters under a prefix match the desired values (e.g. to promote an environment), writing only
+        what differs: new parameters, and parameters whose value or type changed, are put concurrently, and parameters
+        that are not desired any more are deleted.
+
+        The current values are read like get_values_by_prefix does, so the store must decrypt values (with_decryption)
+        for SecureString parameters to be compared.
+
+        :param prefix: Key name prefix, as accepted by get_values_by_prefix.
+        :param values: Dictionary of desired parameter values indexed by parameter key. Every key must start with the
+            prefix.
+        :param delete: If false, parameters under the prefix missing from values are kept.
+        :param parameter_type: Type of the parameters written (String, StringList or SecureString).
+        :param key_id: KMS key used to encrypt SecureString parameters.
+        :return: Report of CREATED, UPDATED, UNCHANGED, DELETED and FAILED keys.
+        """
+        outside = sorted(key for key in values if not key.startswith(prefix))
+        if outside:
+            raise ValueError('Keys outside of prefix {prefix}: {keys}'.format(prefix=prefix, keys=', '.join(outside)))
+
+        current = {param['Name']: param for param in self._iter_parameters_by_prefix(prefix)}
+        changed = {key: value for key, value in values.items()
+                   if key not in current
+                   or (current[key]['Value'], current[key].get('Type')) != (value, parameter_type)}
+
+        report = WriteReport({key: UNCHANGED for key in values if key not in changed})
+        report.update(self.put_values(changed, parameter_type=parameter_type, key_id=key_id))
+        if delete:
+            report.update(self.delete_values(*sorted(set(current) - set(values))))
+        return report
@@ -0,0 +1,183 @@
+# Marks nodes without a value (they only hold children). None cannot be used: it is a valid value.
+_MISSING = object()
+
+
+class _Node(object):
+    """
+    Node of a PathTree: the value stored at a path, if any, and the child nodes indexed by path segment.
+    """
+
+    __slots__ = ('value', 'children')
+
+    def __init__(self):
+        self.value = _MISSING
+        self.children = None
+
+
+class PathTree(object):
+    """
+    Read-only trie of values indexed by hierarchical keys (e.g. "/proj-env-svc/db/replica/host").
+
+    Keys are stored relative to a prefix and split on a separator, so lookups cost O(depth) and sub-paths can be
+    extracted and iterated from memory. Subtrees share the nodes of their tree: extracting one copies nothing.
+    """
+
+    def __init__(self, prefix='', separator='/', root=None):
+        """
+        Initialize an empty tree (see from_values to build one from loaded values).
+
+        :param prefix: Prefix of the full keys, stripped from the relative keys.
+        :param separator: Path separator.
+        :param root: Root node, used by subtrees.
+        """
+        self.prefix = prefix
+        self.separator = separator
+        self._root = root if root is not None else _Node()
+
+    @classmethod
+    def from_values(cls, values, prefix='', separator='/'):
+        # type: (dict, str, str) -> PathTree
+        """
+        Build a tree from values indexed by full key.
+
+        :param values: Dictionary of values indexed by full key. Keys that do not start with the prefix are ignored.
+        :param prefix: Prefix of the full keys (e.g. ProjectStore's service prefix).
+        :param separator: Path separator.
+        :return: Tree.
+        """
+        tree = cls(prefix, separator)
+        for key, value in values.items():
+            if key.startswith(prefix):
+                tree._insert(key[len(prefix):], value)
+        return tree
+
+    def _segments(self, path):
+        # type: (str) -> list
+        """
+        Split a relative path, ignoring leading and trailing separators.
+        """
+        path = path.strip(self.separator)
+        return path.split(self.separator) if path else []
+
+    def _insert(self, path, value):
+        node = self._root
+        for segment in self._segments(path):
+            if node.children is None:
+                node.children = {}
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _Node()
+            node = child
+        node.value = value
+
+    def _find(self, path):
+        # type: (str) -> _Node
+        node = self._root
+        for segment in self._segments(path):
+            if node.children is None:
+                return None
+            node = node.children.get(segment)
+            if node is None:
+                return None
+        return node
+
+    def get(self, path, default=None):
+        """
+        Look up a value by relative key.
+
+        :param path: Key relative to the prefix (e.g. "db/replica/host").
+        :param default: Value returned if there is no value at the path.
+        :return: Value.
+        """
+        node = self._find(path)
+        return node.value if node is not None and node.value is not _MISSING else default
+
+    def __getitem__(self, path):
+        node = self._find(path)
+        if node is None or node.value is _MISSING:
+            raise KeyError(path)
+        return node.value
+
+    def __contains__(self, path):
+        node = self._find(path)
+        return node is not None and node.value is not _MISSING
+
+    def __len__(self):
+        return sum(1 for _ in self._iter_nodes(self._root, ''))
+
+    def __iter__(self):
+        return self.keys()
+
+    def subtree(self, path):
+        # type: (str) -> PathTree
+        """
+        Extract the values under a sub-path, without copying them.
+
+        :param path: Sub-path relative to the prefix (e.g. "db/replica").
+        :return: Tree whose relative keys are relative to the sub-path (empty if nothing is stored under it).
+        """
+        segments = self._segments(path)
+        prefix = self.prefix + ''.join(segment + self.separator for segment in segments)
+        node = self._find(path)
+        return PathTree(prefix, self.separator, node if node is not None else _Node())
+
+    def items(self, path=''):
+        """
+        Iterate over the values under a sub-path, sorted by key.
+
+        :param path: Sub-path relative to the prefix. By default, the whole tree.
+        :return: Generator of (relative key, value) tuples. Keys are relative to the tree, not to the sub-path.
+        """
+        node = self._find(path)
+        if node is None:
+            return iter(())
+        return self._iter_nodes(node, self.separator.join(self._segments(path)))
+
+    def keys(self, path=''):
+        """
+        Iterate over the relative keys under a sub-path, sorted.
+
+        :param path: Sub-path relative to the prefix. By default, the whole tree.
+        :return: Generator of relative keys.
+        """
+        return (key for key, _ in self.items(path))
+
+    def full_items(self, path=''):
+        """
+        Iterate over the values under a sub-path with their full keys, as returned by the backend.
+
+        :param path: Sub-path relative to the prefix. By default, the whole tree.
+        :return: Generator of (full key, value) tuples.
+        """
+        return ((self.prefix + key, value) for key, value in self.items(path))
+
+    def _iter_nodes(self, node, path):
+        if node.value is not _MISSING:
+            yield path, node.value
+        if node.children is not None:
+            base = path + self.separator if path else ''
+            for segment in sorted(node.children):
+                for item in self._iter_nodes(node.children[segment], base + segment):
+                    yield item
+
+    def to_dict(self):
+        # type: () -> dict
+        """
+        Convert the tree to nested dictionaries indexed by path segment.
+
+        A path holding both a value and sub-paths (e.g. "db" and "db/host") keeps its value under the '' key.
+
+        :return: Nested dictionaries. A tree with a value at its root and no sub-path converts to that value.
+        """
+        return self._to_dict(self._root)
+
+    def _to_dict(self, node):
+        if node.children is None:
+            return node.value if node.value is not _MISSING else {}
+        result = {segment: self._to_dict(child) for segment, child in node.children.items()}
+        if node.value is not _MISSING:
+            result[''] = node.value
+        return result
+
+    def __repr__(self):
+        return 'PathTree(prefix={prefix!r}, keys={count})'.format(prefix=self.prefix, count=len(self))
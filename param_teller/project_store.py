@@ -1,5 +1,29 @@
+import os
+
+from param_teller.delta import DeltaSync
+from param_teller.instrumentation import default_instrumentation, span
 from param_teller.parameter_store import ParameterStore
-from param_teller.secrets_manager import SecretsManager
+from param_teller.path_tree import PathTree
+from param_teller.refresh import DEFAULT_INTERVAL, DEFAULT_JITTER, SnapshotRefresher
+from param_teller.secrets_manager import DEFAULT_LISTING_TTL, SecretsManager
+from param_teller.snapshot import SnapshotLoader
+
+
+def service_prefix(project, env, service, key_separator='/', lead_separator=False):
+    # type: (str, str, str, str, bool) -> str
+    """
+    Compute the prefix shared by every key of a service according to CZI's convention.
+
+    :param project: Project name.
+    :param env: Environment name (e.g. prod, staging, dev)
+    :param service: Service name.
+    :param key_separator: Custom separator to use if we do not want to use paths.
+    :param lead_separator: If true, keys start with the separator.
+    :return: Key prefix (e.g. "/projx-prod-servicey/").
+    """
+    return "{lead}{project}-{env}-{service}{separator}".format(
+        project=project, env=env, service=service, separator=key_separator or '',
+        lead=(key_separator or '') if lead_separator else '')
 
 
 class ProjectStore(object):
@@ -7,7 +31,7 @@ class ProjectStore(object):
     Wrapper to the parameter store to access keys using CZI's service name conventions.
     """
 
-    def __init__(self, backend, project, env, service, key_separator='/', lead_separator=False):
+    def __init__(self, backend, project, env, service, key_separator='/', lead_separator=False, instrumentation=None):
         """
         Initialize a project store for the specified backen.
 
@@ -16,11 +40,84 @@ class ProjectStore(object):
         :param env: Environment name (e.g. prod, staging, dev)
         :param service: Service name.
         :param key_separator: Custom separator to use if we do not want to use paths.
+        :param instrumentation: Collector timing service loads (project_store.* operations). By default, the
+            process-wide instrumentation.
         """
         self._backend_store = backend
         self._path = self._get_path(project, env, service)
         self._separator = key_separator
         self._lead_separator = lead_separator
+        self._prefix = service_prefix(project, env, service, key_separator, lead_separator)
+        self._refresher = None
+        self._instrumentation = instrumentation
+        self._tree = None
+
+    def start_refresh(self, interval=DEFAULT_INTERVAL, jitter=DEFAULT_JITTER, on_change=None, snapshot_file=None,
+                      incremental=False, publisher=None):
+        # type: (float, float, callable, SnapshotFile, bool, SharedSnapshotPublisher) -> SnapshotRefresher
+        """
+        Load the service parameters once and serve reads from memory while a background thread refreshes them.
+
+        If a refresh fails, the last good snapshot keeps being served.
+
+        :param interval: Interval, in seconds, between refreshes.
+        :param jitter: Random variation, as a fraction of the interval, applied to every refresh.
+        :param on_change: Optional callback called as on_change(key, old_value, new_value) for every changed key.
+        :param snapshot_file: Optional on-disk snapshot cache. When it holds a usable snapshot, reads are served from
+            it right away and it is revalidated in the background. Refreshes are always incremental in this mode.
+        :param incremental: If true, refreshes list parameter versions and fetch only the values that changed.
+        :param publisher: Optional SharedSnapshotPublisher (see param_teller.shared_snapshot) publishing every snapshot
+            in shared memory for worker processes.
+        :return: Refresher keeping the snapshot.
+        """
+        self.stop_refresh()
+
+        with span(self._instrumentation or default_instrumentation(), 'project_store', 'start_refresh'):
+            self._refresher = self._start_refresher(interval, jitter, on_change, snapshot_file, incremental, publisher)
+        return self._refresher
+
+    def _start_refresher(self, interval, jitter, on_change, snapshot_file, incremental, publisher):
+        # type: (float, float, callable, SnapshotFile, bool, SharedSnapshotPublisher) -> SnapshotRefresher
+        """
+        Build the loader matching the refresh options and start refreshing (see start_refresh).
+
+        :return: Started refresher.
+        """
+        loader, initial, from_disk = self._fetch_service_parameters, None, False
+        if snapshot_file is not None:
+            loader = SnapshotLoader(snapshot_file, self.snapshot_namespace(), self._backend_store, self._get_prefix())
+            initial = loader.initial
+            # A snapshot read from disk is revalidated right away; a cold start has just fetched fresh values.
+            from_disk = initial is not None
+            if initial is None:
+                initial = loader()
+        elif incremental:
+            loader = DeltaSync(self._backend_store, self._get_prefix()).load
+
+        if publisher is not None:
+            loader = publisher.wrap(loader)
+            if initial is not None:
+                publisher.publish(initial)
+
+        return SnapshotRefresher(loader, interval, jitter, on_change).start(initial, refresh_now=from_disk)
+
+    def snapshot_namespace(self):
+        # type: () -> str
+        """
+        Namespace under which start_refresh stores the service parameters in a SnapshotFile.
+
+        :return: Namespace made of the backend type and the service key prefix.
+        """
+        return "{backend}:{prefix}".format(backend=type(self._backend_store).__name__, prefix=self._get_prefix())
+
+    def stop_refresh(self):
+        # type: () -> None
+        """
+        Stop refreshing in the background and go back to reading from the backend on every call.
+        """
+        if self._refresher is not None:
+            self._refresher.stop()
+            self._refresher = None
 
     def get_service_parameters(self):
         # type: () -> dict
@@ -29,11 +126,42 @@ class ProjectStore(object):
 
         :return: Dictionary of parameter values indexed by parameter key.
         """
-        return self._backend_store.get_values_by_prefix(
-                prefix="{lead}{path}{separator}".format(
-                    path=self._path,
-                    separator=self._separator,
-                    lead=(self._separator if self._lead_separator else "")))
+        if self._refresher is not None:
+            return dict(self._refresher.snapshot)
+        with span(self._instrumentation or default_instrumentation(), 'project_store', 'get_service_parameters'):
+            return self._fetch_service_parameters()
+
+    def get_service_tree(self):
+        # type: () -> PathTree
+        """
+        Retrieve values for the current service as a tree of keys relative to the service prefix, to answer sub-path
+        queries (e.g. tree.subtree('db/replica')) from memory.
+
+        While refreshing, the tree is built once per snapshot; otherwise, every call fetches the values again.
+
+        :return: Tree of values.
+        """
+        if self._refresher is None:
+            return self._build_tree(self.get_service_parameters())
+
+        snapshot = self._refresher.snapshot
+        tree = self._tree
+        if tree is None or tree[0] is not snapshot:
+            tree = self._tree = (snapshot, self._build_tree(snapshot))
+        return tree[1]
+
+    def _build_tree(self, values):
+        # type: (dict) -> PathTree
+        return PathTree.from_values(values, self._prefix, self._separator or '/')
+
+    def _fetch_service_parameters(self):
+        # type: () -> dict
+        """
+        Retrieve values for the current service from the backend.
+
+        :return: Dictionary of parameter values indexed by parameter key.
+        """
+        return self._backend_store.get_values_by_prefix(prefix=self._get_prefix())
 
     def get_service_parameter(self, key):
         # type: (str) -> str
@@ -42,11 +170,23 @@ class ProjectStore(object):
         :param key: Parameter name.
         :return: Parameter Value
         """
-        return self._backend_store.get_value("{lead}{path}{separator}{key}".format(
-            path=self._path,
-            key=key,
-            separator=self._separator,
-            lead=(self._separator if self._lead_separator else "")))
+        key = self._prefix + key
+
+        if self._refresher is not None:
+            snapshot = self._refresher.snapshot
+            if key in snapshot:
+                return snapshot[key]
+
+        return self._backend_store.get_value(key)
+
+    def _get_prefix(self):
+        # type: () -> str
+        """
+        Compute the prefix shared by every key of the current service.
+
+        :return: Key prefix.
+        """
+        return self._prefix
 
     @staticmethod
     def _get_path(project, env, service):
@@ -83,21 +223,21 @@ class ProjectParameterStore(ProjectStore):
             key_separator or '/',
             key_separator is None)
 
-    def get_service_parameters(self):
+    def _fetch_service_parameters(self):
         # type: () -> dict
         """
-        Retrieve values for the current service.
+        Retrieve values for the current service from the backend.
 
         :return: Dictionary of parameter values indexed by parameter key.
         """
         return self._backend_store.get_values_by_path(path=self._path) \
             if not self._separator \
-            else super(ProjectParameterStore, self).get_service_parameters()
+            else super(ProjectParameterStore, self)._fetch_service_parameters()
 
 
 class ProjectSecretsManager(ProjectStore):
 
-    def __init__(self, project, env, service, key_separator='/'):
+    def __init__(self, project, env, service, key_separator='/', listing_ttl=DEFAULT_LISTING_TTL, listing_cache=None):
         """
         Initialization.
 
@@ -105,10 +245,72 @@ class ProjectSecretsManager(ProjectStore):
         :param env: Environment name (e.g. prod, staging, dev)
         :param service: Service name.
         :param key_separator: Custom separator to use if we do not want to use paths.
+        :param listing_ttl: Time, in seconds, the listing of the service's secret names is reused (see SecretsManager).
+        :param listing_cache: Listing cache shared with other instances (see ListingCache). It overrides listing_ttl.
         """
         super(ProjectSecretsManager, self).__init__(
-            SecretsManager(),
+            SecretsManager(listing_ttl=listing_ttl, listing_cache=listing_cache),
             project,
             env,
             service,
             key_separator)
+
+
+def get_services_parameters(backend, services, key_separator='/', lead_separator=False):
+    # type: (object, list, str, bool) -> dict
+    """
+    Retrieve values for many services at once.
+
+    Services are grouped by project and environment. Instead of one listing per service, keys are listed in a single
+    sweep over the prefix shared by the services of each group, and the values of all services are then fetched
+    together (concurrently, see the backend's get_values).
+
+    :param backend: Data storage backend.
+    :param services: Iterable of (project, env, service) tuples.
+    :param key_separator: Custom separator to use if we do not want to use paths.
+    :param lead_separator: If true, keys start with the separator.
+    :return: Dictionary of parameter values indexed by parameter key, nested by project, env and service.
+    """
+    prefixes = {}
+    groups = {}
+    for project, env, service in services:
+        prefix = service_prefix(project, env, service, key_separator, lead_separator)
+        prefixes[prefix] = (project, env, service)
+        groups.setdefault((project, env), set()).add(prefix)
+
+    result = {}
+    for project, env, service in prefixes.values():
+        result.setdefault(project, {}).setdefault(env, {})[service] = {}
+
+    # Every service of a group starts with "<project>-<env>-", so the shared prefix never widens to other projects.
+    group_prefixes = sorted(os.path.commonprefix(sorted(group)) for group in groups.values())
+    values = {}
+    if hasattr(backend, 'iter_keys_by_prefix'):
+        keys = [key for group_prefix in group_prefixes for key in backend.iter_keys_by_prefix(group_prefix)
+                if _find_prefix(key, prefixes)]
+        if keys:
+            values = backend.get_values(*keys)
+    else:
+        for group_prefix in group_prefixes:
+            values.update(backend.get_values_by_prefix(group_prefix))
+
+    for key, value in values.items():
+        prefix = _find_prefix(key, prefixes)
+        if prefix is not None:
+            project, env, service = prefixes[prefix]
+            result[project][env][service][key] = value
+
+    return result
+
+
+def _find_prefix(key, prefixes):
+    # type: (str, dict) -> str
+    """
+    Find the service prefix of a key.
+
+    :param key: Parameter key.
+    :param prefixes: Service prefixes.
+    :return: Longest prefix the key starts with, or None.
+    """
+    matches = [prefix for prefix in prefixes if key.startswith(prefix)]
+    return max(matches, key=len) if matches else None
@@ -0,0 +1,153 @@
+import logging
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Default interval, in seconds, between refreshes.
+DEFAULT_INTERVAL = 60
+
+# Default jitter, as a fraction of the interval, applied to every refresh.
+DEFAULT_JITTER = 0.1
+
+
+class SnapshotRefresher(object):
+    """
+    Keeps an in-memory snapshot of values up to date using a background thread.
+
+    Reads are served from the last good snapshot: a failed refresh is logged and the previous snapshot is kept.
+    """
+
+    def __init__(self, loader, interval=DEFAULT_INTERVAL, jitter=DEFAULT_JITTER, on_change=None):
+        """
+        Initialize new refresher.
+
+        :param loader: Function (without arguments) returning a dictionary of values indexed by key.
+        :param interval: Interval, in seconds, between refreshes.
+        :param jitter: Random variation, as a fraction of the interval, so that many processes do not refresh at the
+            same time.
+        :param on_change: Optional callback called as on_change(key, old_value, new_value) for every key whose value
+            changed. Added keys have old_value None and removed keys have new_value None.
+        """
+        self._loader = loader
+        self._interval = interval
+        self._jitter = jitter
+        self._on_change = on_change
+        self._snapshot = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.last_error = None
+        self.refresh_count = 0
+
+    @property
+    def snapshot(self):
+        # type: () -> dict
+        """
+        Last good snapshot. It must not be modified, refreshes replace it with a new dictionary.
+        """
+        return self._snapshot
+
+    @property
+    def running(self):
+        # type: () -> bool
+        """
+        Whether the background thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, initial=None, refresh_now=None):
+        # type: (dict, bool) -> SnapshotRefresher
+        """
+        Load the initial snapshot and start refreshing it in the background.
+
+        The initial load happens in the calling thread, its errors are raised and it does not trigger change
+        callbacks.
+
+        :param initial: Optional initial snapshot. If given, the loader is not called in the calling thread.
+        :param refresh_now: If true, the first refresh happens right away in the background (e.g. to revalidate an
+            initial snapshot read from disk) instead of after an interval. By default, only when an initial snapshot
+            is given.
+        :return: The refresher itself.
+        """
+        if initial is None:
+            self._snapshot = dict(self._loader())
+        else:
+            self._snapshot = dict(initial)
+        if refresh_now is None:
+            refresh_now = initial is not None
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(refresh_now,), name='param-teller-refresher')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        # type: (float) -> None
+        """
+        Stop the background thread.
+
+        :param timeout: Maximum time, in seconds, to wait for the thread to finish.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def refresh(self):
+        # type: () -> bool
+        """
+        Reload the snapshot now.
+
+        :return: True if the snapshot was refreshed, False if the loader failed and the previous snapshot was kept.
+        """
+        try:
+            values = self._loader()
+        except Exception as error:
+            self.last_error = error
+            logger.warning('Failed to refresh parameters, serving last good snapshot: %s', error)
+            return False
+        finally:
+            self.refresh_count += 1
+
+        self.last_error = None
+        self.install(values)
+        return True
+
+    def install(self, values):
+        # type: (dict) -> None
+        """
+        Replace the snapshot, notifying the keys whose values changed.
+
+        :param values: Dictionary of values indexed by key.
+        """
+        values = dict(values)
+        with self._lock:
+            previous, self._snapshot = self._snapshot, values
+
+        if self._on_change is None:
+            return
+
+        for key in set(previous) | set(values):
+            old_value, new_value = previous.get(key), values.get(key)
+            if old_value != new_value:
+                try:
+                    self._on_change(key, old_value, new_value)
+                except Exception:
+                    logger.exception('Parameter change callback failed for %s', key)
+
+    def _next_delay(self):
+        # type: () -> float
+        """
+        Compute the delay until the next refresh.
+
+        :return: Interval with jitter applied, in seconds.
+        """
+        return max(0.0, self._interval * (1 + random.uniform(-self._jitter, self._jitter)))
+
+    def _run(self, refresh_now=False):
+        if refresh_now:
+            self.refresh()
+        while not self._stopped.wait(self._next_delay()):
+            self.refresh()
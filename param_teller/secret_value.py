@@ -0,0 +1,125 @@
+import json
+
+
+class SecretValue(object):
+    """
+    Value of a secret as returned by GetSecretValue: either text (SecretString) or bytes (SecretBinary).
+
+    Bytes are kept as returned by boto3 and exposed through a memoryview, so they are never copied. The JSON document
+    of a secret is decoded on first use and kept by the instance only: the plaintext is released with it.
+    """
+
+    __slots__ = ('name', 'version_id', '_string', '_binary', '_document')
+
+    def __init__(self, name, version_id=None, string=None, binary=None):
+        """
+        Initialization.
+
+        :param name: Secret name.
+        :param version_id: Secret version, if known.
+        :param string: SecretString.
+        :param binary: SecretBinary (bytes or any object supporting the buffer protocol).
+        """
+        self.name = name
+        self.version_id = version_id
+        self._string = string
+        self._binary = binary
+        self._document = None
+
+    @classmethod
+    def from_response(cls, response, name=None):
+        # type: (dict, str) -> SecretValue
+        """
+        Build a value from a GetSecretValue response or a BatchGetSecretValue SecretValues item.
+
+        :param response: Response (or item).
+        :param name: Secret name, when the response does not carry it.
+        :return: Secret value.
+        """
+        return cls(response.get('Name') or name, response.get('VersionId'), response.get('SecretString'),
+                   response.get('SecretBinary'))
+
+    @property
+    def is_binary(self):
+        # type: () -> bool
+        """
+        True for SecretBinary secrets.
+        """
+        return self._string is None and self._binary is not None
+
+    @property
+    def string(self):
+        # type: () -> str
+        """
+        SecretString, or None for binary secrets.
+        """
+        return self._string
+
+    @property
+    def binary(self):
+        # type: () -> memoryview
+        """
+        SecretBinary as a read-only view over the bytes returned by AWS, or None for text secrets.
+        """
+        return memoryview(self._binary) if self._binary is not None else None
+
+    @property
+    def value(self):
+        """
+        SecretString or, for binary secrets, SecretBinary as returned by AWS (what SecretsManager.get_value returns).
+        """
+        return self._string if self._string is not None else self._binary
+
+    def json(self):
+        # type: () -> object
+        """
+        Decode the secret as JSON, once per instance.
+
+        The document is shared: it must not be modified.
+
+        :return: Decoded document.
+        """
+        if self._document is None:
+            text = self._string if self._string is not None else bytes(self.binary).decode('utf-8')
+            self._document = json.loads(text)
+        return self._document
+
+    def __getitem__(self, field):
+        """
+        Read a field of a JSON object secret.
+
+        :param field: Field name.
+        :return: Field value.
+        """
+        return self.json()[field]
+
+    def get(self, field, default=None):
+        """
+        Read a field of a JSON object secret.
+
+        :param field: Field name.
+        :param default: Value returned if the field does not exist.
+        :return: Field value or default.
+        """
+        return self.json().get(field, default)
+
+    def __len__(self):
+        return len(self.value) if self.value is not None else 0
+
+    def __eq__(self, other):
+        if isinstance(other, SecretValue):
+            return (self.name, self.version_id, self._string, self._binary) == \
+                   (other.name, other.version_id, other._string, other._binary)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        # The value itself is never shown.
+        return 'SecretValue(name={name!r}, version_id={version_id!r}, binary={binary})'.format(
+            name=self.name, version_id=self.version_id, binary=self.is_binary)
+
@@ -1,5 +1,167 @@
-import botocore
-from boto3 import client
+import functools
+import itertools
+import re
+import threading
+import time
+
+from param_teller.clients import client
+from param_teller.instrumentation import default_instrumentation
+from param_teller.secret_value import SecretValue
+from param_teller.throttle import default_throttle
+from param_teller.utils import (DEFAULT_MAX_WORKERS, chunks, error_code, is_not_found_error, map_concurrently, paginate,
+                                pipeline, unique)
+
+# Maximum page size of ListSecrets.
+LIST_SECRETS_MAX_RESULTS = 100
+
+# Maximum number of ids accepted by a single BatchGetSecretValue call.
+BATCH_GET_SECRET_VALUE_MAX_IDS = 20
+
+# Error codes meaning BatchGetSecretValue cannot be used (not allowed by IAM or not implemented by the endpoint), in
+# which case secrets are retrieved one by one.
+BATCH_UNAVAILABLE_ERROR_CODES = frozenset(['AccessDeniedException', 'UnknownOperationException', 'InvalidAction',
+                                           'NotImplementedException'])
+
+# Default time, in seconds, a listing of secret names is reused (disabled: secrets created elsewhere are seen at once).
+DEFAULT_LISTING_TTL = 0
+
+# Characters allowed in the values of ListSecrets filters. Other prefixes are only filtered client-side.
+_FILTER_VALUE_PATTERN = re.compile(r'^[a-zA-Z0-9 :_@/+=.\-]+$')
+
+
+def secret_version(secret):
+    # type: (dict) -> str
+    """
+    Build a version stamp for a secret listed by ListSecrets.
+
+    :param secret: Secret metadata.
+    :return: Id of the AWSCURRENT version or, if not available, the last changed date.
+    """
+    for version_id, stages in (secret.get('SecretVersionsToStages') or {}).items():
+        if 'AWSCURRENT' in stages:
+            return version_id
+
+    changed = secret.get('LastChangedDate')
+    return changed.isoformat() if hasattr(changed, 'isoformat') else changed
+
+
+def list_secrets_arguments(prefix=''):
+    # type: (str) -> dict
+    """
+    Build the ListSecrets arguments listing the secrets whose name starts with given prefix: the largest page and,
+    when the prefix allows it, a name filter applied by AWS.
+
+    The name filter of ListSecrets is case-insensitive, so results must still be checked by the caller.
+
+    :param prefix: Key name prefix.
+    :return: Dictionary of ListSecrets arguments.
+    """
+    kwargs = {'MaxResults': LIST_SECRETS_MAX_RESULTS}
+    # A leading '!' negates the filter, so such prefixes are only filtered client-side.
+    if prefix and not prefix.startswith('!') and _FILTER_VALUE_PATTERN.match(prefix):
+        kwargs['Filters'] = [{'Key': 'name', 'Values': [prefix]}]
+    return kwargs
+
+
+class SecretError(Exception):
+    """
+    Error reported by BatchGetSecretValue for a single secret.
+
+    Carries an AWS-like error response, so it is handled like the ClientError raised by GetSecretValue (e.g. missing
+    secrets are skipped by get_values).
+    """
+
+    def __init__(self, key, code, message=None):
+        super(SecretError, self).__init__('{key}: {code} {message}'.format(key=key, code=code, message=message or ''))
+        self.key = key
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+def batch_results(keys, responses):
+    # type: (list, iter) -> list
+    """
+    Match the pages of a BatchGetSecretValue call with the requested keys.
+
+    :param keys: keys (names or ARNs) requested.
+    :param responses: BatchGetSecretValue responses, one per page.
+    :return: List of (key, value, raised exception or None) tuples, in request order.
+    """
+    requested = set(keys)
+    values = {}
+    errors = {}
+    for response in responses:
+        for secret in response.get('SecretValues', []):
+            key = secret.get('Name') if secret.get('Name') in requested else secret.get('ARN')
+            if key in requested:
+                values[key] = SecretValue.from_response(secret, key).value
+        for error in response.get('Errors', []):
+            errors[error.get('SecretId')] = SecretError(error.get('SecretId'), error.get('ErrorCode'),
+                                                        error.get('ErrorMessage'))
+
+    return [(key, values.get(key), None if key in values else errors.get(key)) for key in keys]
+
+
+class ListingCache(object):
+    """
+    Thread-safe cache of complete listings of secret names indexed by prefix, each reused for a limited time.
+
+    A cache can be shared by several SecretsManager instances (e.g. the backends of many ProjectSecretsManager) so a
+    prefix is listed once for all of them.
+    """
+
+    def __init__(self, ttl, clock=time.time):
+        """
+        Initialization.
+
+        :param ttl: Time, in seconds, a listing is reused. Secrets created meanwhile are not seen until it expires.
+        :param clock: Function returning the current time in seconds.
+        """
+        self._ttl = ttl
+        self._clock = clock
+        # (expiration time, names) indexed by prefix.
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def get(self, prefix):
+        # type: (str) -> list
+        """
+        Find a fresh listing covering given prefix (the listing of the prefix itself or of a shorter prefix).
+
+        :param prefix: Key name prefix.
+        :return: List of secret names or None.
+        """
+        now = self._clock()
+        with self._lock:
+            # Look the prefix and each shorter prefix up, longest first.
+            for length in range(len(prefix), -1, -1):
+                listing = self._listings.get(prefix[:length])
+                if listing is None:
+                    continue
+                expires_at, keys = listing
+                if expires_at <= now:
+                    del self._listings[prefix[:length]]
+                else:
+                    return [key for key in keys if key.startswith(prefix)]
+        return None
+
+    def put(self, prefix, keys):
+        # type: (str, list) -> None
+        """
+        Store the complete listing of a prefix.
+
+        :param prefix: Key name prefix.
+        :param keys: Names of every secret starting with the prefix.
+        """
+        with self._lock:
+            self._listings[prefix] = (self._clock() + self._ttl, list(keys))
+
+    def clear(self):
+        # type: () -> None
+        """
+        Forget every listing.
+        """
+        with self._lock:
+            self._listings.clear()
 
 
 class SecretsManager(object):
@@ -7,15 +169,59 @@ class SecretsManager(object):
     Retrieves secrets from AWS Secrets Manager
     """
 
-    def __init__(self, sm_client=None):
-        # type: (botocore.client.SecretsManager) -> None
+    def __init__(self, sm_client=None, max_workers=DEFAULT_MAX_WORKERS, throttle=None, listing_ttl=DEFAULT_LISTING_TTL,
+                 clock=time.time, batch=True, instrumentation=None, listing_cache=None):
+        # type: (BaseClient, int, Throttle, float, callable, bool, Instrumentation, ListingCache) -> None
         """
         Initialize new Secrets Manager client.
 
-        :param sm_client: Optional client provided by user. By default, it creates a new client using the default
-            session.
+        :param sm_client: Optional client provided by user. By default, a client shared by the whole process is
+            created on first use.
+        :param max_workers: Maximum number of concurrent requests used when fetching several secrets.
+        :param throttle: Rate limiter and retry policy for AWS calls. By default, the process-wide throttle.
+        :param listing_ttl: Time, in seconds, the secret names listed for a prefix are reused by later prefix reads of
+            this instance. Secrets created meanwhile are not seen until the listing expires. 0 (default) disables the
+            cache.
+        :param clock: Function returning the current time in seconds.
+        :param batch: If true, secrets are retrieved with BatchGetSecretValue, falling back to one GetSecretValue call
+            per secret if the batch API is denied or not available.
+        :param instrumentation: Collector of call counts and latencies. By default, the process-wide instrumentation
+            (disabled unless installed with set_default_instrumentation).
+        :param listing_cache: Listing cache to use instead of one of this instance, e.g. shared with other instances.
+            It overrides listing_ttl.
+        """
+        self._client = sm_client
+        self._max_workers = max_workers
+        self._throttle = throttle
+        self._instrumentation = instrumentation
+        if listing_cache is None and listing_ttl > 0:
+            listing_cache = ListingCache(listing_ttl, clock)
+        self._listing_cache = listing_cache
+        self._batch = batch
+
+    @property
+    def _sm_client(self):
+        """
+        Secrets Manager client, created (and boto3 imported) on first use.
+        """
+        if self._client is None:
+            self._client = client('secretsmanager')
+        return self._client
+
+    def _call(self, operation, **kwargs):
         """
-        self._sm_client = sm_client or client('secretsmanager')
+        Call a Secrets Manager operation through the rate limiter, retrying throttled calls and transient failures.
+
+        :param operation: Client method name (e.g. get_secret_value).
+        :param kwargs: Operation arguments.
+        :return: Operation response.
+        """
+        throttle = self._throttle or default_throttle()
+        function = getattr(self._sm_client, operation)
+        instrumentation = self._instrumentation or default_instrumentation()
+        if instrumentation is not None:
+            function = instrumentation.wrap('secretsmanager', operation, function)
+        return throttle.call('secretsmanager', operation, function, **kwargs)
 
     def _list_secret_keys(self):
         # type: () -> list
@@ -23,47 +229,232 @@ class SecretsManager(object):
         List all secrets available.
         :return: list of all the secrets available to the executor of this function.
         """
-        keys = []
-        extra_args = {}
-        while True:
-            response = self._sm_client.list_secrets(**extra_args)
-            keys += [secret.get('Name') for secret in response.get('SecretList', []) if secret.get('Name') is not None]
+        return list(self.iter_secret_keys())
+
+    def iter_secret_keys(self):
+        # type: () -> iter
+        """
+        Iterate over all secrets available, page by page.
+
+        :return: Generator of the names of the secrets available to the executor of this function.
+        """
+        return self.iter_keys_by_prefix()
+
+    def iter_keys_by_prefix(self, prefix=''):
+        # type: (str) -> iter
+        """
+        Iterate over the secrets whose key starts with given prefix, page by page, without fetching values.
 
-            next_token = response.get('NextToken')
-            if not next_token:
-                break
+        Names are filtered by AWS when the prefix allows it, and a complete listing is reused for listing_ttl seconds.
 
-            extra_args['NextToken'] = next_token
+        :param prefix: Key name prefix.
+        :return: Generator of secret keys.
+        """
+        for keys in self._iter_prefix_key_pages(prefix):
+            for key in keys:
+                yield key
+
+    def _iter_prefix_key_pages(self, prefix):
+        # type: (str) -> iter
+        """
+        List the secrets whose key starts with given prefix, one page at a time, from the listing cache if possible.
+
+        :param prefix: Key name prefix.
+        :return: Generator of lists of secret names.
+        """
+        cached = self._listing_cache.get(prefix) if self._listing_cache is not None else None
+        if cached is not None:
+            yield cached
+            return
+
+        listed = []
+        for response in self._iter_list_secrets(prefix):
+            keys = [secret['Name'] for secret in response.get('SecretList', [])
+                    if secret.get('Name') is not None and secret['Name'].startswith(prefix)]
+            listed.extend(keys)
+            yield keys
+
+        # Only complete listings are cached: an abandoned iteration does not get here.
+        if self._listing_cache is not None:
+            self._listing_cache.put(prefix, listed)
 
-        return keys
+    def clear_listing_cache(self):
+        # type: () -> None
+        """
+        Forget the cached listings of secret names (e.g. after creating secrets).
+        """
+        if self._listing_cache is not None:
+            self._listing_cache.clear()
+
+    def _iter_list_secrets(self, prefix=''):
+        # type: (str) -> iter
+        """
+        Call ListSecrets with its largest page, asking AWS to filter by name when the prefix allows it.
+
+        The name filter of ListSecrets is case-insensitive, so results must still be checked by the caller.
+
+        :param prefix: Key name prefix.
+        :return: Generator of ListSecrets responses.
+        """
+        return paginate(functools.partial(self._call, 'list_secrets'), **list_secrets_arguments(prefix))
+
+    def get_versions_by_prefix(self, prefix=''):
+        # type: (str) -> dict
+        """
+        Retrieve the current version of every secret whose key starts with given prefix, without fetching values.
+
+        :param prefix: Key name prefix.
+        :return: Dictionary of secret versions indexed by secret key.
+        """
+        versions = {}
+        for response in self._iter_list_secrets(prefix):
+            for secret in response.get('SecretList', []):
+                if secret.get('Name') is not None and secret['Name'].startswith(prefix):
+                    versions[secret['Name']] = secret_version(secret)
+        return versions
 
     def get_value(self, key):
         # type: (str) -> str
         """
         Retrieve single secret from store.
 
+        :param key: the name of the secret.
+        :return: the value of the secret: SecretString or, for binary secrets, SecretBinary (bytes).
+        """
+        return self.get_secret(key).value
+
+    def get_secret(self, key):
+        # type: (str) -> SecretValue
+        """
+        Retrieve single secret from store, with its version and lazy JSON decoding.
+
         :param key: the name of the secret.
         :return: the value of the secret.
         """
-        response = self._sm_client.get_secret_value(
-            SecretId=key
-        )
-        return response.get('SecretString')
+        return SecretValue.from_response(self._call('get_secret_value', SecretId=key), key)
 
     def get_values(self, *keys):
         # type: (str) -> dict
         """
         Retrieve secrets by key names.
 
+        Missing secrets are skipped; any other error is raised.
+
         :param keys: keys to retrieve.
         :return: Dictionary of secret values indexed by parameter key (includes only found keys).
         """
+        values, errors = self.get_values_with_errors(*keys)
+        for key in keys:
+            error = errors.get(key)
+            if error is not None and not is_not_found_error(error):
+                raise error
+
+        return values
+
+    def get_values_with_errors(self, *keys):
+        # type: (str) -> tuple
+        """
+        Retrieve secrets by key names concurrently, capturing errors per key.
+
+        Secrets are fetched in batches of BATCH_GET_SECRET_VALUE_MAX_IDS with BatchGetSecretValue or, when the batch
+        API cannot be used, one by one. A failure for one key (e.g. ResourceNotFoundException) does not abort the
+        retrieval of the others.
 
+        :param keys: keys to retrieve.
+        :return: Tuple with a dictionary of secret values indexed by parameter key (includes only found keys) and a
+            dictionary of raised exceptions indexed by parameter key.
+        """
+        values = {}
+        errors = {}
         if not keys:
-            return {}
+            return values, errors
+
+        keys = unique(keys)
+        results = None
+        if self._use_batch():
+            try:
+                results = itertools.chain.from_iterable(map_concurrently(
+                    self._batch_get_values_or_errors,
+                    chunks(keys, BATCH_GET_SECRET_VALUE_MAX_IDS),
+                    self._max_workers))
+            except Exception as error:
+                if not self._disable_batch(error):
+                    raise
+        if results is None:
+            results = map_concurrently(self._get_value_or_error, keys, self._max_workers)
+
+        for key, value, error in results:
+            if error is not None:
+                errors[key] = error
+            elif value is not None:
+                values[key] = value
+
+        return values, errors
+
+    def _get_values_or_errors(self, keys):
+        # type: (list) -> list
+        """
+        Retrieve secrets with a single batch or, if the batch API cannot be used, one after the other, capturing
+        errors per key.
+
+        :param keys: keys to retrieve (at most BATCH_GET_SECRET_VALUE_MAX_IDS).
+        :return: List of (key, value, raised exception or None) tuples, in request order.
+        """
+        if self._use_batch():
+            try:
+                return self._batch_get_values_or_errors(keys)
+            except Exception as error:
+                if not self._disable_batch(error):
+                    raise
+        return [self._get_value_or_error(key) for key in keys]
+
+    def _batch_get_values_or_errors(self, keys):
+        # type: (list) -> list
+        """
+        Retrieve secrets with BatchGetSecretValue, following its pages.
+
+        :param keys: keys (names or ARNs) to retrieve (at most BATCH_GET_SECRET_VALUE_MAX_IDS).
+        :return: List of (key, value, raised exception or None) tuples, in request order.
+        """
+        return batch_results(keys, paginate(functools.partial(self._call, 'batch_get_secret_value'), SecretIdList=keys))
+
+    def _use_batch(self):
+        # type: () -> bool
+        """
+        Whether secrets are fetched with BatchGetSecretValue.
+
+        :return: False if batching is disabled or the client does not have the batch API.
+        """
+        # Clients of botocore versions older than the batch API do not have the method at all.
+        if self._batch and not hasattr(self._sm_client, 'batch_get_secret_value'):
+            self._batch = False
+        return self._batch
+
+    def _disable_batch(self, error):
+        # type: (Exception) -> bool
+        """
+        Stop using BatchGetSecretValue if an error shows it is not available.
+
+        :param error: Error raised by a batch call.
+        :return: True if the batch API was disabled and the secrets have to be fetched one by one.
+        """
+        if error_code(error) in BATCH_UNAVAILABLE_ERROR_CODES:
+            self._batch = False
+            return True
+        return False
+
+    def _get_value_or_error(self, key):
+        # type: (str) -> tuple
+        """
+        Retrieve single secret capturing any error raised.
 
-        return {key: value for key, value in ((key, self.get_value(key)) for key in keys) if
-                value is not None}
+        :param key: the name of the secret.
+        :return: Tuple with key, value and raised exception (or None).
+        """
+        try:
+            return key, self.get_value(key), None
+        except Exception as error:
+            return key, None, error
 
     def get_values_by_prefix(self, prefix=''):
         # type: (str) -> dict
@@ -73,5 +464,25 @@ class SecretsManager(object):
         :param prefix: Key name prefix.
         :return: Dictionary of secret values indexed by parameter key.
         """
-        keys = [key for key in self._list_secret_keys() if key.startswith(prefix)]
-        return self.get_values(*keys)
+        return dict(self.iter_values_by_prefix(prefix))
+
+    def iter_values_by_prefix(self, prefix=''):
+        # type: (str) -> iter
+        """
+        Iterate over all secret values for keys that start with given prefix, page by page.
+
+        Values are fetched concurrently while later pages of keys are still being listed.
+
+        :param prefix: Key name prefix.
+        :return: Generator of (secret key, secret value) tuples.
+        """
+        # Without the batch API every worker fetches a single secret at a time.
+        size = BATCH_GET_SECRET_VALUE_MAX_IDS if self._use_batch() else 1
+        batches = (chunk for keys in self._iter_prefix_key_pages(prefix) for chunk in chunks(keys, size))
+        for key, value, error in pipeline(batches, self._get_values_or_errors, self._max_workers):
+            if error is not None:
+                if not is_not_found_error(error):
+                    raise error
+            elif value is not None:
+                yield key, value
+
@@ -0,0 +1,371 @@
+"""
+Snapshots of values published in shared memory, so the workers of a multi-process server read the values loaded once
+by their parent instead of fetching (and holding) their own copy. Requires Python 3.8.
+
+The parent publishes every snapshot in a new read-only data segment with a sorted index, then points a small control
+segment at it. Workers (forked or spawned) attach by name and look keys up in place: only the values read are decoded.
+"""
+import os
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from param_teller.offline import ParameterNotFound
+
+# Control segment: sequence number (odd while being written), generation, data segment name length and name.
+_CONTROL = struct.Struct('<QQH')
+_MAX_NAME_LENGTH = 128
+_CONTROL_SIZE = _CONTROL.size + _MAX_NAME_LENGTH
+
+# Data segment: magic, number of entries, then one index entry per key sorted by encoded key, then keys and values.
+_MAGIC = b'PTS1'
+_HEADER = struct.Struct('<4sI')
+# Key offset, key length, value offset, value length, value kind.
+_ENTRY = struct.Struct('<IIIIB3x')
+
+_TEXT = 0
+_BINARY = 1
+
+_attach_lock = threading.Lock()
+
+
+def encode(values):
+    # type: (dict) -> bytes
+    """
+    Encode values in the shared snapshot format.
+
+    :param values: Dictionary of values (str, or bytes for binary secrets) indexed by key.
+    :return: Encoded snapshot.
+    """
+    entries = sorted((key.encode('utf-8'), value) for key, value in values.items())
+    blob_offset = _HEADER.size + _ENTRY.size * len(entries)
+
+    index = bytearray(_HEADER.pack(_MAGIC, len(entries)))
+    blob = bytearray()
+    for key, value in entries:
+        kind = _BINARY if isinstance(value, (bytes, bytearray, memoryview)) else _TEXT
+        data = bytes(value) if kind == _BINARY else value.encode('utf-8')
+        key_offset = blob_offset + len(blob)
+        blob += key
+        index += _ENTRY.pack(key_offset, len(key), key_offset + len(key), len(data), kind)
+        blob += data
+    return bytes(index + blob)
+
+
+class SnapshotView(object):
+    """
+    Read-only mapping over an encoded snapshot, decoding only the keys compared and the values read.
+    """
+
+    def __init__(self, buffer, generation=0, segment=None):
+        """
+        Initialization.
+
+        :param buffer: Encoded snapshot.
+        :param generation: Generation of the snapshot.
+        :param segment: Shared memory segment holding the snapshot, read in place instead of the buffer. The view keeps
+            it open as long as it is referenced.
+        """
+        self._segment = segment
+        self._buffer = segment.buf if segment is not None else memoryview(buffer)
+        self.generation = generation
+        magic, self._count = _HEADER.unpack_from(self._buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError('Not a shared snapshot')
+
+    def _entry(self, index):
+        return _ENTRY.unpack_from(self._buffer, _HEADER.size + index * _ENTRY.size)
+
+    def _key(self, index):
+        # type: (int) -> bytes
+        key_offset, key_length = self._entry(index)[:2]
+        return self._buffer[key_offset:key_offset + key_length].tobytes()
+
+    def _value(self, index):
+        _, _, value_offset, value_length, kind = self._entry(index)
+        data = self._buffer[value_offset:value_offset + value_length]
+        return data.tobytes() if kind == _BINARY else str(data, 'utf-8')
+
+    def _bisect(self, key):
+        # type: (bytes) -> int
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find(self, key):
+        # type: (str) -> int
+        encoded = key.encode('utf-8')
+        index = self._bisect(encoded)
+        return index if index < self._count and self._key(index) == encoded else None
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __getitem__(self, key):
+        index = self._find(key)
+        if index is None:
+            raise KeyError(key)
+        return self._value(index)
+
+    def get(self, key, default=None):
+        index = self._find(key)
+        return self._value(index) if index is not None else default
+
+    def __iter__(self):
+        return (self._key(index).decode('utf-8') for index in range(self._count))
+
+    def items(self, prefix=''):
+        """
+        Iterate over the values whose key starts with given prefix, sorted by key.
+
+        :param prefix: Key name prefix.
+        :return: Generator of (key, value) tuples.
+        """
+        encoded = prefix.encode('utf-8')
+        for index in range(self._bisect(encoded), self._count):
+            key = self._key(index)
+            if not key.startswith(encoded):
+                break
+            yield key.decode('utf-8'), self._value(index)
+
+    def to_dict(self):
+        # type: () -> dict
+        return dict(self.items())
+
+
+def _attach(name):
+    # type: (str) -> shared_memory.SharedMemory
+    """
+    Attach to an existing segment without letting this process' resource tracker unlink it on exit.
+
+    Python < 3.13 always registers attached segments, and unregistering afterwards is not safe: forked workers share
+    the tracker of their parent and would drop the parent's own registration. There, resource_tracker.register is
+    replaced for the duration of the attach so that it skips this segment only; registrations of other resources
+    made meanwhile by other threads go through unchanged.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    from multiprocessing import resource_tracker
+    with _attach_lock:
+        register = resource_tracker.register
+
+        def register_others(resource_name, resource_type):
+            if resource_type != 'shared_memory' or resource_name.lstrip('/') != name:
+                register(resource_name, resource_type)
+
+        resource_tracker.register = register_others
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedSnapshotPublisher(object):
+    """
+    Publishes snapshots in shared memory under a name, replacing the previous one atomically.
+
+    Only the process that created the publisher publishes or removes segments: a forked child inheriting it cannot
+    unlink the parent's snapshot.
+    """
+
+    def __init__(self, name):
+        """
+        Create the control segment of a shared snapshot.
+
+        :param name: Name of the shared snapshot, known by the workers (e.g. "param-teller-projx-prod-servicey").
+        """
+        if len(name) + 12 > _MAX_NAME_LENGTH:
+            raise ValueError('Shared snapshot name too long: {name}'.format(name=name))
+
+        self.name = name
+        self._pid = os.getpid()
+        self._control = shared_memory.SharedMemory(name=name, create=True, size=_CONTROL_SIZE)
+        _CONTROL.pack_into(self._control.buf, 0, 0, 0, 0)
+        self._data = None
+        self._generation = 0
+        self._published = None
+
+    def publish(self, values):
+        # type: (dict) -> int
+        """
+        Publish a snapshot. Readers see either the previous snapshot or the new one, never a partial one.
+
+        :param values: Dictionary of values indexed by key.
+        :return: Generation of the published snapshot.
+        """
+        if os.getpid() != self._pid:
+            raise RuntimeError('Shared snapshots can only be published by the process that created the publisher')
+
+        encoded = encode(values)
+        generation = self._generation + 1
+        data_name = '{name}-{generation}'.format(name=self.name, generation=generation)
+        data = shared_memory.SharedMemory(name=data_name, create=True, size=max(1, len(encoded)))
+        data.buf[:len(encoded)] = encoded
+
+        # Seqlock: readers retry while the sequence number is odd or changed under them.
+        sequence = _CONTROL.unpack_from(self._control.buf, 0)[0]
+        encoded_name = data_name.encode('utf-8')
+        struct.pack_into('<Q', self._control.buf, 0, sequence + 1)
+        _CONTROL.pack_into(self._control.buf, 0, sequence + 1, generation, len(encoded_name))
+        self._control.buf[_CONTROL.size:_CONTROL.size + len(encoded_name)] = encoded_name
+        struct.pack_into('<Q', self._control.buf, 0, sequence + 2)
+
+        # Readers already attached keep their mapping; new readers can no longer open the previous segment.
+        previous, self._data, self._generation, self._published = self._data, data, generation, values
+        if previous is not None:
+            previous.close()
+            previous.unlink()
+        return generation
+
+    def wrap(self, loader):
+        # type: (callable) -> callable
+        """
+        Make a loader (e.g. of SnapshotRefresher) publish every snapshot it loads.
+
+        :param loader: Function returning a dictionary of values.
+        :return: Function returning the same values after publishing them, if they changed.
+        """
+        def publishing_loader():
+            values = loader()
+            if values != self._published:
+                self.publish(values)
+            return values
+
+        return publishing_loader
+
+    def close(self):
+        # type: () -> None
+        """
+        Remove the shared snapshot. Readers already attached keep reading the last snapshot.
+        """
+        if os.getpid() != self._pid:
+            return
+        for segment in (self._data, self._control):
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+        self._data = self._control = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SharedSnapshot(object):
+    """
+    Read-only backend serving the values published by a SharedSnapshotPublisher, e.g. in every worker of a server:
+
+        ProjectStore(SharedSnapshot('param-teller-projx-prod-servicey'), 'projx', 'prod', 'servicey')
+
+    It never calls AWS. Every read checks the generation of the published snapshot and switches to a new one as soon as
+    it is published.
+    """
+
+    def __init__(self, name, timeout=10.0, clock=time.time, sleep=time.sleep):
+        """
+        Initialization. Attaching is deferred to the first read, so it can be created before forking.
+
+        :param name: Name of the shared snapshot.
+        :param timeout: Maximum time, in seconds, the first read waits for a first snapshot to be published.
+        :param clock: Function returning the current time in seconds.
+        :param sleep: Function used to wait.
+        """
+        self.name = name
+        self._timeout = timeout
+        self._clock = clock
+        self._sleep = sleep
+        self._control = None
+        self._view = None
+
+    @property
+    def snapshot(self):
+        # type: () -> SnapshotView
+        """
+        Current snapshot.
+        """
+        if self._control is None:
+            self._control = self._wait(lambda: _attach(self.name))
+
+        generation = struct.unpack_from('<Q', self._control.buf, 8)[0]
+        if self._view is None or self._view.generation != generation:
+            self._view = self._wait(self._attach_current)
+        return self._view
+
+    def _wait(self, attach):
+        deadline = self._clock() + self._timeout
+        while True:
+            try:
+                result = attach()
+                if result is not None:
+                    return result
+            except FileNotFoundError:
+                pass
+            if self._clock() >= deadline:
+                raise LookupError('Shared snapshot {name} is not published'.format(name=self.name))
+            self._sleep(0.01)
+
+    def _attach_current(self):
+        # type: () -> SnapshotView
+        """
+        Attach to the segment the control segment points at.
+
+        :return: View of the current snapshot, or None if nothing is published yet or a snapshot is being published
+            (_wait then retries after a pause, until its timeout).
+        """
+        sequence = struct.unpack_from('<Q', self._control.buf, 0)[0]
+        if sequence % 2:
+            return None
+        _, generation, name_length = _CONTROL.unpack_from(self._control.buf, 0)
+        data_name = bytes(self._control.buf[_CONTROL.size:_CONTROL.size + name_length]).decode('utf-8')
+        if struct.unpack_from('<Q', self._control.buf, 0)[0] != sequence or not generation:
+            return None
+        # The previous segment is closed once the views over it are no longer referenced.
+        return SnapshotView(None, generation, _attach(data_name))
+
+    def get_value(self, key):
+        # type: (str) -> str
+        """
+        Retrieve single value.
+
+        :param key: Parameter name.
+        :return: Parameter value.
+        """
+        value = self.snapshot.get(key)
+        if value is None:
+            raise ParameterNotFound(key)
+        return value
+
+    def get_values(self, *keys):
+        # type: (str) -> dict
+        """
+        Retrieve values by key names.
+
+        :param keys: keys to retrieve.
+        :return: Dictionary of values indexed by key (includes only found keys).
+        """
+        snapshot = self.snapshot
+        return {key: snapshot[key] for key in keys if key in snapshot}
+
+    def get_values_by_prefix(self, prefix=''):
+        # type: (str) -> dict
+        """
+        Retrieve all values for keys that start with given prefix.
+
+        :param prefix: Key name prefix.
+        :return: Dictionary of values indexed by key.
+        """
+        return dict(self.snapshot.items(prefix))
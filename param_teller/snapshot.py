@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from param_teller.delta import DeltaSync
+from param_teller.utils import decode_values, encode_values
+
+# Version of the snapshot file format.
+SNAPSHOT_FORMAT = 1
+
+# Default maximum age, in seconds, of a snapshot that can be served on start.
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+
+class Snapshot(object):
+    """
+    Values of a namespace as stored on disk.
+    """
+
+    def __init__(self, namespace, values, versions, created_at):
+        """
+        Initialization.
+
+        :param namespace: Namespace the values belong to (e.g. backend and service prefix).
+        :param values: Dictionary of values indexed by key.
+        :param versions: Dictionary of version stamps indexed by key.
+        :param created_at: Time, in seconds since the epoch, when the values were fetched.
+        """
+        self.namespace = namespace
+        self.values = values
+        self.versions = versions
+        self.created_at = created_at
+
+
+class SnapshotFile(object):
+    """
+    Encrypted on-disk cache of parameter snapshots, one file per namespace.
+
+    Files are encrypted and authenticated with a local Fernet key, so a tampered or foreign file is ignored. Requires
+    the cryptography package (pip install param_teller[snapshot]).
+    """
+
+    def __init__(self, directory, key, max_age=DEFAULT_MAX_AGE, clock=time.time):
+        """
+        Initialize new snapshot cache.
+
+        :param directory: Directory where snapshots are stored.
+        :param key: Fernet key (see generate_key).
+        :param max_age: Maximum age, in seconds, of a snapshot that can be loaded.
+        :param clock: Function returning the current time in seconds.
+        """
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            raise ImportError('SnapshotFile requires the cryptography package: pip install param_teller[snapshot]')
+
+        self._directory = directory
+        self._fernet = Fernet(key)
+        self._max_age = max_age
+        self._clock = clock
+
+    @staticmethod
+    def generate_key():
+        # type: () -> bytes
+        """
+        Generate a new encryption key.
+
+        :return: URL-safe base64-encoded 32-byte key.
+        """
+        from cryptography.fernet import Fernet
+        return Fernet.generate_key()
+
+    def path(self, namespace):
+        # type: (str) -> str
+        """
+        Compute the file used to store a namespace.
+
+        :param namespace: Namespace of the snapshot.
+        :return: File path.
+        """
+        digest = hashlib.sha256(namespace.encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, '{digest}.snapshot'.format(digest=digest))
+
+    def load(self, namespace):
+        # type: (str) -> Snapshot
+        """
+        Read the snapshot of a namespace.
+
+        :param namespace: Namespace of the snapshot.
+        :return: Snapshot or None if there is no usable snapshot (missing, expired, unreadable or not decryptable).
+        """
+        try:
+            with open(self.path(namespace), 'rb') as snapshot_file:
+                token = snapshot_file.read()
+            payload = json.loads(self._fernet.decrypt(token).decode('utf-8'))
+        except Exception:
+            return None
+
+        if payload.get('format') != SNAPSHOT_FORMAT or payload.get('namespace') != namespace:
+            return None
+        if self._clock() - payload.get('created_at', 0) > self._max_age:
+            return None
+
+        return Snapshot(namespace, decode_values(payload), payload['versions'], payload['created_at'])
+
+    def save(self, namespace, values, versions, created_at=None):
+        # type: (str, dict, dict, float) -> Snapshot
+        """
+        Write the snapshot of a namespace, atomically replacing the previous one.
+
+        :param namespace: Namespace of the snapshot.
+        :param values: Dictionary of values indexed by key.
+        :param versions: Dictionary of version stamps indexed by key.
+        :param created_at: Time, in seconds since the epoch, when the values were fetched. Defaults to now.
+        :return: Saved snapshot.
+        """
+        snapshot = Snapshot(namespace, dict(values), dict(versions),
+                            self._clock() if created_at is None else created_at)
+        # Binary secrets are stored base64-encoded and listed under "binary".
+        payload = encode_values(snapshot.values)
+        payload.update({
+            'format': SNAPSHOT_FORMAT,
+            'namespace': namespace,
+            'created_at': snapshot.created_at,
+            'versions': snapshot.versions,
+        })
+        token = self._fernet.encrypt(json.dumps(payload).encode('utf-8'))
+
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory, 0o700)
+
+        descriptor, temporary_path = tempfile.mkstemp(dir=self._directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as snapshot_file:
+                snapshot_file.write(token)
+            # Atomically replace the previous snapshot (os.replace is not available in Python 2, where os.rename
+            # does the same on POSIX).
+            getattr(os, 'replace', os.rename)(temporary_path, self.path(namespace))
+        except Exception:
+            os.remove(temporary_path)
+            raise
+
+        return snapshot
+
+    def delete(self, namespace):
+        # type: (str) -> None
+        """
+        Remove the snapshot of a namespace, if any.
+
+        :param namespace: Namespace of the snapshot.
+        """
+        try:
+            os.remove(self.path(namespace))
+        except OSError:
+            pass
+
+
+class SnapshotLoader(object):
+    """
+    Keeps the values of a key prefix in sync with a backend, persisting them in a SnapshotFile together with their
+    version stamps.
+
+    Values are fetched incrementally (see DeltaSync): only keys whose version differs from the stored one are
+    retrieved again.
+    """
+
+    def __init__(self, snapshot_file, namespace, backend, prefix=''):
+        """
+        Initialization.
+
+        :param snapshot_file: Snapshot cache.
+        :param namespace: Namespace of the snapshot.
+        :param backend: Backend providing get_versions_by_prefix and get_values.
+        :param prefix: Key name prefix to keep in sync.
+        """
+        self._snapshot_file = snapshot_file
+        self._namespace = namespace
+        self._snapshot = snapshot_file.load(namespace)
+        self._sync = DeltaSync(
+            backend,
+            prefix,
+            values=self._snapshot.values if self._snapshot is not None else None,
+            versions=self._snapshot.versions if self._snapshot is not None else None)
+
+    @property
+    def initial(self):
+        # type: () -> dict
+        """
+        Values read from disk, or None if there was no usable snapshot.
+        """
+        return self._snapshot.values if self._snapshot is not None else None
+
+    def __call__(self):
+        # type: () -> dict
+        """
+        Revalidate the snapshot, fetching only the values whose version changed.
+
+        :return: Dictionary of values indexed by key.
+        """
+        self._sync.refresh()
+        self._snapshot = self._snapshot_file.save(self._namespace, self._sync.values, self._sync.versions)
+        return self._sync.values
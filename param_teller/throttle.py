@@ -0,0 +1,276 @@
+import random
+import threading
+import time
+
+from param_teller.utils import is_throttling_error, is_transient_error
+
+# Default request rates, in requests per second. Keys are "<service>.<operation>" for a single operation or "<service>"
+# for a bucket shared by every operation of the service without a more specific rate. Parameter Store allows 40
+# requests per second across its read operations with the default throughput.
+DEFAULT_RATES = {'ssm': 40.0}
+
+# Default maximum number of attempts of a throttled or failed call (first attempt included).
+DEFAULT_MAX_ATTEMPTS = 8
+
+# Default maximum time, in seconds, spent on a call including its retries and the rate limiter waits before them.
+DEFAULT_MAX_ELAPSED = 30.0
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket allowing a sustained rate with bursts up to a fixed size.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.time):
+        """
+        Initialize new bucket, initially full.
+
+        :param rate: Tokens added per second.
+        :param burst: Bucket size. Defaults to the rate (one second worth of requests).
+        :param clock: Function returning the current time in seconds.
+        """
+        self._rate = float(rate)
+        self._capacity = float(burst or max(1.0, self._rate))
+        self._tokens = self._capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        # type: () -> float
+        """
+        Take a token.
+
+        Tokens may be taken in advance: the bucket goes negative and the caller has to wait until it refills.
+
+        :return: Time, in seconds, the caller has to wait before making the request.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self._rate
+
+
+class RateLimiter(object):
+    """
+    Client-side rate limiter with one token bucket per AWS operation (or service), shared by every thread using it.
+    """
+
+    def __init__(self, rates=None, clock=time.time):
+        """
+        Initialize new rate limiter.
+
+        :param rates: Dictionary of requests per second indexed by "<service>.<operation>" or "<service>". Operations
+            without a rate are not limited.
+        :param clock: Function returning the current time in seconds.
+        """
+        self._rates = dict(DEFAULT_RATES if rates is None else rates)
+        self._clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, service, operation):
+        # type: (str, str) -> float
+        """
+        Take a token for an operation.
+
+        :param service: AWS service name (e.g. ssm).
+        :param operation: Client operation name (e.g. get_parameters).
+        :return: Time, in seconds, the caller has to wait before making the request.
+        """
+        bucket = self._bucket(service, operation)
+        return bucket.reserve() if bucket is not None else 0.0
+
+    def acquire(self, service, operation):
+        # type: (str, str) -> None
+        """
+        Block until a request for an operation is allowed.
+
+        :param service: AWS service name (e.g. ssm).
+        :param operation: Client operation name (e.g. get_parameters).
+        """
+        delay = self.reserve(service, operation)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _bucket(self, service, operation):
+        # type: (str, str) -> TokenBucket
+        """
+        Find the bucket of an operation, creating it on first use.
+
+        :param service: AWS service name.
+        :param operation: Client operation name.
+        :return: Token bucket or None if the operation is not limited.
+        """
+        for name in ('{service}.{operation}'.format(service=service, operation=operation), service):
+            if name in self._rates:
+                break
+        else:
+            return None
+
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(name)
+                if bucket is None:
+                    bucket = self._buckets[name] = TokenBucket(self._rates[name], clock=self._clock)
+        return bucket
+
+
+class RetryPolicy(object):
+    """
+    Retries of throttled or transiently failed calls with decorrelated jitter backoff, bounded by attempts and total
+    elapsed time.
+    """
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=0.05, max_delay=5.0,
+                 max_elapsed=DEFAULT_MAX_ELAPSED):
+        """
+        Initialization.
+
+        :param max_attempts: Maximum number of attempts (first attempt included).
+        :param base_delay: Minimum delay, in seconds, between attempts.
+        :param max_delay: Maximum delay, in seconds, between attempts.
+        :param max_elapsed: Maximum time, in seconds, spent on a call including its retries and the rate limiter waits
+            before them.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+
+    def delays(self):
+        # type: () -> iter
+        """
+        Generate the delays between attempts: each one is drawn between the base delay and three times the previous
+        one ("decorrelated jitter"), capped at the maximum delay.
+
+        :return: Generator of max_attempts - 1 delays in seconds.
+        """
+        delay = self.base_delay
+        for _ in range(self.max_attempts - 1):
+            delay = min(self.max_delay, random.uniform(self.base_delay, delay * 3))
+            yield delay
+
+
+class Throttle(object):
+    """
+    Runs AWS calls through a rate limiter, retrying throttled calls and transient failures (server errors, timeouts and
+    connection failures) according to a retry policy.
+    """
+
+    def __init__(self, rate_limiter=None, retry_policy=None, clock=time.time, sleep=time.sleep):
+        """
+        Initialization.
+
+        :param rate_limiter: Rate limiter. By default, calls are not rate limited.
+        :param retry_policy: Retry policy for throttled and failed calls. By default, RetryPolicy().
+        :param clock: Function returning the current time in seconds.
+        :param sleep: Function used to wait.
+        """
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.clock = clock
+        self._sleep = sleep
+
+    def reserve(self, service, operation):
+        # type: (str, str) -> float
+        """
+        Take a token for an operation.
+
+        :param service: AWS service name (e.g. ssm).
+        :param operation: Client operation name (e.g. get_parameters).
+        :return: Time, in seconds, the caller has to wait before making the request.
+        """
+        return self.rate_limiter.reserve(service, operation) if self.rate_limiter is not None else 0.0
+
+    def next_delay(self, error, delays, started):
+        # type: (Exception, iter, float) -> float
+        """
+        Decide whether a failed call is retried.
+
+        :param error: Raised exception.
+        :param delays: Generator of delays of the retry policy for the current call.
+        :param started: Time when the call started.
+        :return: Delay, in seconds, before the next attempt or None if the error must be raised.
+        """
+        if not (is_throttling_error(error) or is_transient_error(error)):
+            return None
+
+        delay = next(delays, None)
+        if delay is None or self.clock() - started + delay > self.retry_policy.max_elapsed:
+            return None
+        return delay
+
+    def exceeds_max_elapsed(self, wait, started):
+        # type: (float, float) -> bool
+        """
+        Decide whether waiting for the rate limiter before a retry would exceed the maximum elapsed time.
+
+        :param wait: Time, in seconds, the rate limiter asks to wait.
+        :param started: Time when the call started.
+        :return: True if the retry must be abandoned.
+        """
+        return self.clock() - started + wait > self.retry_policy.max_elapsed
+
+    def call(self, service, operation, function, **kwargs):
+        """
+        Call an AWS operation.
+
+        :param service: AWS service name (e.g. ssm).
+        :param operation: Client operation name (e.g. get_parameters).
+        :param function: Client method.
+        :param kwargs: Operation arguments.
+        :return: Operation response.
+        """
+        started = self.clock()
+        delays = self.retry_policy.delays()
+        error = None
+        while True:
+            wait = self.reserve(service, operation)
+            if error is not None and self.exceeds_max_elapsed(wait, started):
+                raise error
+            if wait > 0:
+                self._sleep(wait)
+
+            try:
+                return function(**kwargs)
+            except Exception as call_error:
+                delay = self.next_delay(call_error, delays, started)
+                if delay is None:
+                    raise
+                error = call_error
+                self._sleep(delay)
+
+
+_default_throttle = None
+_default_throttle_lock = threading.Lock()
+
+
+def default_throttle():
+    # type: () -> Throttle
+    """
+    Process-wide throttle shared by every backend created without an explicit one.
+
+    :return: Throttle limited to DEFAULT_RATES.
+    """
+    global _default_throttle
+    if _default_throttle is None:
+        with _default_throttle_lock:
+            if _default_throttle is None:
+                _default_throttle = Throttle(RateLimiter())
+    return _default_throttle
+
+
+def set_default_throttle(throttle):
+    # type: (Throttle) -> None
+    """
+    Replace the process-wide throttle (e.g. to tune rates for the account).
+
+    :param throttle: New default throttle.
+    """
+    global _default_throttle
+    with _default_throttle_lock:
+        _default_throttle = throttle
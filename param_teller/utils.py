@@ -0,0 +1,213 @@
+import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Default number of concurrent requests when fetching values in batches.
+DEFAULT_MAX_WORKERS = 8
+
+# Error codes returned by AWS when a key does not exist.
+NOT_FOUND_ERROR_CODES = frozenset(['ParameterNotFound', 'ResourceNotFoundException'])
+
+# Error codes returned by AWS when the request rate is exceeded.
+THROTTLING_ERROR_CODES = frozenset(['ThrottlingException', 'Throttling', 'TooManyRequestsException',
+                                    'RequestLimitExceeded', 'ThrottledException'])
+
+# Error codes returned by AWS for transient server-side failures.
+TRANSIENT_ERROR_CODES = frozenset(['InternalError', 'InternalFailure', 'InternalServerError', 'ServiceUnavailable',
+                                   'ServiceUnavailableException', 'RequestTimeout', 'RequestTimeoutException',
+                                   'PriorRequestNotComplete'])
+
+# HTTP status codes of transient server-side failures.
+TRANSIENT_STATUS_CODES = frozenset([500, 502, 503, 504])
+
+# Exception class names of connection failures: botocore's ConnectionError (e.g. connection refused or reset) and
+# HTTPClientError (e.g. read timeout), and Python 3's builtin ConnectionError.
+CONNECTION_ERROR_CLASSES = frozenset(['ConnectionError', 'HTTPClientError'])
+
+
+def chunks(items, size):
+    # type: (list, int) -> list
+    """
+    Split a sequence into consecutive chunks.
+
+    :param items: Items to split.
+    :param size: Maximum number of items per chunk.
+    :return: List of chunks (lists), preserving the original order.
+    """
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def unique(items):
+    # type: (list) -> list
+    """
+    Remove duplicated items preserving the order of first occurrence.
+
+    :param items: Items to deduplicate.
+    :return: List of unique items.
+    """
+    seen = set()
+    return [item for item in items if not (item in seen or seen.add(item))]
+
+
+def map_concurrently(function, items, max_workers):
+    # type: (callable, list, int) -> list
+    """
+    Apply a function to every item using a bounded thread pool.
+
+    Runs inline when there is a single item or a single worker, so the common small case does not pay for thread
+    creation.
+
+    :param function: Function to apply to each item.
+    :param items: Items to process.
+    :param max_workers: Maximum number of concurrent threads.
+    :return: List of results in the same order as the items.
+    """
+    items = list(items)
+    workers = min(max_workers or 1, len(items))
+    if workers <= 1:
+        return [function(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, items))
+
+
+def pipeline(batches, fetch, max_workers):
+    """
+    Fetch batches on a bounded thread pool while the batches are still being produced (e.g. while later pages of a
+    listing are being requested).
+
+    At most 2 * max_workers batches are in flight: once that many are pending, the oldest one is awaited before the
+    next batch is produced, so memory does not grow with the number of batches.
+
+    :param batches: Iterable of batches, consumed lazily.
+    :param fetch: Function returning a list of results for a batch.
+    :param max_workers: Maximum number of concurrent fetches.
+    :return: Generator of results, in batch order.
+    """
+    workers = max(1, max_workers or 1)
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for batch in batches:
+            pending.append(executor.submit(fetch, batch))
+
+            # Hand out what is already fetched before producing the next batch, waiting for it when too many batches
+            # are pending.
+            while pending and (pending[0].done() or len(pending) >= 2 * workers):
+                for result in pending.popleft().result():
+                    yield result
+
+        while pending:
+            for result in pending.popleft().result():
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def paginate(operation, **kwargs):
+    """
+    Call a paginated AWS operation, following NextToken until the last page.
+
+    :param operation: Client operation (e.g. client.list_secrets).
+    :param kwargs: Operation arguments.
+    :return: Generator of responses, one per page.
+    """
+    extra_args = dict(kwargs)
+    while True:
+        response = operation(**extra_args)
+        yield response
+
+        next_token = response.get('NextToken')
+        if not next_token:
+            break
+
+        extra_args['NextToken'] = next_token
+
+
+def error_code(error):
+    # type: (Exception) -> str
+    """
+    Extract the AWS error code of an exception.
+
+    botocore's ClientError carries the code in its response; checking it this way avoids importing botocore.
+
+    :param error: Raised exception.
+    :return: AWS error code or None if the exception is not an AWS error.
+    """
+    response = getattr(error, 'response', None)
+    if not isinstance(response, dict):
+        return None
+    return response.get('Error', {}).get('Code')
+
+
+def is_not_found_error(error):
+    # type: (Exception) -> bool
+    """
+    Check if an exception means the requested key does not exist.
+
+    :param error: Raised exception.
+    :return: True if AWS reported a missing key.
+    """
+    return error_code(error) in NOT_FOUND_ERROR_CODES
+
+
+def is_throttling_error(error):
+    # type: (Exception) -> bool
+    """
+    Check if an exception means the request was throttled.
+
+    :param error: Raised exception.
+    :return: True if AWS rejected the request because of the request rate.
+    """
+    return error_code(error) in THROTTLING_ERROR_CODES
+
+
+def is_transient_error(error):
+    # type: (Exception) -> bool
+    """
+    Check if an exception is a transient failure worth retrying: a server-side error or a connection failure.
+
+    :param error: Raised exception.
+    :return: True if the request may succeed if it is made again.
+    """
+    if error_code(error) in TRANSIENT_ERROR_CODES:
+        return True
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict) and response.get('ResponseMetadata', {}).get('HTTPStatusCode') in \
+            TRANSIENT_STATUS_CODES:
+        return True
+    return any(cls.__name__ in CONNECTION_ERROR_CLASSES for cls in type(error).__mro__)
+
+
+def encode_values(values):
+    # type: (dict) -> dict
+    """
+    Make values JSON serializable: binary values (e.g. SecretBinary secrets) are base64-encoded.
+
+    :param values: Dictionary of values (str, or bytes for binary secrets) indexed by key.
+    :return: Dictionary with the "values" and, if any, the keys of the "binary" ones.
+    """
+    binary = [key for key, value in values.items() if isinstance(value, bytes) and not isinstance(value, str)]
+    if not binary:
+        return {'values': values}
+    values = dict(values)
+    for key in binary:
+        values[key] = base64.b64encode(values[key]).decode('ascii')
+    return {'values': values, 'binary': binary}
+
+
+def decode_values(document):
+    # type: (dict) -> dict
+    """
+    Decode values encoded by encode_values.
+
+    :param document: Dictionary with the "values" and the keys of the "binary" ones.
+    :return: Dictionary of values indexed by key.
+    """
+    values = document['values']
+    for key in document.get('binary', ()):
+        values[key] = base64.b64decode(values[key])
+    return values
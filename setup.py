@@ -9,5 +9,7 @@ setup(
     author_email='tcarvalho@chanzuckerberg.com',
     license='MIT',
     packages=['param_teller'],
-    install_requires=['boto3'],
+    install_requires=['boto3', 'futures; python_version < "3"'],
+    extras_require={'snapshot': ['cryptography'], 'opentelemetry': ['opentelemetry-api']},
+    entry_points={'console_scripts': ['param-teller = param_teller.daemon:main']},
     tests_require=['moto'])
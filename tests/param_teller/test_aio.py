@@ -0,0 +1,115 @@
+import asyncio
+
+from botocore.exceptions import ClientError
+from pytest import raises
+
+from param_teller.aio import AsyncParameterStore, AsyncProjectStore, AsyncSecretsManager
+from benchmarks.stub_clients import StubSecretsManagerClient, StubSSMClient
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def _ssm_client():
+    values = {'/service1/key{0}'.format(i): 'value1_{0}'.format(i) for i in range(1, 26)}
+    values['/service2/key1'] = 'value2_1'
+    return StubSSMClient(values)
+
+
+def test_parameter_store_get_value():
+    value = _run(AsyncParameterStore(ssm_client=_ssm_client()).get_value('/service1/key2'))
+
+    assert value == 'value1_2'
+
+
+def test_parameter_store_get_value_not_found():
+    with raises(ClientError):
+        _run(AsyncParameterStore(ssm_client=_ssm_client()).get_value('/service1/missing'))
+
+
+def test_parameter_store_get_values_in_chunks():
+    client = _ssm_client()
+    keys = ['/service1/key{0}'.format(i) for i in range(1, 26)] + ['/service1/missing']
+
+    values = _run(AsyncParameterStore(ssm_client=client, max_concurrency=2).get_values(*keys))
+
+    assert len(values) == 25
+    assert values['/service1/key25'] == 'value1_25'
+    assert client.calls['get_parameters'] == 3
+
+
+def test_parameter_store_reused_across_event_loops():
+    store = AsyncParameterStore(ssm_client=_ssm_client(), max_concurrency=1)
+    keys = ['/service1/key{0}'.format(i) for i in range(1, 26)]
+
+    first = _run(store.get_values(*keys))
+    second = _run(store.get_values(*keys))
+
+    assert first == second
+    assert len(second) == 25
+
+
+def test_parameter_store_get_values_by_path():
+    client = _ssm_client()
+
+    values = _run(AsyncParameterStore(ssm_client=client).get_values_by_path('service1'))
+
+    assert len(values) == 25
+    assert client.calls['get_parameters_by_path'] == 3
+
+
+def test_parameter_store_get_values_by_prefix():
+    values = _run(AsyncParameterStore(ssm_client=_ssm_client()).get_values_by_prefix('/service2'))
+
+    assert values == {'/service2/key1': 'value2_1'}
+
+
+def test_secrets_manager_get_values_skips_missing_keys():
+    client = StubSecretsManagerClient({'service1/key1': 'value1_1', 'service1/key2': 'value1_2'})
+
+    values = _run(AsyncSecretsManager(sm_client=client).get_values('service1/key1', 'service1/key3'))
+
+    assert values == {'service1/key1': 'value1_1'}
+
+
+def test_secrets_manager_get_values_by_prefix():
+    secrets = {'service{0}/key{1}'.format(i % 2, i): 'value{0}'.format(i) for i in range(30)}
+    client = StubSecretsManagerClient(secrets)
+
+    values = _run(AsyncSecretsManager(sm_client=client).get_values_by_prefix('service1/'))
+
+    assert len(values) == 15
+    assert values['service1/key29'] == 'value29'
+    assert client.calls == {'list_secrets': 1, 'batch_get_secret_value': 1}
+
+
+def test_secrets_manager_falls_back_when_batch_is_denied():
+    client = StubSecretsManagerClient({'key{0}'.format(i): 'value{0}'.format(i) for i in range(5)},
+                                      batch_error='AccessDeniedException')
+    secrets_manager = AsyncSecretsManager(sm_client=client)
+
+    assert len(_run(secrets_manager.get_values(*['key{0}'.format(i) for i in range(5)]))) == 5
+    assert len(_run(secrets_manager.get_values('key1', 'key2'))) == 2
+    assert client.calls == {'batch_get_secret_value': 1, 'get_secret_value': 7}
+
+
+def test_project_store():
+    client = StubSecretsManagerClient({'proj1-prod-service1/key1': 'value1', 'proj1-prod-service2/key1': 'value2'})
+    store = AsyncProjectStore(AsyncSecretsManager(sm_client=client), project='proj1', env='prod', service='service1')
+
+    assert _run(store.get_service_parameters()) == {'proj1-prod-service1/key1': 'value1'}
+    assert _run(store.get_service_parameter('key1')) == 'value1'
+
+
+def test_parameter_store_get_values_by_prefix_with_path_prefix():
+    client = _ssm_client()
+
+    values = _run(AsyncParameterStore(ssm_client=client).get_values_by_prefix('/service1/'))
+
+    assert len(values) == 25
+    assert client.calls == {'get_parameters_by_path': 3}
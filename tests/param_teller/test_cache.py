@@ -0,0 +1,182 @@
+import threading
+import time
+
+from botocore.exceptions import ClientError
+from mock import MagicMock
+from pytest import raises
+
+from param_teller.cache import CachedStore
+from param_teller.offline import ParameterNotFound
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _not_found(key):
+    raise ClientError({'Error': {'Code': 'ParameterNotFound', 'Message': key}}, 'GetParameter')
+
+
+def _backend():
+    values = {'/service1/key1': 'value1_1', '/service1/key2': 'value1_2'}
+    backend = MagicMock()
+    backend.get_value.side_effect = lambda key: values[key] if key in values else _not_found(key)
+    backend.get_values.side_effect = lambda *keys: {key: values[key] for key in keys if key in values}
+    backend.get_values_by_prefix.side_effect = lambda prefix='': {
+        key: value for key, value in values.items() if key.startswith(prefix)}
+    return backend
+
+
+def test_get_value_is_cached_until_expired():
+    backend = _backend()
+    clock = FakeClock()
+    store = CachedStore(backend, ttl=10, clock=clock)
+
+    assert store.get_value('/service1/key1') == 'value1_1'
+    assert store.get_value('/service1/key1') == 'value1_1'
+    assert backend.get_value.call_count == 1
+
+    clock.now += 11
+    assert store.get_value('/service1/key1') == 'value1_1'
+    assert backend.get_value.call_count == 2
+    assert store.stats.hits == 1
+    assert store.stats.misses == 2
+
+
+def test_missing_keys_are_cached():
+    backend = _backend()
+    store = CachedStore(backend, ttl=10, clock=FakeClock())
+
+    for _ in range(2):
+        with raises(ClientError):
+            store.get_value('/service1/missing')
+
+    assert backend.get_value.call_count == 1
+
+
+def test_get_values_fetches_only_missing_keys():
+    backend = _backend()
+    store = CachedStore(backend, clock=FakeClock())
+    store.get_value('/service1/key1')
+
+    values = store.get_values('/service1/key1', '/service1/key2', '/service1/key3')
+    store.get_values('/service1/key2', '/service1/key3')
+
+    assert values == {'/service1/key1': 'value1_1', '/service1/key2': 'value1_2'}
+    backend.get_values.assert_called_once_with('/service1/key2', '/service1/key3')
+
+
+def test_missing_keys_cached_by_get_values_are_not_fetched_again():
+    backend = _backend()
+    store = CachedStore(backend, clock=FakeClock())
+
+    assert store.get_values('/service1/missing') == {}
+    with raises(ParameterNotFound):
+        store.get_value('/service1/missing')
+
+    assert backend.get_value.call_count == 0
+    assert store.stats.hits == 1
+
+
+def test_concurrent_get_values_call_backend_once():
+    backend = MagicMock()
+
+    def slow_get_values(*keys):
+        time.sleep(0.1)
+        return {key: 'value' for key in keys if key != '/service1/missing'}
+
+    backend.get_values.side_effect = slow_get_values
+    store = CachedStore(backend)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(store.get_values('/service1/key1', '/service1/missing')))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{'/service1/key1': 'value'}] * 5
+    assert backend.get_values.call_count == 1
+
+
+def test_invalidate_drops_prefix_and_path_results_covering_the_key():
+    backend = _backend()
+    backend.get_values_by_path.side_effect = lambda path: {'/service1/key1': 'value1_1'}
+    store = CachedStore(backend, clock=FakeClock())
+    store.get_values_by_prefix('/service1/')
+    store.get_values_by_path('service1')
+    store.get_values_by_prefix('/service2/')
+
+    store.invalidate('/service1/key3')
+    store.get_values_by_prefix('/service1/')
+    store.get_values_by_path('service1')
+    store.get_values_by_prefix('/service2/')
+
+    assert backend.get_values_by_prefix.call_count == 3
+    assert backend.get_values_by_path.call_count == 2
+
+
+def test_bulk_results_larger_than_the_cache_stay_cached():
+    backend = _backend()
+    store = CachedStore(backend, max_size=2, clock=FakeClock())
+
+    store.get_values_by_prefix('/service1/')
+    store.get_values_by_prefix('/service1/')
+
+    assert backend.get_values_by_prefix.call_count == 1
+    assert store.stats.evictions == 0
+
+
+def test_get_values_by_prefix_warms_single_values():
+    backend = _backend()
+    store = CachedStore(backend, clock=FakeClock())
+
+    assert len(store.get_values_by_prefix('/service1/')) == 2
+    assert len(store.get_values_by_prefix('/service1/')) == 2
+    assert store.get_value('/service1/key2') == 'value1_2'
+
+    assert backend.get_values_by_prefix.call_count == 1
+    assert backend.get_value.call_count == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    backend = _backend()
+    store = CachedStore(backend, max_size=1, clock=FakeClock())
+
+    store.get_value('/service1/key1')
+    store.get_value('/service1/key2')
+    store.get_value('/service1/key1')
+
+    assert backend.get_value.call_count == 3
+    assert store.stats.evictions == 2
+
+
+def test_concurrent_misses_call_backend_once():
+    started = threading.Event()
+    backend = MagicMock()
+
+    def slow_get_value(key):
+        started.set()
+        time.sleep(0.1)
+        return 'value'
+
+    backend.get_value.side_effect = slow_get_value
+    store = CachedStore(backend)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(store.get_value('/service1/key1')))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['value'] * 5
+    assert backend.get_value.call_count == 1
+    assert store.stats.misses + store.stats.coalesced + store.stats.hits == 5
@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+from mock import patch
+
+from param_teller.clients import clear_clients, client
+
+
+@pytest.fixture(autouse=True)
+def session():
+    clear_clients()
+    with patch('boto3.session.Session') as session:
+        session.return_value.client.side_effect = lambda *args, **kwargs: object()
+        yield session
+    clear_clients()
+
+
+def test_client_is_reused(session):
+    assert client('ssm') is client('ssm')
+    assert session.call_count == 1
+
+
+def test_clients_are_keyed_by_service_region_and_profile(session):
+    clients = {client('ssm'), client('secretsmanager'), client('ssm', region_name='us-east-1'),
+               client('ssm', profile_name='deploy')}
+
+    assert len(clients) == 4
+    session.assert_any_call(profile_name='deploy')
+
+
+def test_client_pool_size(session):
+    client('ssm', max_pool_connections=64)
+
+    config = session.return_value.client.call_args[1]['config']
+    assert config.max_pool_connections == 64
+
+
+def test_client_leaves_retries_to_the_throttle(session):
+    client('ssm')
+
+    config = session.return_value.client.call_args[1]['config']
+    assert config.retries == {'max_attempts': 0}
+
+
+def test_client_keeps_connections_alive(session):
+    client('ssm')
+
+    config = session.return_value.client.call_args[1]['config']
+    assert config.tcp_keepalive is True
+
+
+def test_concurrent_calls_create_a_single_client(session):
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(client('ssm'))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, clients))) == 1
+    assert session.call_count == 1
@@ -0,0 +1,104 @@
+import os
+import shutil
+import socket
+import stat
+import tempfile
+
+import pytest
+from mock import MagicMock
+
+from param_teller.daemon import ParameterDaemon, SocketStore, main
+from param_teller.offline import ParameterNotFound
+from param_teller.project_store import ProjectStore
+
+
+@pytest.fixture
+def socket_path():
+    directory = tempfile.mkdtemp()
+    yield os.path.join(directory, 'param-teller.sock')
+    shutil.rmtree(directory)
+
+
+@pytest.fixture
+def backend():
+    backend = MagicMock()
+    backend.get_values_by_prefix.return_value = {
+        'proj1-prod-service1/key1': 'value1',
+        'proj1-prod-service1/key2': 'value2',
+        'proj1-prod-service1/cert': b'\x00\x01',
+    }
+    return backend
+
+
+@pytest.fixture
+def daemon(backend, socket_path):
+    daemon = ParameterDaemon([ProjectStore(backend, 'proj1', 'prod', 'service1')], socket_path, interval=3600)
+    daemon.start()
+    yield daemon
+    daemon.stop()
+
+
+def test_serves_values_over_socket(daemon, backend):
+    store = SocketStore(daemon.socket_path)
+
+    assert store.get_value('proj1-prod-service1/key1') == 'value1'
+    assert store.get_value('proj1-prod-service1/cert') == b'\x00\x01'
+    assert store.get_values('proj1-prod-service1/key2', 'missing') == {'proj1-prod-service1/key2': 'value2'}
+    assert len(store.get_values_by_prefix('proj1-prod-service1/')) == 3
+    with pytest.raises(ParameterNotFound):
+        store.get_value('missing')
+    assert backend.get_values_by_prefix.call_count == 1
+
+
+def test_socket_is_private(daemon):
+    assert stat.S_IMODE(os.stat(daemon.socket_path).st_mode) == 0o600
+
+
+def test_refuses_to_replace_other_files(backend, socket_path):
+    with open(socket_path, 'w') as other_file:
+        other_file.write('data')
+    daemon = ParameterDaemon([ProjectStore(backend, 'proj1', 'prod', 'service1')], socket_path)
+
+    with pytest.raises(ValueError):
+        daemon.start()
+    with open(socket_path) as other_file:
+        assert other_file.read() == 'data'
+    assert not backend.get_values_by_prefix.called
+
+
+def test_replaces_stale_socket(backend, socket_path):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    daemon = ParameterDaemon([ProjectStore(backend, 'proj1', 'prod', 'service1')], socket_path, interval=3600)
+
+    daemon.start()
+    try:
+        assert SocketStore(socket_path).get_value('proj1-prod-service1/key1') == 'value1'
+        with pytest.raises(ValueError):
+            ParameterDaemon([ProjectStore(backend, 'proj1', 'prod', 'service1')], socket_path).start()
+    finally:
+        daemon.stop()
+
+
+def test_plugs_into_project_store(daemon):
+    project_store = ProjectStore(SocketStore(daemon.socket_path), 'proj1', 'prod', 'service1')
+
+    assert project_store.get_service_parameter('key2') == 'value2'
+    assert project_store.get_service_parameters()['proj1-prod-service1/key1'] == 'value1'
+
+
+def test_reconnects_after_daemon_restart(backend, socket_path):
+    store = SocketStore(socket_path)
+    for _ in range(2):
+        daemon = ParameterDaemon([ProjectStore(backend, 'proj1', 'prod', 'service1')], socket_path, interval=3600)
+        daemon.start()
+        try:
+            assert store.get_value('proj1-prod-service1/key1') == 'value1'
+        finally:
+            daemon.stop()
+    assert not os.path.exists(socket_path)
+
+
+def test_main_requires_a_command():
+    assert main([]) == 2
@@ -0,0 +1,73 @@
+
+from param_teller.delta import DeltaSync
+from param_teller.parameter_store import ParameterStore
+from param_teller.secrets_manager import SecretsManager
+from benchmarks.stub_clients import StubSecretsManagerClient, StubSSMClient
+
+
+def test_parameter_store_refresh_fetches_only_changes():
+    client = StubSSMClient({'/service1/key{0}'.format(i): 'value{0}'.format(i) for i in range(1, 21)})
+    sync = DeltaSync(ParameterStore(ssm_client=client), '/service1/')
+
+    changes = sync.refresh()
+    assert len(changes.added) == 20
+    assert client.calls['get_parameters'] == 2
+
+    client.values['/service1/key3'] = 'value3_updated'
+    client.versions['/service1/key3'] = 2
+    client.values['/service1/key21'] = 'value21'
+    del client.values['/service1/key1']
+    client.calls.clear()
+
+    changes = sync.refresh()
+
+    assert changes.added == ['/service1/key21']
+    assert changes.changed == ['/service1/key3']
+    assert changes.removed == ['/service1/key1']
+    assert client.calls == {'describe_parameters': 1, 'get_parameters': 1}
+    assert sync.values['/service1/key3'] == 'value3_updated'
+    assert '/service1/key1' not in sync.values
+    assert len(sync.values) == 20
+
+
+def test_unchanged_refresh_lists_versions_only():
+    client = StubSSMClient({'/service1/key1': 'value1'})
+    sync = DeltaSync(ParameterStore(ssm_client=client), '/service1/')
+    sync.refresh()
+    client.calls.clear()
+
+    assert not sync.refresh()
+    assert client.calls == {'describe_parameters': 1}
+
+
+def test_secrets_manager_refresh_uses_version_ids():
+    client = StubSecretsManagerClient({'service1/key1': 'value1', 'service1/key2': 'value2'})
+    sync = DeltaSync(SecretsManager(sm_client=client), 'service1/')
+    sync.refresh()
+    client.calls.clear()
+
+    client.secrets['service1/key2'] = 'value2_rotated'
+    client.version_ids['service1/key2'] = 'v2'
+    changes = sync.refresh()
+
+    assert changes.changed == ['service1/key2']
+    assert sync.values == {'service1/key1': 'value1', 'service1/key2': 'value2_rotated'}
+    assert client.calls == {'list_secrets': 1, 'batch_get_secret_value': 1}
+
+
+def test_refresh_fetches_again_keys_without_value():
+    client = StubSSMClient({'/service1/key1': 'value1', '/service1/key2': 'value2'})
+    store = ParameterStore(ssm_client=client)
+    get_values = store.get_values
+    store.get_values = lambda *keys: {key: value for key, value in get_values(*keys).items() if key != '/service1/key2'}
+    sync = DeltaSync(store, '/service1/')
+
+    sync.refresh()
+    assert sync.values == {'/service1/key1': 'value1'}
+    assert '/service1/key2' not in sync.versions
+
+    store.get_values = get_values
+    changes = sync.refresh()
+
+    assert changes.added == ['/service1/key2']
+    assert sync.values == {'/service1/key1': 'value1', '/service1/key2': 'value2'}
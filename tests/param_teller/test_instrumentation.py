@@ -0,0 +1,108 @@
+from mock import MagicMock
+from pytest import raises
+
+from param_teller.cache import CachedStore
+from param_teller.instrumentation import Histogram, Instrumentation, set_default_instrumentation
+from param_teller.parameter_store import ParameterStore
+from param_teller.project_store import ProjectStore
+from param_teller.secrets_manager import SecretsManager
+from param_teller.throttle import Throttle
+from benchmarks.stub_clients import StubSecretsManagerClient, StubSSMClient, client_error
+
+
+def test_histogram_percentiles():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in [0.005] * 90 + [0.05] * 9 + [2.0]:
+        histogram.observe(value)
+
+    assert histogram.count == 100
+    assert histogram.percentile(0.5) == 0.01
+    assert histogram.percentile(0.95) == 0.1
+    assert histogram.percentile(1.0) == 2.0
+    assert Histogram().percentile(0.5) is None
+
+
+def test_counts_calls_and_pages_per_operation():
+    client = StubSSMClient({'service1.key{0:03d}'.format(i): 'value' for i in range(120)})
+    events = []
+    instrumentation = Instrumentation(hooks=[events.append])
+
+    values = ParameterStore(ssm_client=client, instrumentation=instrumentation).get_values_by_prefix('service1.')
+
+    assert len(values) == 120
+    assert instrumentation.calls('ssm.describe_parameters') == 3
+    assert instrumentation.calls('ssm.get_parameters') == 12
+    assert instrumentation.calls('ssm') == 15
+    assert instrumentation.pages == 3
+    assert len(events) == 15
+    report = instrumentation.as_dict()['operations']['ssm.get_parameters']
+    assert report['calls'] == 12
+    assert report['latency']['count'] == 12
+
+
+def test_records_every_attempt_and_errors():
+    sm_client = MagicMock()
+    sm_client.get_secret_value.side_effect = [client_error('ThrottlingException', 'GetSecretValue'),
+                                              {'SecretString': 'value1',
+                                               'ResponseMetadata': {'HTTPHeaders': {'content-length': '42'}}}]
+    instrumentation = Instrumentation()
+
+    secrets_manager = SecretsManager(sm_client=sm_client, throttle=Throttle(sleep=lambda delay: None),
+                                     instrumentation=instrumentation)
+
+    assert secrets_manager.get_value('key1') == 'value1'
+    report = instrumentation.as_dict()['operations']['secretsmanager.get_secret_value']
+    assert (report['calls'], report['errors'], report['bytes']) == (2, 1, 42)
+
+
+def test_failing_hooks_do_not_affect_calls():
+    client = StubSSMClient({'/service1/key1': 'value1'})
+    events = []
+    instrumentation = Instrumentation(hooks=[MagicMock(side_effect=ValueError('hook')), events.append])
+    parameter_store = ParameterStore(ssm_client=client, instrumentation=instrumentation)
+
+    assert parameter_store.get_value('/service1/key1') == 'value1'
+    with raises(Exception) as error:
+        parameter_store.get_value('/service1/missing')
+
+    assert error.value.response['Error']['Code'] == 'ParameterNotFound'
+    assert [event.error is not None for event in events] == [False, True]
+
+
+def test_times_project_store_loads_and_reports_caches():
+    client = StubSecretsManagerClient({'proj1-prod-service1/key1': 'value1'})
+    instrumentation = Instrumentation()
+    cache = CachedStore(SecretsManager(sm_client=client, instrumentation=instrumentation))
+    instrumentation.watch_cache('secrets', cache)
+    project_store = ProjectStore(cache, 'proj1', 'prod', 'service1', instrumentation=instrumentation)
+
+    project_store.get_service_parameters()
+    project_store.get_service_parameter('key1')
+
+    report = instrumentation.as_dict()
+    assert report['operations']['project_store.get_service_parameters']['calls'] == 1
+    assert report['caches']['secrets']['hit_ratio'] == 0.5
+
+
+def test_reports_spans_to_tracer():
+    tracer = MagicMock()
+    instrumentation = Instrumentation(tracer=tracer)
+
+    ParameterStore(ssm_client=StubSSMClient({'key1': 'value1'}), instrumentation=instrumentation).get_value('key1')
+
+    tracer.start_as_current_span.assert_called_once_with('ssm.get_parameter')
+
+
+def test_default_instrumentation():
+    instrumentation = Instrumentation()
+    set_default_instrumentation(instrumentation)
+    try:
+        with raises(Exception):
+            ParameterStore(ssm_client=StubSSMClient()).get_value('missing')
+    finally:
+        set_default_instrumentation(None)
+
+    ParameterStore(ssm_client=StubSSMClient({'key1': 'value1'})).get_value('key1')
+
+    assert instrumentation.as_dict()['operations']['ssm.get_parameter']['errors'] == 1
+    assert instrumentation.calls() == 1
@@ -0,0 +1,67 @@
+import subprocess
+import sys
+
+from pytest import raises
+
+from param_teller.cache import CachedStore
+from param_teller.offline import OfflineStore, ParameterNotFound
+from param_teller.project_store import ProjectParameterStore, ProjectStore
+from param_teller.snapshot import SnapshotFile
+
+
+def _store():
+    return OfflineStore({'/service1/key1': 'value1', '/service1/nested/key2': 'value2', 'service1_key3': 'value3'})
+
+
+def test_get_value():
+    assert _store().get_value('/service1/key1') == 'value1'
+
+
+def test_get_value_not_found():
+    with raises(ParameterNotFound):
+        _store().get_value('/service1/missing')
+
+
+def test_missing_keys_are_cached_as_not_found():
+    store = CachedStore(_store())
+
+    with raises(KeyError):
+        store.get_value('/service1/missing')
+    assert store.stats.misses == 1
+
+    with raises(KeyError):
+        store.get_value('/service1/missing')
+    assert store.stats.hits == 1
+
+
+def test_get_values_by_path_is_not_recursive():
+    assert _store().get_values_by_path('service1') == {'/service1/key1': 'value1'}
+
+
+def test_get_values_by_prefix():
+    assert _store().get_values_by_prefix('service1') == {'service1_key3': 'value3'}
+
+
+def test_project_store_reads_from_snapshot(tmpdir):
+    snapshot_file = SnapshotFile(str(tmpdir), SnapshotFile.generate_key())
+    namespace = ProjectParameterStore('proj1', 'prod', 'service1').snapshot_namespace()
+    snapshot_file.save(namespace, {'/proj1-prod-service1/key1': 'value1'}, {})
+
+    store = ProjectStore(OfflineStore.from_snapshot(snapshot_file, namespace), 'proj1', 'prod', 'service1',
+                         lead_separator=True)
+
+    assert store.get_service_parameter('key1') == 'value1'
+
+
+def test_import_does_not_load_boto3():
+    process = subprocess.Popen([
+        sys.executable, '-X', 'importtime', '-c',
+        'from param_teller import ProjectParameterStore; '
+        'from param_teller.offline import OfflineStore; '
+        'ProjectParameterStore("proj1", "prod", "service1").snapshot_namespace()'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, import_times = process.communicate()
+
+    assert process.returncode == 0
+    assert b'param_teller' in import_times
+    assert b'boto' not in import_times
@@ -1,8 +1,11 @@
 from param_teller.parameter_store import ParameterStore
+from param_teller.throttle import Throttle
 from moto import mock_ssm
 import boto3
+from mock import MagicMock
 from pytest import raises
 from botocore.exceptions import ParamValidationError
+from benchmarks.stub_clients import StubSSMClient, client_error
 
 
 # In AWS, a leading path is not required, i.e. "/param" and "param" match the same key and are not unique
@@ -63,6 +66,35 @@ def test_get_values_with_empty_key_list():
     assert len(values) is 0
 
 
+@mock_ssm
+def test_get_values_in_chunks():
+    client = boto3.client('ssm')
+    keys = ['/service1/key{0}'.format(i) for i in range(1, 26)]
+    for i, key in enumerate(keys, 1):
+        client.put_parameter(Name=key, Value='value1_{0}'.format(i), Type='SecureString')
+
+    values = ParameterStore(max_workers=3).get_values(*keys)
+
+    assert len(values) is 25
+    for i, key in enumerate(keys, 1):
+        _assert_key_value(values, key, 'value1_{0}'.format(i))
+
+
+@mock_ssm
+def test_get_values_with_invalid_keys():
+    client = boto3.client('ssm')
+    client.put_parameter(Name='/service1/key1', Value='value1_1', Type='SecureString')
+    client.put_parameter(Name='/service1/key2', Value='value1_2', Type='SecureString')
+
+    values, invalid_keys = ParameterStore().get_values_with_invalid_keys('/service1/key1', '/service1/key3',
+                                                                         '/service1/key2', '/service1/key1')
+
+    assert len(values) is 2
+    _assert_key_value(values, '/service1/key1', 'value1_1')
+    _assert_key_value(values, '/service1/key2', 'value1_2')
+    assert invalid_keys == {'/service1/key3'}
+
+
 @mock_ssm
 def test_get_values_by_prefix():
     client = boto3.client('ssm')
@@ -89,6 +121,140 @@ def test_get_values_by_prefix_with_pagination():
         _assert_key_value(values, 'service1_key{0}'.format(i), 'value1_{0}'.format(i))
 
 
+def test_iter_values_by_path_streams_pages():
+    client = StubSSMClient({'/service1/key{0:02d}'.format(i): 'value1_{0}'.format(i) for i in range(1, 26)})
+
+    values = ParameterStore(ssm_client=client).iter_values_by_path('/service1')
+
+    assert next(values) == ('/service1/key01', 'value1_1')
+    assert client.calls['get_parameters_by_path'] == 1
+    assert len(list(values)) == 24
+    assert client.calls['get_parameters_by_path'] == 3
+
+
+def test_iter_values_by_prefix_streams_pages():
+    client = StubSSMClient({'service1_key{0:03d}'.format(i): 'value1_{0}'.format(i) for i in range(1, 121)})
+
+    values = ParameterStore(ssm_client=client).iter_values_by_prefix('service1')
+
+    assert next(values) == ('service1_key001', 'value1_1')
+    assert len(list(values)) == 119
+    assert client.calls['describe_parameters'] == 3
+    assert client.calls['get_parameters'] == 12
+
+
+def test_get_values_by_prefix_with_path_prefix_reads_values_by_path():
+    client = StubSSMClient({'/service1/key{0:02d}'.format(i): 'value1_{0}'.format(i) for i in range(1, 26)})
+    client.values.update({'/service1/nested/key1': 'nested1', '/service10/key1': 'value10_1'})
+
+    values = ParameterStore(ssm_client=client).get_values_by_prefix('/service1/')
+
+    assert len(values) == 26
+    _assert_key_value(values, '/service1/nested/key1', 'nested1')
+    assert client.calls == {'get_parameters_by_path': 3}
+
+
+def test_put_values_reports_created_and_updated_keys():
+    client = StubSSMClient({'/service1/key1': 'old'})
+
+    report = ParameterStore(ssm_client=client).put_values({'/service1/key1': 'new', '/service1/key2': 'value1_2'})
+
+    assert report.created == ['/service1/key2']
+    assert report.updated == ['/service1/key1']
+    assert report.ok
+    assert client.values == {'/service1/key1': 'new', '/service1/key2': 'value1_2'}
+    assert client.calls == {'put_parameter': 2}
+
+
+def test_put_values_reports_failed_keys():
+    client = StubSSMClient({'/service1/key1': 'old'})
+
+    report = ParameterStore(ssm_client=client).put_values({'/service1/key1': 'new', '/service1/key2': 'value1_2'},
+                                                          overwrite=False)
+
+    assert report.failed == ['/service1/key1']
+    assert report.created == ['/service1/key2']
+    assert report.errors['/service1/key1'].response['Error']['Code'] == 'ParameterAlreadyExists'
+    assert client.values['/service1/key1'] == 'old'
+
+
+def test_put_values_without_overwrite_retries_throttled_writes():
+    client = StubSSMClient()
+    put_parameter = client.put_parameter
+    errors = [client_error('ThrottlingException', 'PutParameter')]
+
+    def throttled_put_parameter(**kwargs):
+        if errors:
+            raise errors.pop()
+        return put_parameter(**kwargs)
+
+    client.put_parameter = MagicMock(side_effect=throttled_put_parameter)
+    parameter_store = ParameterStore(ssm_client=client, throttle=Throttle(sleep=lambda delay: None))
+
+    report = parameter_store.put_values({'/service1/key1': 'value1_1'}, overwrite=False)
+
+    assert report.created == ['/service1/key1']
+    assert client.put_parameter.call_count == 2
+    assert client.values == {'/service1/key1': 'value1_1'}
+
+
+def test_delete_values_in_chunks():
+    client = StubSSMClient({'/service1/key{0:02d}'.format(i): 'value1_{0}'.format(i) for i in range(1, 26)})
+    keys = sorted(client.values) + ['/service1/missing']
+
+    report = ParameterStore(ssm_client=client).delete_values(*keys)
+
+    assert len(report.deleted) == 25
+    assert report.failed == ['/service1/missing']
+    assert report.errors['/service1/missing'].response['Error']['Code'] == 'ParameterNotFound'
+    assert client.values == {}
+    assert client.calls == {'delete_parameters': 3}
+
+
+def test_sync_prefix_writes_only_changes():
+    client = StubSSMClient({'/service1/same': 'value', '/service1/changed': 'old', '/service1/removed': 'value',
+                            '/service2/key1': 'value2_1'})
+    desired = {'/service1/same': 'value', '/service1/changed': 'new', '/service1/added': 'value'}
+
+    report = ParameterStore(ssm_client=client).sync_prefix('/service1/', desired)
+
+    assert report.unchanged == ['/service1/same']
+    assert report.updated == ['/service1/changed']
+    assert report.created == ['/service1/added']
+    assert report.deleted == ['/service1/removed']
+    assert client.values == dict(desired, **{'/service2/key1': 'value2_1'})
+    assert client.calls == {'get_parameters_by_path': 1, 'put_parameter': 2, 'delete_parameters': 1}
+
+
+def test_sync_prefix_writes_type_changes():
+    client = StubSSMClient({'/service1/key1': 'value1_1', '/service1/key2': 'value1_2'})
+    client.types['/service1/key2'] = 'String'
+
+    report = ParameterStore(ssm_client=client).sync_prefix('/service1/', dict(client.values))
+
+    assert report.unchanged == ['/service1/key1']
+    assert report.updated == ['/service1/key2']
+    assert client.types['/service1/key2'] == 'SecureString'
+
+
+def test_sync_prefix_without_delete():
+    client = StubSSMClient({'/service1/kept': 'value'})
+
+    report = ParameterStore(ssm_client=client).sync_prefix('/service1/', {'/service1/key1': 'value1_1'}, delete=False)
+
+    assert report.created == ['/service1/key1']
+    assert '/service1/kept' in client.values
+    assert 'delete_parameters' not in client.calls
+
+
+def test_sync_prefix_rejects_keys_outside_prefix():
+    client = StubSSMClient()
+
+    with raises(ValueError):
+        ParameterStore(ssm_client=client).sync_prefix('/service1/', {'/service2/key1': 'value2_1'})
+    assert not client.calls
+
+
 def _assert_key_value(dictionary, key, value):
     assert key in dictionary
     assert dictionary.get(key) == value
@@ -0,0 +1,61 @@
+from pytest import raises
+
+from param_teller.path_tree import PathTree
+
+VALUES = {
+    '/proj1-prod-service1/db/host': 'primary',
+    '/proj1-prod-service1/db/replica/host': 'replica',
+    '/proj1-prod-service1/db/replica/port': '5432',
+    '/proj1-prod-service1/db': 'postgres',
+    '/proj1-prod-service1/token': 'secret',
+    '/proj1-prod-service2/token': 'other',
+}
+
+
+def _tree():
+    return PathTree.from_values(VALUES, prefix='/proj1-prod-service1/')
+
+
+def test_lookup_by_relative_key():
+    tree = _tree()
+
+    assert tree['db/replica/host'] == 'replica'
+    assert tree.get('/db/replica/port/') == '5432'
+    assert tree.get('db/replica') is None
+    assert tree.get('missing/key', 'default') == 'default'
+    assert 'token' in tree
+    assert 'db/replica' not in tree
+    with raises(KeyError):
+        tree['db/replica']
+    assert len(tree) == 5
+
+
+def test_subtree():
+    replica = _tree().subtree('db/replica')
+
+    assert replica.prefix == '/proj1-prod-service1/db/replica/'
+    assert dict(replica.items()) == {'host': 'replica', 'port': '5432'}
+    assert dict(replica.full_items()) == {'/proj1-prod-service1/db/replica/host': 'replica',
+                                          '/proj1-prod-service1/db/replica/port': '5432'}
+    assert len(_tree().subtree('missing')) == 0
+
+
+def test_iteration_is_sorted():
+    tree = _tree()
+
+    assert list(tree) == ['db', 'db/host', 'db/replica/host', 'db/replica/port', 'token']
+    assert list(tree.keys('db/replica')) == ['db/replica/host', 'db/replica/port']
+
+
+def test_to_dict():
+    assert _tree().to_dict() == {
+        'db': {'': 'postgres', 'host': 'primary', 'replica': {'host': 'replica', 'port': '5432'}},
+        'token': 'secret',
+    }
+
+
+def test_custom_separator():
+    tree = PathTree.from_values({'proj1-prod-service1.db.host': 'primary'}, 'proj1-prod-service1.', '.')
+
+    assert tree['db.host'] == 'primary'
+    assert tree.to_dict() == {'db': {'host': 'primary'}}
@@ -1,5 +1,10 @@
 from moto import mock_ssm
-from param_teller.project_store import ProjectParameterStore, ProjectSecretsManager
+from param_teller.offline import OfflineStore
+from param_teller.parameter_store import ParameterStore
+from param_teller.project_store import (ProjectParameterStore, ProjectSecretsManager, ProjectStore,
+                                        get_services_parameters)
+from param_teller.secrets_manager import ListingCache, SecretsManager
+from benchmarks.stub_clients import StubSecretsManagerClient, StubSSMClient
 from mock import patch, MagicMock
 import boto3
 import pytest
@@ -56,6 +61,8 @@ def mock_secrets_manager():
     }
     mock_sm.return_value.list_secrets.side_effect = lambda **args: {
         'SecretList': [{'Name': key} for key in secrets.keys()]}
+    # Client of a botocore version without BatchGetSecretValue.
+    del mock_sm.return_value.batch_get_secret_value
     return mock_sm
 
 
@@ -74,6 +81,127 @@ class TestProjectSecretsManager(object):
 
         assert value == 'value1_prod_1_2'
 
+    def test_instances_share_listing_cache(self, store):
+        listings = ListingCache(ttl=60)
+
+        for _ in range(2):
+            values = ProjectSecretsManager('proj1', 'prod', 'service1', listing_cache=listings).get_service_parameters()
+            assert len(values) == 2
+
+        assert store.return_value.list_secrets.call_count == 1
+
+
+class TestProjectStoreRefresh(object):
+
+    @pytest.fixture
+    def backend(self):
+        backend = MagicMock()
+        backend.get_values_by_prefix.side_effect = [
+            {'proj1-prod-service1/key1': 'value1'},
+            {'proj1-prod-service1/key1': 'value2'},
+        ]
+        backend.get_value.return_value = 'value_from_backend'
+        return backend
+
+    def test_reads_are_served_from_snapshot(self, backend):
+        store = ProjectStore(backend, project='proj1', env='prod', service='service1')
+        store.start_refresh(interval=3600)
+
+        assert store.get_service_parameter('key1') == 'value1'
+        assert store.get_service_parameters() == {'proj1-prod-service1/key1': 'value1'}
+        assert backend.get_values_by_prefix.call_count == 1
+        assert backend.get_value.call_count == 0
+
+        store.stop_refresh()
+
+    def test_service_tree_is_built_once_per_snapshot(self, backend):
+        store = ProjectStore(backend, project='proj1', env='prod', service='service1')
+        store.start_refresh(interval=3600)
+
+        tree = store.get_service_tree()
+        assert tree['key1'] == 'value1'
+        assert store.get_service_tree() is tree
+
+        store._refresher.refresh()
+        assert store.get_service_tree()['key1'] == 'value2'
+        assert backend.get_values_by_prefix.call_count == 2
+
+        store.stop_refresh()
+
+    def test_unknown_keys_fall_back_to_backend(self, backend):
+        store = ProjectStore(backend, project='proj1', env='prod', service='service1')
+        store.start_refresh(interval=3600)
+
+        assert store.get_service_parameter('key2') == 'value_from_backend'
+        backend.get_value.assert_called_once_with('proj1-prod-service1/key2')
+
+        store.stop_refresh()
+
+    def test_refresh_notifies_changes(self, backend):
+        changes = []
+        store = ProjectStore(backend, project='proj1', env='prod', service='service1')
+        refresher = store.start_refresh(interval=3600, on_change=lambda *change: changes.append(change))
+
+        refresher.refresh()
+        store.stop_refresh()
+
+        assert changes == [('proj1-prod-service1/key1', 'value1', 'value2')]
+
+
+class TestGetServicesParameters(object):
+
+    values = {
+        '/proj1-prod-service1/key1': 'value1_prod_1_1',
+        '/proj1-prod-service1/key2': 'value1_prod_1_2',
+        '/proj1-prod-service10/key1': 'value1_prod_10_1',
+        '/proj1-test-service1/key3': 'value1_test_1_3',
+        '/proj1-prod-service2/key1': 'value1_prod_2_1',
+        '/proj2-prod-service1/key1': 'value2_prod_1_1',
+    }
+
+    services = [('proj1', 'prod', 'service1'), ('proj1', 'test', 'service1'), ('proj1', 'prod', 'service2')]
+
+    def test_parameter_store_one_sweep_per_project_env(self):
+        client = StubSSMClient(self.values)
+
+        values = get_services_parameters(ParameterStore(ssm_client=client), self.services, lead_separator=True)
+
+        assert values == {'proj1': {
+            'prod': {
+                'service1': {'/proj1-prod-service1/key1': 'value1_prod_1_1',
+                             '/proj1-prod-service1/key2': 'value1_prod_1_2'},
+                'service2': {'/proj1-prod-service2/key1': 'value1_prod_2_1'},
+            },
+            'test': {'service1': {'/proj1-test-service1/key3': 'value1_test_1_3'}},
+        }}
+        assert client.calls == {'describe_parameters': 2, 'get_parameters': 1}
+
+    def test_lists_only_shared_prefixes(self):
+        backend = MagicMock(spec=['iter_keys_by_prefix', 'get_values'])
+        backend.iter_keys_by_prefix.return_value = []
+
+        get_services_parameters(backend, self.services + [('proj2', 'prod', 'service1')], lead_separator=True)
+
+        prefixes = sorted(call[0][0] for call in backend.iter_keys_by_prefix.call_args_list)
+        assert prefixes == ['/proj1-prod-service', '/proj1-test-service1/', '/proj2-prod-service1/']
+        assert not backend.get_values.called
+
+    def test_secrets_manager(self):
+        client = StubSecretsManagerClient({key.lstrip('/'): value for key, value in self.values.items()})
+
+        values = get_services_parameters(SecretsManager(sm_client=client), self.services + [('proj3', 'dev', 'x')])
+
+        assert values['proj1']['prod']['service1'] == {'proj1-prod-service1/key1': 'value1_prod_1_1',
+                                                       'proj1-prod-service1/key2': 'value1_prod_1_2'}
+        assert values['proj3'] == {'dev': {'x': {}}}
+        assert client.calls['batch_get_secret_value'] == 1
+        assert 'get_secret_value' not in client.calls
+
+    def test_backend_without_key_listing(self):
+        values = get_services_parameters(OfflineStore(self.values), self.services, lead_separator=True)
+
+        assert values['proj1']['test']['service1'] == {'/proj1-test-service1/key3': 'value1_test_1_3'}
+
 
 def assert_key_value(dictionary, key, value):
     assert key in dictionary
@@ -0,0 +1,42 @@
+from mock import MagicMock
+
+from param_teller.refresh import SnapshotRefresher
+
+
+def test_refresh_notifies_only_changed_keys():
+    loader = MagicMock(side_effect=[{'key1': 'a', 'key2': 'b', 'key3': 'c'},
+                                    {'key1': 'a', 'key2': 'B', 'key4': 'd'}])
+    changes = []
+    refresher = SnapshotRefresher(loader, interval=3600, on_change=lambda *change: changes.append(change)).start()
+
+    assert refresher.refresh()
+    refresher.stop()
+
+    assert refresher.snapshot == {'key1': 'a', 'key2': 'B', 'key4': 'd'}
+    assert sorted(changes) == [('key2', 'b', 'B'), ('key3', 'c', None), ('key4', None, 'd')]
+
+
+def test_failed_refresh_keeps_last_good_snapshot():
+    error = RuntimeError('boom')
+    loader = MagicMock(side_effect=[{'key1': 'a'}, error])
+    refresher = SnapshotRefresher(loader, interval=3600).start()
+
+    assert not refresher.refresh()
+    refresher.stop()
+
+    assert refresher.snapshot == {'key1': 'a'}
+    assert refresher.last_error is error
+
+
+def test_background_thread_refreshes_snapshot():
+    loader = MagicMock(side_effect=[{'key1': 'a'}] + [{'key1': 'b'}] * 100)
+    refresher = SnapshotRefresher(loader, interval=0.01, jitter=0).start()
+
+    for _ in range(100):
+        if refresher.snapshot == {'key1': 'b'}:
+            break
+        refresher._stopped.wait(0.01)
+    refresher.stop()
+
+    assert refresher.snapshot == {'key1': 'b'}
+    assert not refresher.running
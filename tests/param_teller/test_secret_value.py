@@ -0,0 +1,52 @@
+import json
+
+from mock import patch
+from pytest import raises
+
+from param_teller.secret_value import SecretValue
+from param_teller.secrets_manager import SecretsManager
+from benchmarks.stub_clients import StubSecretsManagerClient
+
+
+def test_binary_secret_is_not_copied():
+    payload = b'-----BEGIN CERTIFICATE-----'
+    secret = SecretValue('cert', 'v1', binary=payload)
+
+    assert secret.is_binary
+    assert secret.string is None
+    assert secret.value is payload
+    assert secret.binary.obj is payload
+    assert secret.binary.tobytes() == payload
+
+
+def test_json_is_decoded_once():
+    text = json.dumps({'user': 'admin', 'password': 'secret'})
+
+    with patch('param_teller.secret_value.json.loads', wraps=json.loads) as loads:
+        secret = SecretValue('db', 'v1', string=text)
+        assert secret['user'] == 'admin'
+        assert secret.get('password') == 'secret'
+        assert secret.get('missing', 'default') == 'default'
+        assert loads.call_count == 1
+
+
+def test_json_of_binary_secret():
+    secret = SecretValue('db', binary=b'{"user": "admin"}')
+
+    assert secret['user'] == 'admin'
+    with raises(KeyError):
+        secret['password']
+
+
+def test_repr_hides_value():
+    assert 'secret' not in repr(SecretValue('db', 'v1', string='secret'))
+
+
+def test_secrets_manager_returns_binary_secrets():
+    client = StubSecretsManagerClient({'cert': b'\x00\x01', 'db': '{"user": "admin"}'})
+    secrets_manager = SecretsManager(sm_client=client)
+
+    assert secrets_manager.get_value('cert') == b'\x00\x01'
+    assert secrets_manager.get_values('cert', 'db') == {'cert': b'\x00\x01', 'db': '{"user": "admin"}'}
+    secret = secrets_manager.get_secret('db')
+    assert (secret.version_id, secret['user']) == ('v1', 'admin')
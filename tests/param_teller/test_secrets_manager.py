@@ -1,5 +1,10 @@
-from param_teller.secrets_manager import SecretsManager
+from param_teller.secrets_manager import ListingCache, SecretError, SecretsManager
+from param_teller.utils import error_code
 from mock import patch, MagicMock
+from botocore.exceptions import ClientError
+from pytest import raises
+from param_teller.throttle import Throttle
+from benchmarks.stub_clients import StubSecretsManagerClient
 
 
 # TODO: Replace by moto mock for SecretsManager when available
@@ -16,9 +21,24 @@ def mock_secrets_manager():
     }
     mock_sm.return_value.list_secrets.side_effect = lambda **args: {
         'SecretList': [{'Name': key} for key in secrets.keys()]}
+    # Client of a botocore version without BatchGetSecretValue.
+    del mock_sm.return_value.batch_get_secret_value
     return mock_sm
 
 
+def _client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'GetSecretValue')
+
+
+def _get_secret_value_with_errors(**args):
+    secret_id = args.get('SecretId')
+    if secret_id == 'missing':
+        raise _client_error('ResourceNotFoundException')
+    if secret_id == 'denied':
+        raise _client_error('AccessDeniedException')
+    return {'SecretString': 'value_{0}'.format(secret_id)}
+
+
 @patch('param_teller.secrets_manager.client', new_callable=mock_secrets_manager)
 def test_get_values(client):
     values = SecretsManager().get_values('service1/key1', 'service2/key1')
@@ -41,6 +61,48 @@ def test_get_values_with_empty_key_list(client):
     assert len(values) is 0
 
 
+def test_get_values_skips_missing_keys():
+    sm_client = MagicMock()
+    sm_client.get_secret_value.side_effect = _get_secret_value_with_errors
+    del sm_client.batch_get_secret_value
+
+    values = SecretsManager(sm_client=sm_client, max_workers=4).get_values('key1', 'missing', 'key2')
+
+    assert values == {'key1': 'value_key1', 'key2': 'value_key2'}
+
+
+def test_get_values_raises_unexpected_errors():
+    sm_client = MagicMock()
+    sm_client.get_secret_value.side_effect = _get_secret_value_with_errors
+    del sm_client.batch_get_secret_value
+
+    with raises(ClientError):
+        SecretsManager(sm_client=sm_client).get_values('key1', 'denied')
+
+
+def test_get_values_with_errors():
+    sm_client = MagicMock()
+    sm_client.get_secret_value.side_effect = _get_secret_value_with_errors
+    del sm_client.batch_get_secret_value
+
+    values, errors = SecretsManager(sm_client=sm_client).get_values_with_errors('key1', 'missing', 'denied')
+
+    assert values == {'key1': 'value_key1'}
+    assert sorted(errors.keys()) == ['denied', 'missing']
+
+
+def test_get_value_retries_throttled_requests():
+    sm_client = MagicMock()
+    sm_client.get_secret_value.side_effect = [_client_error('ThrottlingException'),
+                                              _client_error('ThrottlingException'),
+                                              {'SecretString': 'value1'}]
+
+    value = SecretsManager(sm_client=sm_client, throttle=Throttle(sleep=lambda delay: None)).get_value('key1')
+
+    assert value == 'value1'
+    assert sm_client.get_secret_value.call_count == 3
+
+
 @patch('param_teller.secrets_manager.client', new_callable=mock_secrets_manager)
 def test_get_values_by_prefix(client):
     values = SecretsManager().get_values_by_prefix('service1')
@@ -51,6 +113,165 @@ def test_get_values_by_prefix(client):
     _assert_key_value(values, 'service1/key2', 'value1_2')
 
 
+def test_iter_secret_keys_streams_pages():
+    client = StubSecretsManagerClient({'service1/key{0:03d}'.format(i): 'value' for i in range(250)})
+
+    keys = SecretsManager(sm_client=client).iter_secret_keys()
+
+    assert next(keys) == 'service1/key000'
+    assert client.calls['list_secrets'] == 1
+    assert len(list(keys)) == 249
+    assert client.calls['list_secrets'] == 3
+
+
+def test_iter_values_by_prefix_streams_pages():
+    client = StubSecretsManagerClient({'service{0}/key{1:02d}'.format(i % 2, i): 'value{0}'.format(i)
+                                       for i in range(25)})
+
+    values = SecretsManager(sm_client=client).iter_values_by_prefix('service0/')
+
+    assert next(values) == ('service0/key00', 'value0')
+    assert client.calls['list_secrets'] == 1
+    assert len(list(values)) == 12
+
+
+def test_get_versions_by_prefix():
+    client = StubSecretsManagerClient({'service1/key1': 'value1_1', 'service2/key1': 'value2_1'})
+    client.version_ids['service1/key1'] = 'v2'
+
+    versions = SecretsManager(sm_client=client).get_versions_by_prefix('service1/')
+
+    assert versions == {'service1/key1': 'v2'}
+    assert client.calls == {'list_secrets': 1}
+
+
+def test_get_values_by_prefix_filters_listing_server_side():
+    client = StubSecretsManagerClient({'service{0:03d}/key'.format(i): 'value{0}'.format(i) for i in range(500)})
+
+    values = SecretsManager(sm_client=client).get_values_by_prefix('service042/')
+
+    assert values == {'service042/key': 'value42'}
+    assert client.calls == {'list_secrets': 1, 'batch_get_secret_value': 1}
+
+
+def test_get_values_by_prefix_reuses_listing():
+    client = StubSecretsManagerClient({'service1/key1': 'value1_1', 'service1/key2': 'value1_2',
+                                       'service2/key1': 'value2_1'})
+    now = [0]
+    secrets_manager = SecretsManager(sm_client=client, listing_ttl=60, clock=lambda: now[0])
+
+    first = secrets_manager.get_values_by_prefix('service1/')
+    second = secrets_manager.get_values_by_prefix('service1/key2')
+
+    assert first == {'service1/key1': 'value1_1', 'service1/key2': 'value1_2'}
+    assert second == {'service1/key2': 'value1_2'}
+    assert client.calls['list_secrets'] == 1
+
+    client.secrets['service1/key3'] = 'value1_3'
+    assert 'service1/key3' not in secrets_manager.get_values_by_prefix('service1/')
+    assert 'service1/key3' in SecretsManager(sm_client=client, listing_ttl=60).get_values_by_prefix('service1/')
+    now[0] = 60
+    assert 'service1/key3' in secrets_manager.get_values_by_prefix('service1/')
+    assert client.calls['list_secrets'] == 3
+
+
+def test_get_values_by_prefix_shares_listing_cache_between_instances():
+    client = StubSecretsManagerClient({'service1/key1': 'value1_1', 'service2/key1': 'value2_1'})
+    listings = ListingCache(ttl=60)
+
+    SecretsManager(sm_client=client, listing_cache=listings).get_values_by_prefix('service')
+    values = SecretsManager(sm_client=client, listing_cache=listings).get_values_by_prefix('service2/')
+
+    assert values == {'service2/key1': 'value2_1'}
+    assert client.calls['list_secrets'] == 1
+
+
+def test_get_values_by_prefix_lists_every_time_by_default():
+    client = StubSecretsManagerClient({'service1/key1': 'value1_1'})
+    secrets_manager = SecretsManager(sm_client=client)
+
+    secrets_manager.get_values_by_prefix('service1/')
+    client.secrets['service1/key2'] = 'value1_2'
+
+    assert 'service1/key2' in secrets_manager.get_values_by_prefix('service1/')
+    assert client.calls['list_secrets'] == 2
+
+
+def test_get_values_by_prefix_raises_unexpected_errors():
+    client = StubSecretsManagerClient({'service1/key1': 'value1_1'})
+    client.get_secret_value = MagicMock(side_effect=_client_error('AccessDeniedException'))
+
+    with raises(ClientError):
+        SecretsManager(sm_client=client, batch=False).get_values_by_prefix('service1/')
+
+
+def test_get_values_batches_twenty_secrets_per_call():
+    client = StubSecretsManagerClient({'key{0:02d}'.format(i): 'value{0}'.format(i) for i in range(45)})
+
+    values = SecretsManager(sm_client=client).get_values(*['key{0:02d}'.format(i) for i in range(45)] + ['missing'])
+
+    assert len(values) == 45
+    assert values['key44'] == 'value44'
+    assert client.calls == {'batch_get_secret_value': 3}
+
+
+def test_get_values_follows_batch_pages():
+    client = StubSecretsManagerClient({'key{0:02d}'.format(i): 'value' for i in range(12)}, batch_page_size=5)
+
+    values = SecretsManager(sm_client=client).get_values(*['key{0:02d}'.format(i) for i in range(12)])
+
+    assert len(values) == 12
+    assert client.calls == {'batch_get_secret_value': 3}
+
+
+def test_get_values_reports_batch_errors_per_secret():
+    client = StubSecretsManagerClient({'key1': 'value1', 'denied': 'value'}, denied=['denied'])
+    secrets_manager = SecretsManager(sm_client=client)
+
+    values, errors = secrets_manager.get_values_with_errors('key1', 'missing', 'denied')
+
+    assert values == {'key1': 'value1'}
+    assert error_code(errors['missing']) == 'ResourceNotFoundException'
+    assert error_code(errors['denied']) == 'AccessDeniedException'
+    with raises(SecretError):
+        secrets_manager.get_values('key1', 'denied')
+    assert client.calls == {'batch_get_secret_value': 2}
+
+
+def test_get_values_falls_back_when_batch_is_denied():
+    client = StubSecretsManagerClient({'key{0}'.format(i): 'value{0}'.format(i) for i in range(5)},
+                                      batch_error='AccessDeniedException')
+    secrets_manager = SecretsManager(sm_client=client)
+
+    assert len(secrets_manager.get_values(*['key{0}'.format(i) for i in range(5)])) == 5
+    assert client.calls == {'batch_get_secret_value': 1, 'get_secret_value': 5}
+
+    assert len(secrets_manager.get_values('key1', 'key2')) == 2
+    assert client.calls == {'batch_get_secret_value': 1, 'get_secret_value': 7}
+
+
+def test_get_values_by_prefix_falls_back_when_batch_is_unavailable():
+    client = StubSecretsManagerClient({'service1/key1': 'value1_1', 'service1/key2': 'value1_2'},
+                                      batch_error='UnknownOperationException')
+
+    values = SecretsManager(sm_client=client).get_values_by_prefix('service1/')
+
+    assert values == {'service1/key1': 'value1_1', 'service1/key2': 'value1_2'}
+    assert client.calls == {'list_secrets': 1, 'batch_get_secret_value': 1, 'get_secret_value': 2}
+
+
+def test_get_values_raises_attribute_errors_from_batch_responses():
+    client = StubSecretsManagerClient({'key1': 'value1'})
+    client.batch_get_secret_value = MagicMock(return_value={'SecretValues': [None], 'Errors': []})
+    secrets_manager = SecretsManager(sm_client=client)
+
+    with raises(AttributeError):
+        secrets_manager.get_values('key1')
+    with raises(AttributeError):
+        secrets_manager.get_values('key1')
+    assert 'get_secret_value' not in client.calls
+
+
 def _assert_key_value(dictionary, key, value):
     assert key in dictionary
     assert dictionary.get(key) == value
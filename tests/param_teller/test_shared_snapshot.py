@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import struct
+import sys
+
+import pytest
+from mock import MagicMock
+
+if sys.version_info < (3, 8):
+    pytest.skip('Shared snapshots require Python 3.8', allow_module_level=True)
+
+from param_teller.offline import ParameterNotFound
+from param_teller.project_store import ProjectStore
+from param_teller.shared_snapshot import SharedSnapshot, SharedSnapshotPublisher, SnapshotView, encode
+
+
+@pytest.fixture
+def publisher():
+    with SharedSnapshotPublisher('param-teller-test-{pid}'.format(pid=os.getpid())) as publisher:
+        yield publisher
+
+
+def _read_in_child(name, queue):
+    queue.put(SharedSnapshot(name).get_values_by_prefix('proj1-prod-service1/'))
+
+
+def test_view_reads_encoded_values_in_place():
+    view = SnapshotView(encode({'b/key': 'value', 'a/key': u'café', 'a/binary': b'\x00\x01'}))
+
+    assert len(view) == 3
+    assert list(view) == ['a/binary', 'a/key', 'b/key']
+    assert view['a/key'] == u'café'
+    assert view.get('a/binary') == b'\x00\x01'
+    assert view.get('missing') is None
+    assert dict(view.items('a/')) == {'a/binary': b'\x00\x01', 'a/key': u'café'}
+
+
+def test_readers_see_swapped_snapshots(publisher):
+    publisher.publish({'key1': 'value1'})
+    reader = SharedSnapshot(publisher.name)
+    previous = reader.snapshot
+
+    publisher.publish({'key1': 'value2', 'key2': 'value3'})
+
+    assert reader.get_value('key1') == 'value2'
+    assert reader.get_values('key1', 'key2', 'missing') == {'key1': 'value2', 'key2': 'value3'}
+    assert previous['key1'] == 'value1'
+    with pytest.raises(ParameterNotFound):
+        reader.get_value('missing')
+
+
+def test_unpublished_snapshot_times_out(publisher):
+    with pytest.raises(LookupError):
+        SharedSnapshot(publisher.name, timeout=0, sleep=lambda delay: None).get_value('key1')
+
+
+def test_interrupted_publish_times_out(publisher):
+    publisher.publish({'key1': 'value1'})
+    # A publisher dying mid-publish leaves an odd sequence number behind.
+    sequence = struct.unpack_from('<Q', publisher._control.buf, 0)[0]
+    struct.pack_into('<Q', publisher._control.buf, 0, sequence + 1)
+    now = [0.0]
+    sleeps = []
+
+    def sleep(delay):
+        sleeps.append(delay)
+        now[0] += delay
+
+    reader = SharedSnapshot(publisher.name, timeout=1, clock=lambda: now[0], sleep=sleep)
+
+    with pytest.raises(LookupError):
+        reader.get_value('key1')
+    assert 0 < len(sleeps) <= 101
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_forked_workers_read_snapshot_loaded_by_parent(publisher):
+    backend = MagicMock()
+    backend.get_values_by_prefix.return_value = {'proj1-prod-service1/key1': 'value1'}
+    store = ProjectStore(backend, project='proj1', env='prod', service='service1')
+    store.start_refresh(interval=3600, publisher=publisher)
+
+    try:
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        worker = context.Process(target=_read_in_child, args=(publisher.name, queue))
+        worker.start()
+        values = queue.get(timeout=10)
+        worker.join()
+    finally:
+        store.stop_refresh()
+
+    assert values == {'proj1-prod-service1/key1': 'value1'}
+    assert backend.get_values_by_prefix.call_count == 1
+    worker_store = ProjectStore(SharedSnapshot(publisher.name), project='proj1', env='prod', service='service1')
+    assert worker_store.get_service_parameter('key1') == 'value1'
@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+from param_teller.parameter_store import ParameterStore
+from param_teller.project_store import ProjectStore
+from param_teller.snapshot import SnapshotFile, SnapshotLoader
+from benchmarks.stub_clients import StubSSMClient
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def snapshot_file(tmpdir, clock):
+    return SnapshotFile(str(tmpdir.join('snapshots')), SnapshotFile.generate_key(), max_age=60, clock=clock)
+
+
+def test_save_and_load(snapshot_file):
+    snapshot_file.save('proj1-prod-service1/', {'key1': 'value1'}, {'key1': '1'})
+
+    snapshot = snapshot_file.load('proj1-prod-service1/')
+
+    assert snapshot.values == {'key1': 'value1'}
+    assert snapshot.versions == {'key1': '1'}
+    assert snapshot_file.load('proj1-prod-service2/') is None
+
+
+def test_save_and_load_binary_values(snapshot_file):
+    snapshot_file.save('proj1-prod-service1/', {'key1': 'value1', 'key2': b'\x00\x01'}, {'key1': '1', 'key2': '1'})
+
+    snapshot = snapshot_file.load('proj1-prod-service1/')
+
+    assert snapshot.values == {'key1': 'value1', 'key2': b'\x00\x01'}
+
+
+def test_snapshot_is_encrypted(snapshot_file):
+    snapshot_file.save('proj1-prod-service1/', {'key1': 'super-secret-value'}, {})
+
+    with open(snapshot_file.path('proj1-prod-service1/'), 'rb') as encrypted:
+        assert b'super-secret-value' not in encrypted.read()
+
+
+def test_load_ignores_expired_snapshots(snapshot_file, clock):
+    snapshot_file.save('proj1-prod-service1/', {'key1': 'value1'}, {})
+
+    clock.now += 61
+
+    assert snapshot_file.load('proj1-prod-service1/') is None
+
+
+def test_load_ignores_snapshots_encrypted_with_another_key(snapshot_file, tmpdir, clock):
+    snapshot_file.save('proj1-prod-service1/', {'key1': 'value1'}, {})
+    other_file = SnapshotFile(str(tmpdir.join('snapshots')), SnapshotFile.generate_key(), clock=clock)
+
+    assert other_file.load('proj1-prod-service1/') is None
+
+
+def test_loader_fetches_only_changed_values(snapshot_file):
+    client = StubSSMClient({'/service1/key1': 'value1', '/service1/key2': 'value2'})
+    loader = SnapshotLoader(snapshot_file, 'namespace', ParameterStore(ssm_client=client), '/service1/')
+
+    assert loader.initial is None
+    assert loader() == {'/service1/key1': 'value1', '/service1/key2': 'value2'}
+    assert loader() == {'/service1/key1': 'value1', '/service1/key2': 'value2'}
+    assert client.calls['get_parameters'] == 1
+
+    client.values['/service1/key2'] = 'value2_updated'
+    client.versions['/service1/key2'] = 2
+    assert loader() == {'/service1/key1': 'value1', '/service1/key2': 'value2_updated'}
+    assert client.calls['get_parameters'] == 2
+
+    loader = SnapshotLoader(snapshot_file, 'namespace', ParameterStore(ssm_client=client), '/service1/')
+    assert loader.initial == {'/service1/key1': 'value1', '/service1/key2': 'value2_updated'}
+
+
+def test_project_store_starts_from_snapshot(snapshot_file):
+    client = StubSSMClient({'/proj1-prod-service1/key1': 'value1'})
+
+    store = ProjectStore(ParameterStore(ssm_client=client), 'proj1', 'prod', 'service1', lead_separator=True)
+    refresher = store.start_refresh(interval=3600, snapshot_file=snapshot_file)
+    refresher._stopped.wait(0.1)
+    store.stop_refresh()
+    assert os.listdir(os.path.dirname(snapshot_file.path('')))
+    assert refresher.refresh_count == 0
+    assert client.calls == {'describe_parameters': 1, 'get_parameters': 1}
+    client.calls.clear()
+
+    store = ProjectStore(ParameterStore(ssm_client=client), 'proj1', 'prod', 'service1', lead_separator=True)
+    refresher = store.start_refresh(interval=3600, snapshot_file=snapshot_file)
+    assert store.get_service_parameter('key1') == 'value1'
+
+    while refresher.refresh_count < 1:
+        refresher._stopped.wait(0.01)
+    store.stop_refresh()
+
+    assert client.calls == {'describe_parameters': 1}
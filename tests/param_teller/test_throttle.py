@@ -0,0 +1,119 @@
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
+from mock import MagicMock
+from pytest import raises
+
+from param_teller.throttle import RateLimiter, RetryPolicy, Throttle, TokenBucket
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.now += delay
+
+
+def _client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'GetParameters')
+
+
+def test_token_bucket_allows_bursts_then_sustained_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=2, clock=clock)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert abs(bucket.reserve() - 0.1) < 1e-9
+    assert abs(bucket.reserve() - 0.2) < 1e-9
+
+    clock.now += 1
+    assert bucket.reserve() == 0
+
+
+def test_rate_limiter_uses_most_specific_rate():
+    clock = FakeClock()
+    limiter = RateLimiter({'ssm': 1, 'ssm.describe_parameters': 100}, clock=clock)
+
+    assert limiter.reserve('ssm', 'get_parameters') == 0
+    assert limiter.reserve('ssm', 'get_parameter') > 0
+    assert limiter.reserve('ssm', 'describe_parameters') == 0
+    assert limiter.reserve('ssm', 'describe_parameters') == 0
+    assert limiter.reserve('secretsmanager', 'get_secret_value') == 0
+
+
+def test_retry_policy_delays_are_bounded():
+    delays = list(RetryPolicy(max_attempts=20, base_delay=0.05, max_delay=1.0).delays())
+
+    assert len(delays) == 19
+    assert all(0.05 <= delay <= 1.0 for delay in delays)
+
+
+def test_throttle_retries_throttling_errors():
+    clock = FakeClock()
+    function = MagicMock(side_effect=[_client_error('ThrottlingException'), {'Parameters': []}])
+
+    response = Throttle(clock=clock, sleep=clock.sleep).call('ssm', 'get_parameters', function, Names=['key1'])
+
+    assert response == {'Parameters': []}
+    assert function.call_count == 2
+    assert clock.now > 1000.0
+
+
+def test_throttle_retries_transient_errors():
+    clock = FakeClock()
+    server_error = ClientError({'Error': {'Code': 'Unknown', 'Message': ''},
+                                'ResponseMetadata': {'HTTPStatusCode': 503}}, 'GetParameters')
+    function = MagicMock(side_effect=[_client_error('InternalServerError'), server_error,
+                                      EndpointConnectionError(endpoint_url='https://ssm'),
+                                      ReadTimeoutError(endpoint_url='https://ssm'), {'Parameters': []}])
+
+    response = Throttle(clock=clock, sleep=clock.sleep).call('ssm', 'get_parameters', function, Names=['key1'])
+
+    assert response == {'Parameters': []}
+    assert function.call_count == 5
+
+
+def test_throttle_raises_other_errors_immediately():
+    clock = FakeClock()
+    function = MagicMock(side_effect=_client_error('AccessDeniedException'))
+
+    with raises(ClientError):
+        Throttle(clock=clock, sleep=clock.sleep).call('ssm', 'get_parameters', function)
+    assert function.call_count == 1
+
+
+def test_throttle_gives_up_after_max_elapsed():
+    clock = FakeClock()
+    function = MagicMock(side_effect=_client_error('ThrottlingException'))
+    policy = RetryPolicy(max_attempts=1000, base_delay=1, max_delay=1, max_elapsed=10)
+
+    with raises(ClientError):
+        Throttle(retry_policy=policy, clock=clock, sleep=clock.sleep).call('ssm', 'get_parameters', function)
+    assert function.call_count == 11
+    assert clock.now - 1000.0 <= 10
+
+
+def test_throttle_counts_rate_limiter_waits_in_max_elapsed():
+    clock = FakeClock()
+    function = MagicMock(side_effect=[_client_error('ThrottlingException'), {'Parameters': []}])
+    policy = RetryPolicy(base_delay=0.01, max_delay=0.01, max_elapsed=0.5)
+    throttle = Throttle(RateLimiter({'ssm': 1}, clock=clock), policy, clock=clock, sleep=clock.sleep)
+
+    with raises(ClientError):
+        throttle.call('ssm', 'get_parameters', function)
+    assert function.call_count == 1
+    assert clock.now - 1000.0 <= 0.5
+
+
+def test_throttle_waits_for_rate_limiter():
+    clock = FakeClock()
+    throttle = Throttle(RateLimiter({'ssm': 2}, clock=clock), clock=clock, sleep=clock.sleep)
+
+    for _ in range(6):
+        throttle.call('ssm', 'get_parameters', lambda: None)
+
+    assert abs(clock.now - 1002.0) < 1e-9
@@ -0,0 +1,27 @@
+import threading
+
+from param_teller.utils import pipeline
+
+
+def test_pipeline_bounds_pending_batches():
+    produced = []
+    released = threading.Event()
+
+    def batches():
+        for i in range(100):
+            produced.append(i)
+            yield [i]
+
+    def fetch(batch):
+        released.wait()
+        return batch
+
+    results = pipeline(batches(), fetch, max_workers=2)
+    timer = threading.Timer(0.2, released.set)
+    timer.start()
+    try:
+        first = next(results)
+        assert len(produced) <= 4
+        assert [first] + list(results) == list(range(100))
+    finally:
+        timer.cancel()